@@ -0,0 +1,45 @@
+"""
+Конфигурация gunicorn для продакшена.
+
+WSGI (по умолчанию):  gunicorn video_hosting.wsgi
+ASGI (uvicorn):       GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker gunicorn video_hosting.asgi
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND") or "0.0.0.0:8000"
+
+# Процессов - 2 * ядра + 1: пока один процесс ждет базу, ядро занимает другой
+workers = int(os.getenv("GUNICORN_WORKERS") or multiprocessing.cpu_count() * 2 + 1)
+# gthread: медленные клиенты и отдача файлов занимают поток, а не весь процесс
+worker_class = os.getenv("GUNICORN_WORKER_CLASS") or "gthread"
+threads = int(os.getenv("GUNICORN_THREADS") or 4)
+
+# Приложение загружается до fork: процессы делят память и стартуют быстрее
+preload_app = (os.getenv("GUNICORN_PRELOAD") != "False")
+
+# Перезапуск процесса после max_requests запросов (с разбросом, чтобы процессы
+# не перезапускались одновременно) ограничивает рост памяти
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS") or 1000)
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER") or 100)
+
+# timeout - зависший процесс перезапускается, graceful_timeout - время на завершение
+# текущих запросов при перезапуске/остановке
+timeout = int(os.getenv("GUNICORN_TIMEOUT") or 30)
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT") or 30)
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE") or 5)
+
+# Видео-файлы отдаются через sendfile (или веб-сервером при VIDEO_SENDFILE_BACKEND)
+sendfile = True
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+forwarded_allow_ips = os.getenv("GUNICORN_FORWARDED_ALLOW_IPS") or "127.0.0.1"
+
+
+def when_ready(server):
+    # При preload_app приложение загружено в главном процессе до запуска рабочих;
+    # соединения с базой и пул, если они успели открыться, закрываются до fork
+    from video_hosting_app.db import close_connections_before_fork
+
+    close_connections_before_fork()
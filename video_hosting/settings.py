@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import copy
 import os
 from pathlib import Path
 
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "video_hosting_app",
@@ -48,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "video_hosting_app.instrumentation.PerformanceMiddleware",
+    "video_hosting_app.replicas.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -87,9 +91,48 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("POSTGRES_HOST"),
         "PORT": os.getenv("POSTGRES_PORT"),
+        # Постоянные соединения: соединение переиспользуется между запросами DB_CONN_MAX_AGE секунд,
+        # перед повторным использованием проверяется, что оно живо
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE") or 60),
+        "CONN_HEALTH_CHECKS": (os.getenv("DB_CONN_HEALTH_CHECKS") != "False"),
     }
 }
 
+# Пул соединений psycopg3 (нужны пакеты psycopg и psycopg-pool): соединения процесса берутся из пула
+# размером от DB_POOL_MIN_SIZE до DB_POOL_MAX_SIZE, ожидание свободного соединения - до DB_POOL_TIMEOUT секунд.
+# С пулом постоянные соединения Django отключаются
+DB_POOL = (os.getenv("DB_POOL") == "True")
+if DB_POOL:
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE") or 2),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE") or 10),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT") or 10),
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE") or 600),
+        },
+    }
+
+# Реплики для чтения: DB_REPLICA_HOSTS - адреса через запятую (host или host:port), остальные параметры
+# подключения как у основной базы. Чтения безопасных HTTP-запросов идут на реплики с отставанием
+# не больше DB_REPLICA_MAX_LAG секунд (проверка раз в DB_REPLICA_CHECK_INTERVAL секунд), после записи клиент
+# DB_PRIMARY_STICKY_SECONDS секунд читает из основной базы
+DATABASE_REPLICAS = []
+for index, address in enumerate(filter(None, (os.getenv("DB_REPLICA_HOSTS") or "").split(",")), 1):
+    host, _, port = address.strip().partition(":")
+    replica = copy.deepcopy(DATABASES["default"])
+    replica.update({"HOST": host, "PORT": port or replica["PORT"], "TEST": {"MIRROR": "default"}})
+    # Недоступная реплика должна быстро уступать основной базе
+    replica.setdefault("OPTIONS", {})["connect_timeout"] = int(
+        os.getenv("DB_REPLICA_CONNECT_TIMEOUT") or 2
+    )
+    DATABASES[f"replica_{index}"] = replica
+    DATABASE_REPLICAS.append(f"replica_{index}")
+DATABASE_ROUTERS = ["video_hosting_app.replicas.ReplicaRouter"]
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG") or 5)
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL") or 5)
+DB_PRIMARY_STICKY_SECONDS = int(os.getenv("DB_PRIMARY_STICKY_SECONDS") or 10)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -123,6 +166,59 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = "static/"
+# Каталог для collectstatic, в продакшене статику отдает nginx (deploy/nginx.conf)
+STATIC_ROOT = os.getenv("STATIC_ROOT") or os.path.join(BASE_DIR, "static")
+
+# Media files (загруженные видео-файлы)
+
+MEDIA_URL = "media/"
+MEDIA_ROOT = os.getenv("MEDIA_ROOT") or os.path.join(BASE_DIR, "media")
+
+# Видео-файлы хранятся с адресацией по содержимому (SHA-256): одинаковые файлы - один файл на диске
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    "videos": {"BACKEND": "video_hosting_app.storage.ContentAddressedStorage"},
+}
+
+# Сколько секунд файл без ссылок не удаляется после последнего использования,
+# чтобы не удалить его из-под параллельной загрузки того же содержимого
+VIDEO_BLOB_GC_GRACE = int(os.getenv("VIDEO_BLOB_GC_GRACE") or 3600)
+
+# Максимальный размер видео-файла при загрузке по частям, байт
+VIDEO_UPLOAD_MAX_SIZE = int(os.getenv("VIDEO_UPLOAD_MAX_SIZE") or 20 * 1024 ** 3)
+
+# Через сколько секунд без записи частей незавершенная загрузка удаляется командой gc_blobs
+VIDEO_UPLOAD_EXPIRY = int(os.getenv("VIDEO_UPLOAD_EXPIRY") or 24 * 3600)
+
+# Отдача видео-файлов веб-сервером: "nginx" (X-Accel-Redirect) или "apache" (X-Sendfile),
+# пусто - файл отдает приложение через sendfile WSGI-сервера
+VIDEO_SENDFILE_BACKEND = os.getenv("VIDEO_SENDFILE_BACKEND") or ""
+VIDEO_ACCEL_REDIRECT_PREFIX = os.getenv("VIDEO_ACCEL_REDIRECT_PREFIX") or "/protected-media/"
+
+# Перекодирование видео-файлов (команда transcode_worker).
+# Команда кодировщика - шаблон с подстановками {source}, {target}, {height}, {threads}, {python}
+TRANSCODE_ENCODER_COMMAND = os.getenv("TRANSCODE_ENCODER_COMMAND") or (
+    "ffmpeg -nostdin -y -v error -threads {threads} -i {source} -vf scale=-2:{height} "
+    "-c:v libx264 -preset veryfast -crf 23 -c:a aac -movflags +faststart -f mp4 {target}"
+)
+# Нарезка на сегменты HLS - шаблон с подстановками {source}, {output} (каталог), {duration}, {python}
+TRANSCODE_SEGMENTER_COMMAND = os.getenv("TRANSCODE_SEGMENTER_COMMAND") or (
+    "ffmpeg -nostdin -y -v error -i {source} -c copy -f hls -hls_time {duration} "
+    "-hls_playlist_type vod -hls_segment_filename {output}/%05d.ts {output}/index.m3u8"
+)
+# Кодеки файла для атрибута CODECS мастер-плейлиста - шаблон с подстановками {source}, {python};
+# команда выводит потоки в формате JSON ffprobe
+TRANSCODE_PROBE_COMMAND = os.getenv("TRANSCODE_PROBE_COMMAND") or (
+    "ffprobe -v error -show_entries stream=codec_type,codec_name,profile,level -of json {source}"
+)
+HLS_SEGMENT_DURATION = int(os.getenv("HLS_SEGMENT_DURATION") or 6)
+# Время кэширования плейлистов, секунд; сегменты кэшируются навсегда (immutable)
+HLS_PLAYLIST_MAX_AGE = int(os.getenv("HLS_PLAYLIST_MAX_AGE") or 60)
+TRANSCODE_JOBS_PER_CORE = float(os.getenv("TRANSCODE_JOBS_PER_CORE") or 0.5)
+TRANSCODE_MAX_ATTEMPTS = int(os.getenv("TRANSCODE_MAX_ATTEMPTS") or 3)
+TRANSCODE_RETRY_DELAY = int(os.getenv("TRANSCODE_RETRY_DELAY") or 30)
+TRANSCODE_JOB_TIMEOUT = int(os.getenv("TRANSCODE_JOB_TIMEOUT") or 3600)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -131,10 +227,73 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    )
+        "video_hosting_app.authentication.CachedJWTAuthentication",
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "video_hosting_app.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
 }
 
+SIMPLE_JWT = {
+    "TOKEN_OBTAIN_SERIALIZER": "video_hosting_app.serializers.UserTokenObtainPairSerializer",
+}
+
+# Кэш пользователей JWT-аутентификации в памяти процесса: время жизни записи (секунд) и размер
+JWT_USER_CACHE_TTL = int(os.getenv("JWT_USER_CACHE_TTL") or 30)
+JWT_USER_CACHE_SIZE = int(os.getenv("JWT_USER_CACHE_SIZE") or 10000)
+# Пользователь из полей токена, без запросов к базе
+JWT_STATELESS_USER = (os.getenv("JWT_STATELESS_USER") == "True")
+
+# Асинхронные эндпоинты чтения (async_views) вместо синхронных, для запуска под ASGI
+VIDEO_ASYNC_VIEWS = (os.getenv("VIDEO_ASYNC_VIEWS") == "True")
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# По умолчанию - кэш в памяти процесса с ограничением размера и вытеснением LRU,
+# при заданном REDIS_URL - Redis (вытеснение настраивается в Redis: maxmemory-policy allkeys-lru)
+
+VIDEO_CACHE_ALIAS = "videos"
+VIDEO_CACHE_ENABLED = (os.getenv("VIDEO_CACHE_ENABLED") != "False")
+VIDEO_CACHE_TIMEOUT = int(os.getenv("VIDEO_CACHE_TIMEOUT") or 300)
+
+if os.getenv("REDIS_URL"):
+    VIDEO_CACHE = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL"),
+    }
+else:
+    VIDEO_CACHE = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "videos",
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("VIDEO_CACHE_MAX_ENTRIES") or 10000),
+            "CULL_FREQUENCY": 10,
+        },
+    }
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    VIDEO_CACHE_ALIAS: VIDEO_CACHE,
+}
+
+# Количество шардов счетчика лайков на одно видео
+LIKE_COUNTER_SHARDS = int(os.getenv("LIKE_COUNTER_SHARDS") or 16)
+
+# Отложенная запись лайков: запрос пишет событие в журнал, команда flush_likes применяет журнал пачками
+LIKE_WRITE_BEHIND = (os.getenv("LIKE_WRITE_BEHIND") == "True")
+LIKE_BUFFER_DIR = os.getenv("LIKE_BUFFER_DIR") or os.path.join(BASE_DIR, "like_buffer")
+LIKE_BUFFER_FSYNC = (os.getenv("LIKE_BUFFER_FSYNC") == "True")
+
+# Замеры запросов (instrumentation): заголовок Server-Timing, порог медленного SQL-запроса (мс),
+# число повторов одного запроса, после которого запрос считается N+1, токен доступа к /metrics
+PERF_SERVER_TIMING = (os.getenv("PERF_SERVER_TIMING") != "False")
+PERF_SLOW_QUERY_MS = float(os.getenv("PERF_SLOW_QUERY_MS") or 100)
+PERF_DUPLICATE_QUERY_THRESHOLD = int(os.getenv("PERF_DUPLICATE_QUERY_THRESHOLD") or 5)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or ""
+
 if DEBUG:
     LOGGING = {
         "version": 1,
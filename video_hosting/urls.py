@@ -4,6 +4,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from video_hosting_app.views import metrics
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Video Hosting API",
@@ -20,5 +22,6 @@ urlpatterns = [
     path(
         "v1/videos/", include("video_hosting_app.urls", namespace="video_hosting_app")
     ),
+    path("metrics", metrics, name="metrics"),
     path('docs/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
 ]
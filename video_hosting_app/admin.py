@@ -7,14 +7,14 @@ from .models import Like, Video, VideoFile
 class LikeAdmin(admin.ModelAdmin):
     list_display = ("user", "video")
     list_filter = ("video",)
-    search_fields = ("user", "video")
+    search_fields = ("user__username", "video__name")
 
 
 @admin.register(VideoFile)
 class VideoFileAdmin(admin.ModelAdmin):
     list_display = ("video", "quality")
     list_filter = ("video",)
-    search_fields = ("video",)
+    search_fields = ("video__name",)
 
 
 @admin.register(Video)
@@ -24,4 +24,4 @@ class VideoAdmin(admin.ModelAdmin):
         "owner",
         "is_published",
     )
-    search_fields = ("owner", "name")
+    search_fields = ("name", "=owner__username")
@@ -0,0 +1,276 @@
+"""
+Асинхронные варианты эндпоинтов чтения для запуска под ASGI (video_hosting.asgi, uvicorn).
+Пока запрос ждет базу, кэш или медленного клиента, процесс обслуживает другие запросы,
+поэтому один процесс держит тысячи открытых keep-alive соединений.
+Подключаются вместо синхронных при VIDEO_ASYNC_VIEWS=True, ответы совпадают с синхронными
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    NotFound,
+    PermissionDenied,
+)
+from rest_framework.permissions import AllowAny
+from rest_framework.request import Request
+
+from .authentication import CachedJWTAuthentication
+from .caching import (
+    LIST_VERSION_KEY,
+    acache_lookup,
+    acache_store,
+    video_detail_key,
+    video_list_key,
+    video_version_key,
+)
+from .conditional import (
+    get_validators,
+    is_conditional,
+    not_modified,
+    set_validators,
+    validator_rows,
+)
+from .db import connection_stats
+from .models import Video
+from .pagination import MyPagination, SearchCursorPagination, VideoCursorPagination
+from .permissions import IsStaff
+from .renderers import ORJSONRenderer
+from .search import search_videos, validate_search_text
+from .serializers import video_data, video_file_rows, video_rows
+from .streaming import IDS_CHUNK_SIZE, STREAM_GENERATORS, astream_ids
+from .views import cache_report, filter_visible
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(
+        ORJSONRenderer().render(data), status=status, content_type="application/json"
+    )
+
+
+class AsyncAPIView(View):
+    """
+    Базовый асинхронный эндпоинт: JWT-аутентификация без похода в базу при попадании в кэш
+    пользователей, проверка прав через permission_classes и ошибки в формате DRF
+    """
+    http_method_names = ["get", "head", "options"]
+    permission_classes = (AllowAny,)
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Request нужен ради query_params, которые используют пагинаторы DRF
+        request = Request(request)
+        self.request = request
+        self.authenticator = CachedJWTAuthentication()
+        try:
+            request.user = await self.authenticate(request)
+            self.check_permissions(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return self.handle_exception(request, exc)
+
+    async def authenticate(self, request):
+        result = await self.authenticator.aauthenticate(request)
+        if result is None:
+            return AnonymousUser()
+        return result[0]
+
+    def check_permissions(self, request):
+        for permission in (permission_class() for permission_class in self.permission_classes):
+            if not permission.has_permission(request, self):
+                if not request.user.is_authenticated:
+                    raise NotAuthenticated()
+                raise PermissionDenied(getattr(permission, "message", None))
+
+    def handle_exception(self, request, exc):
+        detail = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+        response = json_response(detail, status=exc.status_code)
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            response.status_code = status.HTTP_401_UNAUTHORIZED
+            response["WWW-Authenticate"] = self.authenticator.authenticate_header(request)
+        return response
+
+
+def conditional_response(request, payload, cache_key, hit):
+    """
+    304 по сохраненным ETag/Last-Modified либо ответ с данными и этими заголовками
+    (без заголовков, если validators - None)
+    """
+    validators = payload["validators"]
+    response = not_modified(request, validators) if validators else None
+    if response is None:
+        response = json_response(payload["data"])
+        if validators:
+            set_validators(response, validators)
+    if cache_key is not None:
+        response["X-Cache"] = "HIT" if hit else "MISS"
+    return response
+
+
+class VideoListView(AsyncAPIView):
+    """
+    Асинхронный вариант VideoViewSet.list: keyset-пагинация, кэш страниц для анонимных
+    пользователей и ответ 304 для актуальной страницы
+    """
+
+    async def get(self, request, *args, **kwargs):
+        cache_key, payload = None, None
+        if not request.user.is_authenticated:
+            cache_key, payload = await acache_lookup(
+                video_list_key(request.build_absolute_uri()), LIST_VERSION_KEY
+            )
+        hit = payload is not None
+        if not hit:
+            paginator = VideoCursorPagination()
+            if is_conditional(request) and not paginator.estimate_requested(request):
+                page = await paginator.apaginate_queryset(
+                    filter_visible(validator_rows(Video.objects), request.user), request
+                )
+                response = not_modified(request, self.get_page_validators(paginator, page))
+                if response is not None:
+                    patch_vary_headers(response, ("Authorization",))
+                    return response
+            page = await paginator.apaginate_queryset(
+                filter_visible(video_rows(Video.objects.all()), request.user), request
+            )
+            files = [row async for row in video_file_rows(page)]
+            payload = {
+                "data": paginator.get_paginated_data(video_data(page, files)),
+                "validators": self.get_page_validators(paginator, page),
+            }
+            await acache_store(cache_key, payload)
+        response = conditional_response(request, payload, cache_key, hit)
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def get_page_validators(self, paginator, page):
+        if paginator.count_estimate is not None:
+            return None
+        return get_validators(page, paginator.has_next, paginator.has_previous)
+
+
+class VideoRetrieveView(AsyncAPIView):
+    """
+    Асинхронный вариант VideoViewSet.retrieve
+    """
+
+    async def get(self, request, *args, **kwargs):
+        video_id = kwargs["pk"]
+        cache_key, payload = await acache_lookup(
+            video_detail_key(video_id), video_version_key(video_id)
+        )
+        hit = payload is not None
+        if not hit:
+            if is_conditional(request):
+                video = await validator_rows(Video.objects.filter(pk=video_id)).afirst()
+                if video is not None:
+                    response = not_modified(request, get_validators([video]))
+                    if response is not None:
+                        return response
+            video = await video_rows(Video.objects.filter(pk=video_id)).afirst()
+            if video is None:
+                # То же сообщение, что у get_object_or_404 в синхронном варианте
+                raise NotFound(f"No {Video._meta.object_name} matches the given query.")
+            files = [row async for row in video_file_rows([video])]
+            payload = {
+                "data": video_data([video], files)[0],
+                "validators": get_validators([video]),
+            }
+            await acache_store(cache_key, payload)
+        return conditional_response(request, payload, cache_key, hit)
+
+
+class VideoSearchView(AsyncAPIView):
+    """
+    Асинхронный вариант VideoSearchAPIView
+    """
+
+    async def get(self, request, *args, **kwargs):
+        text = request.query_params.get("q", "").strip()
+        error = validate_search_text(text)
+        if error is not None:
+            return json_response({"Ошибка": error}, status=status.HTTP_400_BAD_REQUEST)
+        paginator = SearchCursorPagination()
+        # search_videos проверяет расширение pg_trgm запросом к базе, поэтому идет в потоке
+        queryset = await sync_to_async(search_videos)(
+            filter_visible(Video.objects.all(), request.user), text
+        )
+        page = await paginator.apaginate_queryset(video_rows(queryset, "rank"), request)
+        files = [row async for row in video_file_rows(page)]
+        response = json_response(paginator.get_paginated_data(video_data(page, files)))
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+
+class IDListView(AsyncAPIView):
+    """
+    Асинхронный вариант IDViewSet: id опубликованных видео читаются через aiterator,
+    с параметром ?stream=json|ndjson|packed ответ отдается асинхронным потоком
+    """
+    permission_classes = (IsStaff,)
+
+    async def get(self, request, *args, **kwargs):
+        queryset = Video.objects.filter(is_published=True).order_by("id")
+        stream_format = request.query_params.get("stream")
+        if stream_format is not None:
+            if stream_format not in STREAM_GENERATORS:
+                return json_response(
+                    {"Ошибка": f"Допустимые форматы: {', '.join(STREAM_GENERATORS)}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            return astream_ids(queryset, stream_format)
+        ids = queryset.values_list("id", flat=True).aiterator(chunk_size=IDS_CHUNK_SIZE)
+        return json_response([{"id": pk} async for pk in ids])
+
+
+class LikesStatisticsView(AsyncAPIView):
+    """
+    Асинхронный вариант статистики лайков; запрос и параметры берутся из синхронного
+    эндпоинта viewset, поэтому ответы совпадают
+    """
+    permission_classes = (IsStaff,)
+    viewset = None
+
+    async def get(self, request, *args, **kwargs):
+        viewset = self.viewset()
+        queryset = viewset.get_statistics_queryset()
+        top = request.query_params.get("top")
+        if top is not None:
+            try:
+                top = int(top)
+            except ValueError:
+                return json_response(
+                    {"Ошибка": "Параметр top должен быть целым числом"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            return json_response(
+                [row async for row in queryset[: max(0, min(top, viewset.max_top))]]
+            )
+        paginator = MyPagination()
+        page = await paginator.apaginate_queryset(queryset, request)
+        return json_response(paginator.get_paginated_response(page).data)
+
+
+class CacheStatsView(AsyncAPIView):
+    """
+    Асинхронный вариант CacheStatsAPIView
+    """
+    permission_classes = (IsStaff,)
+
+    async def get(self, request, *args, **kwargs):
+        return json_response(cache_report())
+
+
+class DatabaseStatsView(AsyncAPIView):
+    """
+    Асинхронный вариант DatabaseStatsAPIView
+    """
+    permission_classes = (IsStaff,)
+
+    async def get(self, request, *args, **kwargs):
+        return json_response(await sync_to_async(connection_stats)())
+
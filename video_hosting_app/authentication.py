@@ -0,0 +1,117 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserCache:
+    """
+    LRU-кэш пользователей в памяти процесса с ограниченным временем жизни записей.
+    Ключ - (id пользователя, iat токена)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + settings.JWT_USER_CACHE_TTL, user)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.JWT_USER_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == user_id]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache()
+
+
+class ClaimsUser(TokenUser):
+    """
+    Пользователь из полей токена; id - число, как у User, чтобы сравнения
+    с owner_id работали одинаково в обоих режимах
+    """
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация без запроса пользователя из базы на каждый запрос.
+    Пользователь берется из кэша процесса на JWT_USER_CACHE_TTL секунд, запись сбрасывается
+    при сохранении или удалении пользователя (сигналы); другие процессы узнают об изменении
+    не позже чем через JWT_USER_CACHE_TTL.
+    В режиме JWT_STATELESS_USER пользователь строится из полей токена (user_id, username, is_staff)
+    вообще без обращения к базе, изменения прав вступают в силу с новым токеном
+    """
+
+    def get_user(self, validated_token):
+        if settings.JWT_STATELESS_USER:
+            if api_settings.USER_ID_CLAIM not in validated_token:
+                raise InvalidToken("Токен не содержит идентификатор пользователя")
+            return ClaimsUser(validated_token)
+
+        key = self.get_cache_key(validated_token)
+        user = user_cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(key, user)
+        # Копия, чтобы изменения атрибутов в одном запросе не попали в другие
+        return copy.copy(user)
+
+    def get_cache_key(self, validated_token):
+        return (
+            str(validated_token.get(api_settings.USER_ID_CLAIM)),
+            validated_token.get("iat"),
+        )
+
+    async def aauthenticate(self, request):
+        """
+        Асинхронный вариант authenticate: база запрашивается (в потоке) только при промахе кэша
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        if settings.JWT_STATELESS_USER:
+            return self.get_user(validated_token), validated_token
+        # Запись может быть вытеснена из кэша в любой момент, поэтому используется пользователь
+        # из этого же обращения к кэшу, а не повторный поиск в get_user
+        user = user_cache.get(self.get_cache_key(validated_token))
+        if user is not None:
+            return copy.copy(user), validated_token
+        return await sync_to_async(self.get_user)(validated_token), validated_token
@@ -0,0 +1,70 @@
+import os
+import shutil
+
+from .hls import package_dir, package_key
+from .models import VideoFile
+from .storage import BLOB_PREFIX, video_storage
+
+SWEEP_BATCH_SIZE = 1000
+
+
+def referenced_names(names):
+    return set(
+        VideoFile.objects.filter(file__in=names).values_list("file", flat=True).distinct()
+    )
+
+
+def release_blobs(names):
+    """
+    Удаляет файлы хранилища, на которые больше не ссылается ни один VideoFile,
+    вместе с их нарезкой HLS.
+    Файлы, использованные позже VIDEO_BLOB_GC_GRACE секунд назад, остаются до sweep_blobs
+    """
+    storage = video_storage()
+    removed = []
+    for name in set(names) - referenced_names(names):
+        if storage.is_collectable(name):
+            delete_blob(name)
+            removed.append(name)
+    return removed
+
+
+def delete_blob(name):
+    storage = video_storage()
+    storage.delete(name)
+    shutil.rmtree(storage.path(package_dir(package_key(name))), ignore_errors=True)
+
+
+def blob_names():
+    storage = video_storage()
+    root = storage.path(BLOB_PREFIX)
+    for directory, _, files in os.walk(root):
+        for file in files:
+            path = os.path.join(directory, file)
+            yield f"{BLOB_PREFIX}/{os.path.relpath(path, root).replace(os.sep, '/')}"
+
+
+def sweep_blobs(dry_run=False):
+    """
+    Обходит все файлы хранилища и удаляет те, на которые нет ссылок
+    (после массовых операций без сигналов). Файлы незавершенных загрузок лежат вне BLOB_PREFIX,
+    их удаляет expire_uploads. Возвращает удаленные имена
+    """
+    storage = video_storage()
+    removed = []
+    batch = []
+
+    def flush():
+        for name in set(batch) - referenced_names(batch):
+            if storage.is_collectable(name):
+                if not dry_run:
+                    delete_blob(name)
+                removed.append(name)
+        batch.clear()
+
+    for name in blob_names():
+        batch.append(name)
+        if len(batch) >= SWEEP_BATCH_SIZE:
+            flush()
+    flush()
+    return removed
@@ -0,0 +1,118 @@
+import threading
+from hashlib import md5
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .replicas import primary_pinned, replica_used
+
+LIST_VERSION_KEY = "videos:list:version"
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def video_cache():
+    return caches[settings.VIDEO_CACHE_ALIAS]
+
+
+def video_version_key(video_id):
+    return f"videos:{video_id}:version"
+
+
+def video_detail_key(video_id):
+    return f"videos:{video_id}:detail"
+
+
+def video_list_key(url):
+    return f"videos:list:{md5(url.encode('utf-8')).hexdigest()}"
+
+
+def get_version(key):
+    """
+    Текущая версия группы ключей. Версия - случайная строка, а не счетчик,
+    поэтому вытеснение ключа версии из кэша не вернет к жизни старые записи
+    """
+    cache = video_cache()
+    version = cache.get(key)
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key) or version
+    return version
+
+
+async def aget_version(key):
+    cache = video_cache()
+    version = await cache.aget(key)
+    if version is None:
+        version = uuid4().hex
+        if not await cache.aadd(key, version, timeout=None):
+            version = await cache.aget(key) or version
+    return version
+
+
+def invalidate_videos(video_ids=()):
+    """
+    Сбрасывает закэшированные страницы списка и карточки переданных видео
+    """
+    if not settings.VIDEO_CACHE_ENABLED:
+        return
+    keys = [LIST_VERSION_KEY, *(video_version_key(video_id) for video_id in video_ids)]
+    video_cache().set_many({key: uuid4().hex for key in keys}, timeout=None)
+
+
+def count(hit):
+    with _stats_lock:
+        _stats["hits" if hit else "misses"] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def cache_lookup(key, version_key):
+    """
+    Возвращает (ключ с текущей версией, данные или None); ключ нужен для cache_store
+    """
+    if not settings.VIDEO_CACHE_ENABLED:
+        return None, None
+    key = f"{key}:{get_version(version_key)}"
+    # Клиент после записи не читает кэш: запись могла заполнить отстающая реплика,
+    # а свежие данные из основной базы перезапишут ее
+    data = None if primary_pinned() else video_cache().get(key)
+    count(hit=data is not None)
+    return key, data
+
+
+def store_timeout():
+    """
+    Данные, прочитанные с реплики, могут отставать на DB_REPLICA_MAX_LAG, поэтому живут не дольше
+    """
+    if replica_used():
+        return min(settings.VIDEO_CACHE_TIMEOUT, settings.DB_REPLICA_MAX_LAG)
+    return settings.VIDEO_CACHE_TIMEOUT
+
+
+def cache_store(key, data):
+    if key is not None:
+        video_cache().set(key, data, timeout=store_timeout())
+
+
+async def acache_lookup(key, version_key):
+    """
+    Асинхронный вариант cache_lookup
+    """
+    if not settings.VIDEO_CACHE_ENABLED:
+        return None, None
+    key = f"{key}:{await aget_version(version_key)}"
+    data = None if primary_pinned() else await video_cache().aget(key)
+    count(hit=data is not None)
+    return key, data
+
+
+async def acache_store(key, data):
+    if key is not None:
+        await video_cache().aset(key, data, timeout=store_timeout())
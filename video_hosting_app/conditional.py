@@ -0,0 +1,59 @@
+from hashlib import md5
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+VALIDATOR_FIELDS = ("pk", "created_at", "updated_at", "owner__username")
+
+
+def is_conditional(request):
+    return "HTTP_IF_NONE_MATCH" in request.META or "HTTP_IF_MODIFIED_SINCE" in request.META
+
+
+def validator_rows(queryset):
+    """
+    Строки видео только с полями, от которых зависят валидаторы (и ключ пагинации по created_at)
+    """
+    return queryset.values_list(*VALIDATOR_FIELDS, named=True)
+
+
+def get_validators(videos, *extra):
+    """
+    ETag и Last-Modified по id, updated_at и имени владельца видео (строки validator_rows
+    или video_rows), без сериализации. Имя владельца хранится вне видео и не меняет updated_at.
+    extra - дополнительные значения, от которых зависит ответ (например, наличие следующей страницы)
+    """
+    digest = md5()
+    last_modified = None
+    for video in videos:
+        digest.update(
+            f"{video.pk}:{video.updated_at.isoformat()}:{video.owner__username};".encode("utf-8")
+        )
+        if last_modified is None or video.updated_at > last_modified:
+            last_modified = video.updated_at
+    for value in extra:
+        digest.update(f"{value};".encode("utf-8"))
+    return {"etag": f'"{digest.hexdigest()}"', "last_modified": last_modified}
+
+
+def set_validators(response, validators):
+    response["ETag"] = validators["etag"]
+    if validators["last_modified"] is not None:
+        response["Last-Modified"] = http_date(validators["last_modified"].timestamp())
+    return response
+
+
+def not_modified(request, validators):
+    """
+    Ответ 304, если клиент уже получил актуальную версию, иначе None
+    """
+    last_modified = validators["last_modified"]
+    response = get_conditional_response(
+        request,
+        etag=validators["etag"],
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        set_validators(response, validators)
+    return response
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import connections
+
+from .replicas import replica_health
+
+
+def connection_stats(alias="default"):
+    """
+    Состояние соединений с базой: настройки переиспользования, статистика пула psycopg3
+    текущего процесса (если пул включен), соединения всех процессов на стороне Postgres
+    и последняя проверка реплик в процессе
+    """
+    connection = connections[alias]
+    stats = {
+        "alias": alias,
+        "conn_max_age": connection.settings_dict["CONN_MAX_AGE"],
+        "health_checks": connection.settings_dict["CONN_HEALTH_CHECKS"],
+        "pool": None,
+    }
+    pool = getattr(connection, "pool", None)
+    if pool is not None:
+        pool_stats = pool.get_stats()
+        in_use = pool_stats["pool_size"] - pool_stats["pool_available"]
+        pool_stats["utilization"] = in_use / pool_stats["pool_max"]
+        stats["pool"] = pool_stats
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT COALESCE(state, 'unknown'), COUNT(*) FROM pg_stat_activity
+            WHERE datname = current_database() GROUP BY 1
+            """
+        )
+        stats["server_connections"] = dict(cursor.fetchall())
+        cursor.execute("SHOW max_connections")
+        stats["max_connections"] = int(cursor.fetchone()[0])
+    stats["replicas"] = {
+        alias: replica_health.status().get(alias, {"healthy": None, "lag": None})
+        for alias in settings.DATABASE_REPLICAS
+    }
+    return stats
+
+
+def close_connections_before_fork():
+    """
+    Закрывает открытые соединения и пулы текущего процесса перед fork,
+    чтобы дочерние процессы не делили сокеты с родителем
+    """
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+        if getattr(connection, "pool", None) is not None:
+            connection.close_pool()
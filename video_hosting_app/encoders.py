@@ -0,0 +1,85 @@
+import json
+import shlex
+import subprocess
+import sys
+
+# Модуль без зависимостей от Django: функции выполняются в процессах пула воркера перекодирования
+
+ERROR_TAIL_SIZE = 2000
+PROBE_TIMEOUT = 60
+
+# Профили H.264 ffprobe: (profile_idc, флаги ограничений) для строки avc1.PPCCLL (RFC 6381)
+H264_PROFILES = {
+    "Constrained Baseline": (0x42, 0xE0),
+    "Baseline": (0x42, 0x00),
+    "Main": (0x4D, 0x40),
+    "Extended": (0x58, 0x00),
+    "High": (0x64, 0x00),
+    "High 10": (0x6E, 0x00),
+    "High 4:2:2": (0x7A, 0x00),
+    "High 4:4:4 Predictive": (0xF4, 0x00),
+}
+AAC_PROFILES = {"LC": "mp4a.40.2", "HE-AAC": "mp4a.40.5", "HE-AACv2": "mp4a.40.29"}
+AUDIO_CODECS = {"mp3": "mp4a.40.34", "ac3": "ac-3", "eac3": "ec-3"}
+
+
+def encoder_command(template, **values):
+    """
+    Команда кодировщика из шаблона (TRANSCODE_ENCODER_COMMAND, TRANSCODE_SEGMENTER_COMMAND):
+    подстановки из values и {python} - текущий интерпретатор
+    """
+    return [
+        arg.format(python=sys.executable, **values) for arg in shlex.split(template)
+    ]
+
+
+def run_encoder(command, timeout):
+    """
+    Запускает кодировщик, возвращает (код возврата, конец stderr)
+    """
+    try:
+        result = subprocess.run(
+            command, stdin=subprocess.DEVNULL, capture_output=True, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        return -1, f"Превышено время кодирования ({timeout} с)"
+    except OSError as e:
+        return -1, str(e)
+    return result.returncode, result.stderr[-ERROR_TAIL_SIZE:].decode("utf-8", "replace")
+
+
+def codec_string(stream):
+    """
+    Кодек потока ffprobe в формате атрибута CODECS плейлиста HLS или None, если он неизвестен
+    """
+    codec, profile = stream.get("codec_name"), stream.get("profile")
+    if codec == "h264" and profile in H264_PROFILES and stream.get("level", 0) > 0:
+        profile_idc, constraints = H264_PROFILES[profile]
+        return f"avc1.{profile_idc:02x}{constraints:02x}{stream['level']:02x}"
+    if codec == "aac":
+        return AAC_PROFILES.get(profile)
+    return AUDIO_CODECS.get(codec)
+
+
+def probe_codecs(command):
+    """
+    Запускает ffprobe (TRANSCODE_PROBE_COMMAND) и возвращает кодеки видео и аудио через запятую.
+    Если команда не удалась или кодек не распознан, возвращает пустую строку:
+    неполный CODECS хуже его отсутствия
+    """
+    try:
+        result = subprocess.run(
+            command, stdin=subprocess.DEVNULL, capture_output=True, timeout=PROBE_TIMEOUT
+        )
+        streams = json.loads(result.stdout)["streams"] if result.returncode == 0 else []
+    except (subprocess.TimeoutExpired, OSError, ValueError, KeyError, TypeError):
+        return ""
+    codecs = []
+    for stream in streams:
+        if stream.get("codec_type") not in ("video", "audio"):
+            continue
+        codec = codec_string(stream)
+        if codec is None:
+            return ""
+        codecs.append(codec)
+    return ",".join(codecs)
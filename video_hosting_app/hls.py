@@ -0,0 +1,105 @@
+import os
+import re
+from collections import namedtuple
+from hashlib import md5, sha256
+
+from .storage import video_storage
+
+HLS_PREFIX = "videos/hls"
+HLS_TMP_PREFIX = "videos/hls/tmp"
+PLAYLIST_NAME = "index.m3u8"
+PLAYLIST_CONTENT_TYPE = "application/vnd.apple.mpegurl"
+SEGMENT_NAME_RE = re.compile(r"[\w-]+\.(ts|m4s|mp4|aac)")
+RESOLUTIONS = {"HD": "1280x720", "FHD": "1920x1080", "UHD": "3840x2160"}
+
+# Файл хранилища для range_file_response: имя (для X-Accel-Redirect) и путь на диске
+StoredFile = namedtuple("StoredFile", ["name", "path"])
+
+
+def package_key(file_name):
+    """
+    Ключ нарезки видео-файла. Зависит только от имени файла в хранилище, а оно - от содержимого,
+    поэтому одинаковые файлы нарезаются один раз, а URL сегментов не меняются, пока не сменится файл
+    """
+    return sha256(file_name.encode("utf-8")).hexdigest()[:32]
+
+
+def package_dir(key):
+    return f"{HLS_PREFIX}/{key[:2]}/{key}"
+
+
+def is_packaged(video_file):
+    return bool(video_file.hls_key) and video_file.hls_key == package_key(video_file.file.name)
+
+
+def playlist_segments(text):
+    """
+    Пары (длительность, имя сегмента) из медиа-плейлиста
+    """
+    duration = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:"):].split(",")[0])
+        elif line and not line.startswith("#"):
+            yield duration, line
+            duration = None
+
+
+def package_bandwidth(path):
+    """
+    Пиковый и средний битрейт нарезки (бит/с) по размерам и длительностям сегментов
+    """
+    with open(os.path.join(path, PLAYLIST_NAME), encoding="utf-8") as file:
+        segments = list(playlist_segments(file.read()))
+    peak = total_bits = total_duration = 0
+    for duration, name in segments:
+        bits = os.path.getsize(os.path.join(path, name)) * 8
+        if duration:
+            peak = max(peak, int(bits / duration))
+            total_duration += duration
+        total_bits += bits
+    average = int(total_bits / total_duration) if total_duration else peak
+    return peak, average
+
+
+def master_playlist(video_files):
+    """
+    Мастер-плейлист по всем нарезанным качествам видео, от меньшего к большему.
+    CODECS указывается, если кодеки файла удалось определить при нарезке
+    """
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    for video_file in sorted(video_files, key=lambda video_file: video_file.hls_bandwidth):
+        codecs = f',CODECS="{video_file.hls_codecs}"' if video_file.hls_codecs else ""
+        lines.append(
+            f"#EXT-X-STREAM-INF:BANDWIDTH={video_file.hls_bandwidth},"
+            f"AVERAGE-BANDWIDTH={video_file.hls_average_bandwidth}{codecs},"
+            f'RESOLUTION={RESOLUTIONS[video_file.quality]},NAME="{video_file.quality}"'
+        )
+        lines.append(f"{video_file.quality}/{PLAYLIST_NAME}")
+    return "\n".join(lines) + "\n"
+
+
+def media_playlist(video_file):
+    """
+    Медиа-плейлист качества; к именам сегментов добавляется ключ нарезки,
+    чтобы URL сегмента однозначно определял его содержимое
+    """
+    key = video_file.hls_key
+    path = video_storage().path(f"{package_dir(key)}/{PLAYLIST_NAME}")
+    with open(path, encoding="utf-8") as file:
+        text = file.read()
+    lines = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        lines.append(line if not stripped or stripped.startswith("#") else f"{key}/{stripped}")
+    return "\n".join(lines) + "\n"
+
+
+def segment_file(key, segment):
+    name = f"{package_dir(key)}/{segment}"
+    return StoredFile(name, video_storage().path(name))
+
+
+def playlist_etag(body):
+    return f'"{md5(body.encode("utf-8")).hexdigest()}"'
@@ -0,0 +1,296 @@
+"""
+Замеры каждого запроса: время и количество SQL-запросов, время сериализации ответа,
+размер ответа. Результат отдается клиенту в заголовке Server-Timing и накапливается
+в гистограммах процесса, которые отдает эндпоинт /metrics в формате Prometheus.
+Повторяющиеся запросы (N+1) определяются по отпечатку SQL без значений параметров
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from .caching import cache_stats
+from .streaming import stream_in_context
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("request_stats", default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+FINGERPRINT_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+def fingerprint(sql):
+    """
+    SQL без значений: литералы и списки IN заменены, поэтому одинаковые по сути запросы
+    с разными параметрами дают одинаковый отпечаток
+    """
+    for pattern, replacement in FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.fingerprints = Counter()
+        self.slow_queries = []
+        self.timings = Counter()
+
+
+@contextmanager
+def measure(name):
+    """
+    Добавляет время блока к замеру name текущего запроса (например, serialize)
+    """
+    stats = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.timings[name] += time.perf_counter() - started
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Обертка выполнения SQL (connection.execute_wrapper): время и отпечаток запроса
+    """
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        stats.db_time += duration
+        stats.queries += 1
+        stats.fingerprints[fingerprint(sql)] += 1
+        if duration * 1000 >= settings.PERF_SLOW_QUERY_MS:
+            stats.slow_queries.append((duration, sql))
+
+
+def install_query_recorder(connection):
+    # connection_created приходит при каждом подключении (и при выдаче соединения из пула)
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name, self.help_text, self.buckets = name, help_text, buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * len(self.buckets) + [0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self.series.items()):
+            label_text = format_labels(labels)
+            for bound, count in zip(self.buckets, series):
+                yield f'{self.name}_bucket{{{label_text},le="{bound}"}} {count}'
+            yield f'{self.name}_bucket{{{label_text},le="+Inf"}} {series[-1]}'
+            yield f"{self.name}_sum{{{label_text}}} {series[-2]}"
+            yield f"{self.name}_count{{{label_text}}} {series[-1]}"
+
+
+class CounterMetric:
+    def __init__(self, name, help_text):
+        self.name, self.help_text = name, help_text
+        self.series = Counter()
+
+    def inc(self, labels, value=1):
+        self.series[labels] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self.series.items()):
+            yield f"{self.name}{{{format_labels(labels)}}} {value}"
+
+
+REQUEST_LABELS = ("route", "method", "status")
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_labels(labels):
+    return ",".join(
+        f'{name}="{escape_label(value)}"' for name, value in zip(REQUEST_LABELS, labels)
+    )
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_metrics_lock = threading.Lock()
+METRICS = {
+    "duration": Histogram(
+        "http_request_duration_seconds", "Время обработки запроса", DURATION_BUCKETS
+    ),
+    "db": Histogram("http_request_db_seconds", "Время SQL-запросов запроса", DURATION_BUCKETS),
+    "serialize": Histogram(
+        "http_request_serialize_seconds", "Время сериализации ответа", DURATION_BUCKETS
+    ),
+    "queries": Histogram("http_request_queries", "SQL-запросов на запрос", QUERIES_BUCKETS),
+    "size": Histogram("http_response_size_bytes", "Размер ответа", SIZE_BUCKETS),
+    "slow": CounterMetric("db_slow_queries_total", "Медленных SQL-запросов"),
+    "duplicates": CounterMetric(
+        "db_duplicate_queries_total", "Повторов одинаковых SQL-запросов (N+1)"
+    ),
+}
+
+
+def process_metrics():
+    """
+    Счетчики кэша видео и состояние пула соединений процесса
+    """
+    stats = cache_stats()
+    yield "# HELP video_cache_requests_total Обращений к кэшу ответов видео"
+    yield "# TYPE video_cache_requests_total counter"
+    yield f'video_cache_requests_total{{result="hit"}} {stats["hits"]}'
+    yield f'video_cache_requests_total{{result="miss"}} {stats["misses"]}'
+    pool = getattr(connections["default"], "pool", None)
+    if pool is not None:
+        pool_stats = pool.get_stats()
+        for key in ("pool_size", "pool_available", "requests_waiting"):
+            yield f"# TYPE db_{key} gauge"
+            yield f"db_{key} {pool_stats.get(key, 0)}"
+
+
+def render_metrics():
+    with _metrics_lock:
+        lines = [line for metric in METRICS.values() for line in metric.render()]
+    lines.extend(process_metrics())
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics():
+    with _metrics_lock:
+        for metric in METRICS.values():
+            metric.series.clear()
+
+
+def route_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.route if match is not None else "unmatched"
+
+
+class PerformanceMiddleware:
+    """
+    Замеры запроса: заголовок Server-Timing (db, serialize, app, total), гистограммы для /metrics,
+    предупреждения в лог о медленных SQL-запросах и о повторах одного запроса (N+1).
+    У потокового ответа Server-Timing отражает только время до отправки заголовков, а SQL-запросы
+    тела попадают в гистограммы и лог, когда ответ закрыт
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        if settings.PERF_SERVER_TIMING:
+            total = time.perf_counter() - stats.started
+            serialize = stats.timings["serialize"]
+            response["Server-Timing"] = ", ".join(
+                [
+                    f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+                    f"serialize;dur={serialize * 1000:.1f}",
+                    f"app;dur={max(total - stats.db_time - serialize, 0) * 1000:.1f}",
+                    f"total;dur={total * 1000:.1f}",
+                ]
+            )
+        if response.streaming:
+            stream_in_context(response, _current, stats)
+            response._resource_closers.append(lambda: self.record(request, response, stats))
+        else:
+            self.record(request, response, stats)
+        return response
+
+    def record(self, request, response, stats):
+        total = time.perf_counter() - stats.started
+        serialize = stats.timings["serialize"]
+        labels = (route_name(request), request.method, response.status_code)
+        duplicates = {
+            sql: count
+            for sql, count in stats.fingerprints.items()
+            if count >= settings.PERF_DUPLICATE_QUERY_THRESHOLD
+        }
+        for sql, count in duplicates.items():
+            logger.warning(
+                "%s %s: один и тот же запрос выполнен %s раз (N+1?): %s",
+                request.method,
+                request.path,
+                count,
+                sql,
+            )
+        for duration, sql in stats.slow_queries:
+            logger.warning(
+                "%s %s: медленный запрос %.1f мс: %s",
+                request.method,
+                request.path,
+                duration * 1000,
+                sql,
+            )
+
+        with _metrics_lock:
+            METRICS["duration"].observe(labels, total)
+            METRICS["db"].observe(labels, stats.db_time)
+            METRICS["serialize"].observe(labels, serialize)
+            METRICS["queries"].observe(labels, stats.queries)
+            if not response.streaming:
+                METRICS["size"].observe(labels, len(response.content))
+            if stats.slow_queries:
+                METRICS["slow"].inc(labels, len(stats.slow_queries))
+            if duplicates:
+                METRICS["duplicates"].inc(labels, sum(duplicates.values()))
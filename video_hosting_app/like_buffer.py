@@ -0,0 +1,206 @@
+import fcntl
+import os
+import time
+import uuid
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from .caching import invalidate_videos
+from .models import Like, LikeBufferBatch, Video, VideoLikeShard
+
+JOURNAL_NAME = "likes.log"
+FLUSHING_SUFFIX = ".flushing"
+
+
+def journal_path():
+    return os.path.join(settings.LIKE_BUFFER_DIR, JOURNAL_NAME)
+
+
+def append_like_event(video_id, user_id):
+    """
+    Дописывает событие переключения лайка в журнал, без обращения к базе.
+    Журнал общий для всех процессов: запись идет под flock, и если журнал
+    был переименован командой flush_likes между open и flock, запись повторяется в новый файл
+    """
+    os.makedirs(settings.LIKE_BUFFER_DIR, exist_ok=True)
+    path = journal_path()
+    line = f"{video_id} {user_id}\n".encode("ascii")
+    while True:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if os.fstat(fd).st_ino != current.st_ino:
+                continue
+            os.write(fd, line)
+            if settings.LIKE_BUFFER_FSYNC:
+                os.fsync(fd)
+            return
+        finally:
+            os.close(fd)
+
+
+def rotate_journal():
+    """
+    Переименовывает текущий журнал в файл *.flushing и дожидается писателей,
+    успевших открыть его до переименования
+    """
+    path = journal_path()
+    if not os.path.exists(path):
+        return
+    flushing = os.path.join(
+        settings.LIKE_BUFFER_DIR,
+        f"likes-{time.time_ns()}-{uuid.uuid4().hex[:8]}{FLUSHING_SUFFIX}",
+    )
+    os.rename(path, flushing)
+    with open(flushing, "rb") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+
+
+def pending_journals():
+    if not os.path.isdir(settings.LIKE_BUFFER_DIR):
+        return []
+    return sorted(
+        os.path.join(settings.LIKE_BUFFER_DIR, name)
+        for name in os.listdir(settings.LIKE_BUFFER_DIR)
+        if name.endswith(FLUSHING_SUFFIX)
+    )
+
+
+def read_events(path):
+    events = []
+    with open(path, "rb") as file:
+        for line in file:
+            parts = line.split()
+            # Оборванная при падении последняя строка пропускается
+            if len(parts) == 2 and line.endswith(b"\n"):
+                events.append((int(parts[0]), int(parts[1])))
+    return events
+
+
+def apply_like_events(events):
+    """
+    Применяет пачку событий переключения лайков.
+    Четное число переключений пары (видео, пользователь) взаимно уничтожается,
+    для остальных пар существующие лайки удаляются одним DELETE ... RETURNING,
+    недостающие создаются одним bulk_create (и то и другое - только у опубликованных видео,
+    как в синхронном переключении), а изменения счетчиков пишутся
+    одним UPSERT в шарды и одним UPDATE ... FROM (VALUES ...) в Video.total_likes.
+    Шарды отмечаются для пересчета: параллельный aggregate_like_shards мог посчитать сумму
+    до этой пачки и записать ее в total_likes поверх нашего обновления.
+    Должна вызываться внутри транзакции
+    """
+    toggled = [pair for pair, count in Counter(events).items() if count % 2]
+    if not toggled:
+        return 0
+
+    pairs_sql = ", ".join(["(%s, %s)"] * len(toggled))
+    pairs_params = [value for pair in toggled for value in pair]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            DELETE FROM {Like._meta.db_table} AS l
+            USING {Video._meta.db_table} AS v
+            WHERE v.id = l.video_id AND v.is_published
+                AND (l.video_id, l.user_id) IN (VALUES {pairs_sql})
+            RETURNING l.video_id, l.user_id
+            """,
+            pairs_params,
+        )
+        deleted = set(cursor.fetchall())
+
+    to_create = [pair for pair in toggled if pair not in deleted]
+    published = set(
+        Video.objects.filter(
+            pk__in={video_id for video_id, _ in to_create}, is_published=True
+        ).values_list("id", flat=True)
+    )
+    users = set(
+        User.objects.filter(pk__in={user_id for _, user_id in to_create}).values_list(
+            "id", flat=True
+        )
+    )
+    to_create = [
+        (video_id, user_id)
+        for video_id, user_id in to_create
+        if video_id in published and user_id in users
+    ]
+    Like.objects.bulk_create(
+        [Like(video_id=video_id, user_id=user_id) for video_id, user_id in to_create],
+        ignore_conflicts=True,
+    )
+
+    deltas = defaultdict(int)
+    for video_id, _ in deleted:
+        deltas[video_id] -= 1
+    for video_id, _ in to_create:
+        deltas[video_id] += 1
+    deltas = {video_id: delta for video_id, delta in deltas.items() if delta}
+    if deltas:
+        values_sql = ", ".join(["(%s, %s)"] * len(deltas))
+        values_params = [value for item in deltas.items() for value in item]
+        shard_table = VideoLikeShard._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {shard_table} (video_id, shard, count, dirty)
+                SELECT delta.video_id, 0, delta.value, TRUE
+                FROM (VALUES {values_sql}) AS delta (video_id, value)
+                JOIN {Video._meta.db_table} AS video ON video.id = delta.video_id
+                ON CONFLICT (video_id, shard) DO UPDATE
+                SET count = {shard_table}.count + EXCLUDED.count, dirty = TRUE
+                """,
+                values_params,
+            )
+            cursor.execute(
+                f"""
+                UPDATE {Video._meta.db_table} AS video
+                SET total_likes = video.total_likes + delta.value, updated_at = NOW()
+                FROM (VALUES {values_sql}) AS delta (video_id, value)
+                WHERE video.id = delta.video_id
+                """,
+                values_params,
+            )
+        transaction.on_commit(lambda: invalidate_videos(list(deltas)))
+    return len(deleted) + len(to_create)
+
+
+def flush_journal(path, batch_size):
+    """
+    Применяет журнал пачками по batch_size событий, каждая пачка - отдельная транзакция,
+    в которой же записывается LikeBufferBatch с именем пачки. Пачка, уже записанная
+    до падения процесса, при повторной обработке журнала пропускается,
+    поэтому каждое событие применяется ровно один раз. После всех пачек удаляется файл,
+    а затем и отметки его пачек
+    """
+    name = os.path.basename(path)
+    events = iter(read_events(path))
+    applied = 0
+    index = 0
+    while batch := list(islice(events, batch_size)):
+        batch_name = f"{name}:{index}"
+        with transaction.atomic():
+            if not LikeBufferBatch.objects.filter(name=batch_name).exists():
+                applied += apply_like_events(batch)
+                LikeBufferBatch.objects.create(name=batch_name)
+        index += 1
+    os.remove(path)
+    LikeBufferBatch.objects.filter(name__startswith=f"{name}:").delete()
+    return applied
+
+
+def flush_like_buffer(batch_size):
+    """
+    Ротирует журнал и применяет все ожидающие файлы *.flushing,
+    включая оставшиеся после падения предыдущего запуска.
+    Возвращает количество изменившихся лайков
+    """
+    rotate_journal()
+    return sum(flush_journal(path, batch_size) for path in pending_journals())
@@ -0,0 +1,115 @@
+import random
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .caching import invalidate_videos
+
+from .models import Like, Video, VideoLikeShard
+
+
+def add_like_delta(video_id, delta):
+    """
+    Прибавляет delta к случайному шарду счетчика лайков видео одним UPSERT-запросом
+    и отмечает шард для пересчета (dirty).
+    Конкурирующие лайки одного видео блокируют разные строки, а не строку Video
+    """
+    shard = random.randrange(settings.LIKE_COUNTER_SHARDS)
+    table = VideoLikeShard._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (video_id, shard, count, dirty)
+            VALUES (%s, %s, %s, TRUE)
+            ON CONFLICT (video_id, shard) DO UPDATE
+            SET count = {table}.count + EXCLUDED.count, dirty = TRUE
+            """,
+            [video_id, shard, delta],
+        )
+
+
+def toggle_like(video_id, user_id):
+    """
+    Переключает лайк пользователя на видео одним запросом: DELETE ... RETURNING,
+    а если удалять нечего - INSERT ... ON CONFLICT DO NOTHING RETURNING,
+    оба только для опубликованного видео.
+    Возвращает (опубликовано ли видео, id лайка, создан ли лайк),
+    если лайк не удален и не создан из-за параллельного запроса, id лайка - None.
+    Если видео нет, выбрасывает Video.DoesNotExist
+    """
+    video_table, like_table = Video._meta.db_table, Like._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH video AS (
+                SELECT is_published FROM {video_table} WHERE id = %(video_id)s
+            ),
+            deleted AS (
+                DELETE FROM {like_table}
+                WHERE video_id = %(video_id)s AND user_id = %(user_id)s
+                    AND EXISTS (SELECT 1 FROM video WHERE is_published)
+                RETURNING id
+            ),
+            inserted AS (
+                INSERT INTO {like_table} (video_id, user_id)
+                SELECT %(video_id)s, %(user_id)s
+                WHERE NOT EXISTS (SELECT 1 FROM deleted)
+                    AND EXISTS (SELECT 1 FROM video WHERE is_published)
+                ON CONFLICT (video_id, user_id) DO NOTHING
+                RETURNING id
+            )
+            SELECT
+                (SELECT is_published FROM video),
+                (SELECT id FROM deleted),
+                (SELECT id FROM inserted)
+            """,
+            {"video_id": video_id, "user_id": user_id},
+        )
+        is_published, deleted_id, inserted_id = cursor.fetchone()
+    if is_published is None:
+        raise Video.DoesNotExist
+    if inserted_id is not None:
+        return is_published, inserted_id, True
+    return is_published, deleted_id, False
+
+
+def aggregate_like_shards(video_ids=None, all_videos=False):
+    """
+    Записывает в Video.total_likes сумму шардов счетчика для видео, шарды которых изменились
+    с прошлого пересчета (VideoLikeShard.dirty), для video_ids или, с all_videos, для всех видео
+    с шардами. Обновляются только видео, у которых значение изменилось, их кэш сбрасывается.
+    Отметки снимаются до подсчета сумм в той же транзакции: UPDATE ждет незафиксированные
+    записи этих шардов, поэтому они попадают в сумму, а более поздние записи снова ставят отметку.
+    Возвращает количество обновленных видео
+    """
+    shard_table = VideoLikeShard._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        if video_ids is None and not all_videos:
+            cursor.execute(
+                f"UPDATE {shard_table} SET dirty = FALSE WHERE dirty RETURNING video_id"
+            )
+            video_ids = {row[0] for row in cursor.fetchall()}
+            if not video_ids:
+                return 0
+        where, params = "", []
+        if video_ids is not None:
+            where, params = "WHERE video_id = ANY(%s)", [list(video_ids)]
+        cursor.execute(
+            f"""
+            UPDATE {Video._meta.db_table} AS video
+            SET total_likes = shards.total, updated_at = NOW()
+            FROM (
+                SELECT video_id, SUM(count) AS total
+                FROM {shard_table}
+                {where}
+                GROUP BY video_id
+            ) AS shards
+            WHERE video.id = shards.video_id AND video.total_likes <> shards.total
+            RETURNING video.id
+            """,
+            params,
+        )
+        updated = [row[0] for row in cursor.fetchall()]
+        if updated:
+            transaction.on_commit(lambda: invalidate_videos(updated))
+    return len(updated)
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from video_hosting_app.likes import aggregate_like_shards
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает Video.total_likes как сумму шардов счетчика лайков"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--video",
+            type=int,
+            nargs="+",
+            dest="video_ids",
+            help="id видео для пересчета, по умолчанию видео с измененными шардами",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            dest="all_videos",
+            help="пересчитать все видео с шардами",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="повторять пересчет каждые N секунд, 0 - выполнить один раз",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            updated = aggregate_like_shards(options["video_ids"], options["all_videos"])
+            self.stdout.write(f"Обновлено видео: {updated}")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
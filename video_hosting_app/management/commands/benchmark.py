@@ -0,0 +1,286 @@
+import json
+import platform
+import random
+import subprocess
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from video_hosting_app.db import close_connections_before_fork
+from video_hosting_app.models import Video
+from video_hosting_app.seeding import seed_data
+from video_hosting_app.serializers import UserTokenObtainPairSerializer
+
+STAFF_USERNAME = "benchmark_staff"
+SAMPLE_VIDEOS = 1000
+
+
+def percentile(values, percent):
+    """
+    Процентиль по отсортированному списку (метод ближайшего ранга)
+    """
+    if not values:
+        return None
+    return values[max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))]
+
+
+def run_client(route, client_index, duration, warmup):
+    """
+    Один клиент: запросы маршрута подряд в течение duration секунд после warmup запросов.
+    Возвращает задержки (секунды), количество SQL-запросов, размеры ответов и коды ответов
+    """
+    client = Client()
+    headers = route["headers"][client_index % len(route["headers"])]
+    rng = random.Random(client_index)
+    method = getattr(client, route["method"])
+    latencies, queries, sizes, statuses = [], [], [], Counter()
+
+    for _ in range(warmup):
+        method(rng.choice(route["paths"]), **headers)
+
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        path = rng.choice(route["paths"])
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = method(path, **headers)
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+            latencies.append(time.perf_counter() - started)
+        queries.append(len(captured))
+        sizes.append(size)
+        statuses[response.status_code] += 1
+    connection.close()
+    return latencies, queries, sizes, statuses
+
+
+def summarize(results, duration):
+    latencies = sorted(value for result in results for value in result[0])
+    queries = [value for result in results for value in result[1]]
+    sizes = [value for result in results for value in result[2]]
+    statuses = sum((result[3] for result in results), Counter())
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": sum(number for code, number in statuses.items() if code >= 400),
+        "status_codes": {str(code): number for code, number in sorted(statuses.items())},
+        "throughput_rps": count / duration,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000 if count else None,
+            "p95": percentile(latencies, 95) * 1000 if count else None,
+            "p99": percentile(latencies, 99) * 1000 if count else None,
+            "mean": sum(latencies) / count * 1000 if count else None,
+            "max": latencies[-1] * 1000 if count else None,
+        },
+        "queries": {
+            "mean": sum(queries) / count if count else None,
+            "max": max(queries, default=None),
+        },
+        "bytes": {
+            "mean": sum(sizes) / count if count else None,
+            "max": max(sizes, default=None),
+        },
+    }
+
+
+def format_number(value, spec):
+    """
+    Число по формату spec или прочерк той же ширины, если значения нет (нет запросов)
+    """
+    if value is None:
+        return format("-", f">{spec.split('.')[0]}")
+    return format(value, spec)
+
+
+def summary_line(name, result):
+    """
+    Строка краткой сводки маршрута для вывода рядом с файлом --output
+    """
+    latency = result["latency_ms"]
+    return (
+        f"{name:<22} {result['throughput_rps']:8.1f} req/s  "
+        f"p50 {format_number(latency['p50'], '7.2f')}  "
+        f"p95 {format_number(latency['p95'], '7.2f')}  "
+        f"p99 {format_number(latency['p99'], '7.2f')} мс  "
+        f"SQL {format_number(result['queries']['mean'], '5.1f')}  "
+        f"{format_number(result['bytes']['mean'], '9.0f')} B  ошибок {result['errors']}"
+    )
+
+
+def bearer(user):
+    token = UserTokenObtainPairSerializer.get_token(user).access_token
+    return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк эндпоинтов: заполняет отдельную тестовую базу данными заданного размера "
+        "(seed_data), нагружает каждый маршрут параллельными клиентами и выводит в JSON "
+        "p50/p95/p99 задержки, пропускную способность, число SQL-запросов и размер ответа"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="пользователей в данных")
+        parser.add_argument("--videos", type=int, default=10000, help="видео в данных")
+        parser.add_argument("--likes", type=int, default=100000, help="лайков в данных")
+        parser.add_argument("--duration", type=float, default=5, help="секунд на маршрут")
+        parser.add_argument("--warmup", type=int, default=20, help="запросов прогрева на клиента")
+        parser.add_argument(
+            "--concurrency", type=int, default=4, help="параллельных клиентов (процессов)"
+        )
+        parser.add_argument("--page-size", type=int, default=20, help="размер страницы списков")
+        parser.add_argument(
+            "--routes", default="", help="маршруты через запятую, по умолчанию все"
+        )
+        parser.add_argument("--output", help="файл для JSON-результата, по умолчанию stdout")
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="не удалять тестовую базу и использовать уже заполненную при повторном запуске",
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity=0, interactive=False, keepdb=options["keepdb"], aliases={"default"}
+        )
+        try:
+            report = self.run(options)
+        finally:
+            close_connections_before_fork()
+            teardown_databases(old_config, verbosity=0, keepdb=options["keepdb"])
+
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(data)
+            for name, result in report["routes"].items():
+                self.stdout.write(summary_line(name, result))
+        else:
+            self.stdout.write(data)
+
+    def seed(self, options):
+        if not Video.objects.exists():
+            seed_data(
+                users=options["users"], videos=options["videos"], likes=options["likes"], seed=1
+            )
+        staff, _ = User.objects.get_or_create(
+            username=STAFF_USERNAME, defaults={"is_staff": True}
+        )
+        return staff
+
+    def get_routes(self, options, staff):
+        users = list(User.objects.filter(is_staff=False).order_by("id")[: options["concurrency"]])
+        if not users:
+            raise CommandError("В базе нет пользователей")
+        videos = list(
+            Video.objects.filter(is_published=True)
+            .order_by("?")
+            .values_list("id", flat=True)[:SAMPLE_VIDEOS]
+        )
+        if not videos:
+            raise CommandError("В базе нет опубликованных видео")
+
+        anonymous, user_headers, staff_headers = [{}], [bearer(users[0])], [bearer(staff)]
+        list_path = f"{reverse('video_hosting_app:list')}?page_size={options['page_size']}"
+        stats_query = f"?page_size={options['page_size']}"
+        return {
+            "list_anonymous": ("get", [list_path], anonymous),
+            "list_authenticated": ("get", [list_path], user_headers),
+            "list_staff": ("get", [list_path], staff_headers),
+            "retrieve": (
+                "get",
+                [reverse("video_hosting_app:retrieve", kwargs={"pk": pk}) for pk in videos],
+                anonymous,
+            ),
+            # У каждого клиента свой пользователь, чтобы параллельные переключения
+            # одного лайка не конфликтовали
+            "like_toggle": (
+                "post",
+                [reverse("video_hosting_app:like", kwargs={"video_id": pk}) for pk in videos],
+                [bearer(user) for user in users],
+            ),
+            "ids": ("get", [reverse("video_hosting_app:ids_list")], staff_headers),
+            "statistics_subquery": (
+                "get",
+                [reverse("video_hosting_app:statistics_subquery") + stats_query],
+                staff_headers,
+            ),
+            "statistics_group_by": (
+                "get",
+                [reverse("video_hosting_app:statistics-group-by") + stats_query],
+                staff_headers,
+            ),
+        }
+
+    def run(self, options):
+        staff = self.seed(options)
+        routes = self.get_routes(options, staff)
+        if options["routes"]:
+            names = options["routes"].split(",")
+            unknown = set(names) - set(routes)
+            if unknown:
+                raise CommandError(f"Неизвестные маршруты: {', '.join(sorted(unknown))}")
+            routes = {name: routes[name] for name in names}
+
+        report = {
+            "started_at": timezone.now().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "settings": {
+                key: options[key]
+                for key in ("users", "videos", "likes", "duration", "warmup", "concurrency")
+            },
+            "dataset": {
+                "users": User.objects.count(),
+                "videos": Video.objects.count(),
+                "published_videos": Video.objects.filter(is_published=True).count(),
+            },
+            "routes": {},
+        }
+        for name, (method, paths, headers) in routes.items():
+            route = {"method": method, "paths": paths, "headers": headers}
+            close_connections_before_fork()
+            with Pool(options["concurrency"]) as pool:
+                results = pool.starmap(
+                    run_client,
+                    [
+                        (route, index, options["duration"], options["warmup"])
+                        for index in range(options["concurrency"])
+                    ],
+                )
+            # Все клиенты нагружают маршрут одновременно duration секунд после прогрева
+            report["routes"][name] = summarize(results, options["duration"])
+            self.stderr.write(f"{name}: {report['routes'][name]['requests']} запросов")
+        return report
@@ -0,0 +1,121 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F, Q
+
+from video_hosting_app.models import UserLikesStats, Video, VideoFile
+from video_hosting_app.search import search_videos
+
+INDEX_NODES = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+
+def walk_plan(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk_plan(child)
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет EXPLAIN ANALYZE для запросов каждого эндпоинта и показывает, "
+        "используется ли индекс или последовательное сканирование"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--page-size", type=int, default=100, help="размер страницы списка видео"
+        )
+        parser.add_argument(
+            "--analyze-tables",
+            action="store_true",
+            help="перед проверкой выполнить ANALYZE для таблиц приложения",
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="вывести результат в формате JSON"
+        )
+
+    def get_querysets(self, page_size):
+        """
+        Запросы эндпоинтов в том виде, в котором их выполняют представления
+        """
+        video = Video.objects.filter(is_published=True).order_by("-created_at", "-id")
+        offset = video.count() // 2
+        middle = video.values("created_at", "id")[offset : offset + 1]
+        if not middle:
+            raise CommandError("Нет опубликованных видео, сначала заполните базу")
+        middle = middle[0]
+        owner = User.objects.filter(videos__isnull=False).order_by("id").first()
+        page = list(video.values_list("id", flat=True)[:page_size])
+        deep_page = Q(created_at__lt=middle["created_at"]) | Q(
+            created_at=middle["created_at"], id__lt=middle["id"]
+        )
+
+        return {
+            "list anonymous": video.select_related("owner")[: page_size + 1],
+            "list anonymous deep page": video.filter(created_at__lte=middle["created_at"])
+            .filter(deep_page)
+            .select_related("owner")[: page_size + 1],
+            "list authenticated": Video.objects.filter(Q(owner=owner) | Q(is_published=True))
+            .order_by("-created_at", "-id")
+            .select_related("owner")[: page_size + 1],
+            "list staff": Video.objects.order_by("-created_at", "-id").select_related(
+                "owner"
+            )[: page_size + 1],
+            "list video files prefetch": VideoFile.objects.filter(video_id__in=page).only(
+                "id", "video_id", "file", "quality"
+            ),
+            "retrieve": Video.objects.select_related("owner").filter(pk=middle["id"]),
+            "search": search_videos(Video.objects.filter(is_published=True), str(middle["id"]))
+            .order_by("-rank", "-id")
+            .select_related("owner")[: page_size + 1],
+            "ids": Video.objects.filter(is_published=True).order_by("id").values_list(
+                "id", flat=True
+            ),
+            "statistics subquery": UserLikesStats.objects.order_by(
+                "-published_likes", "user_id"
+            ).values(username=F("user__username"), likes_sum=F("published_likes"))[
+                :page_size
+            ],
+            "statistics group by": UserLikesStats.objects.filter(videos_count__gt=0)
+            .order_by("-total_likes", "user_id")
+            .values(username=F("user__username"), likes_sum=F("total_likes"))[
+                :page_size
+            ],
+        }
+
+    def explain(self, queryset):
+        plan = json.loads(queryset.explain(format="json", analyze=True))[0]
+        nodes = list(walk_plan(plan["Plan"]))
+        return {
+            "execution_ms": plan["Execution Time"],
+            "indexes": sorted(
+                {node["Index Name"] for node in nodes if node["Node Type"] in INDEX_NODES}
+            ),
+            "seq_scans": sorted(
+                {node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"}
+            ),
+        }
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Команда работает только с PostgreSQL")
+        if options["analyze_tables"]:
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        report = {
+            name: self.explain(queryset)
+            for name, queryset in self.get_querysets(options["page_size"]).items()
+        }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+        for name, result in report.items():
+            if result["seq_scans"]:
+                verdict = self.style.WARNING(f"SEQ SCAN {', '.join(result['seq_scans'])}")
+            else:
+                verdict = self.style.SUCCESS(f"INDEX {', '.join(result['indexes'])}")
+            self.stdout.write(f"{name:<28} {result['execution_ms']:>10.3f} ms  {verdict}")
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from video_hosting_app.like_buffer import flush_like_buffer
+
+
+class Command(BaseCommand):
+    help = "Применяет журнал отложенных лайков (режим LIKE_WRITE_BEHIND) пачками"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="количество событий в одной транзакции",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="повторять применение каждые N секунд, 0 - выполнить один раз",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            applied = flush_like_buffer(options["batch_size"])
+            self.stdout.write(f"Изменено лайков: {applied}")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from video_hosting_app.blobs import sweep_blobs
+from video_hosting_app.uploads import expire_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет файлы хранилища видео, на которые не ссылается ни один VideoFile, "
+        "и незавершенные загрузки старше VIDEO_UPLOAD_EXPIRY секунд"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать файлы, которые будут удалены",
+        )
+
+    def handle(self, *args, **options):
+        removed = sweep_blobs(dry_run=options["dry_run"])
+        for name in removed:
+            self.stdout.write(name)
+        self.stdout.write(f"Файлов без ссылок: {len(removed)}")
+        expired = expire_uploads(dry_run=options["dry_run"])
+        for name in expired:
+            self.stdout.write(name)
+        self.stdout.write(f"Брошенных загрузок: {len(expired)}")
@@ -0,0 +1,138 @@
+import http.client
+import os
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def run_client(url, duration):
+    """
+    Один клиент нагрузки: запросы подряд по keep-alive соединению в течение duration секунд.
+    Возвращает (успешных запросов, ошибок, суммарное время ответов)
+    """
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    done = errors = 0
+    latency = 0.0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status < 500
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            ok = False
+        latency += time.monotonic() - started
+        if ok:
+            done += 1
+        else:
+            errors += 1
+    connection.close()
+    return done, errors, latency
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест: запросы в секунду к эндпоинту. С --workers запускает gunicorn "
+        "(gunicorn.conf.py) с разным числом процессов и показывает масштабирование по ядрам"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            default="http://127.0.0.1:8000/v1/videos/",
+            help="адрес запроса; с --workers используются только путь и параметры",
+        )
+        parser.add_argument(
+            "--workers",
+            default="",
+            help="список количеств процессов gunicorn через запятую, например 1,2,4",
+        )
+        parser.add_argument("--duration", type=float, default=10, help="секунд на замер")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=(os.cpu_count() or 1) * 4,
+            help="одновременных клиентов (процессов)",
+        )
+        parser.add_argument("--port", type=int, default=8765, help="порт запускаемого gunicorn")
+
+    def handle(self, *args, **options):
+        if not options["workers"]:
+            self.report("-", self.measure(options["url"], options))
+            return
+
+        parts = urlsplit(options["url"])
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        url = f"http://127.0.0.1:{options['port']}{path}"
+        for workers in [int(value) for value in options["workers"].split(",")]:
+            server = self.start_server(workers, options["port"], url)
+            try:
+                self.report(workers, self.measure(url, options))
+            finally:
+                server.terminate()
+                server.wait()
+
+    def start_server(self, workers, port, url):
+        env = {
+            **os.environ,
+            "GUNICORN_WORKERS": str(workers),
+            "GUNICORN_BIND": f"127.0.0.1:{port}",
+        }
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                "video_hosting.wsgi",
+                "-c",
+                os.path.join(settings.BASE_DIR, "gunicorn.conf.py"),
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError("gunicorn завершился при запуске")
+            try:
+                parts = urlsplit(url)
+                connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=5)
+                connection.request("GET", parts.path)
+                connection.getresponse().read()
+                connection.close()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError("gunicorn не ответил за 30 секунд")
+
+    def measure(self, url, options):
+        concurrency, duration = options["concurrency"], options["duration"]
+        with Pool(concurrency) as pool:
+            results = pool.starmap(run_client, [(url, duration)] * concurrency)
+        done = sum(result[0] for result in results)
+        errors = sum(result[1] for result in results)
+        latency = sum(result[2] for result in results)
+        return {
+            "rps": done / duration,
+            "errors": errors,
+            "avg_ms": latency / max(done + errors, 1) * 1000,
+        }
+
+    def report(self, workers, result):
+        self.stdout.write(
+            f"процессов: {workers:>3}  запросов/с: {result['rps']:9.1f}  "
+            f"среднее: {result['avg_ms']:7.1f} мс  ошибок: {result['errors']}"
+        )
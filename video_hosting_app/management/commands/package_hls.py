@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from video_hosting_app.transcoding import enqueue_missing_packaging
+
+
+class Command(BaseCommand):
+    help = (
+        "Ставит в очередь нарезку HLS видео-файлов, у которых ее нет "
+        "(например, загруженных до появления нарезки); выполняет задачи transcode_worker"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--codecs",
+            action="store_true",
+            help="также нарезанные файлы с неопределенными кодеками (для CODECS плейлиста)",
+        )
+
+    def handle(self, *args, **options):
+        count = enqueue_missing_packaging(with_codecs=options["codecs"])
+        self.stdout.write(f"Поставлено в очередь файлов: {count}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from video_hosting_app.statistics import refresh_user_likes_stats
+
+
+class Command(BaseCommand):
+    help = "Полностью пересчитывает материализованную статистику лайков по пользователям"
+
+    def handle(self, *args, **options):
+        updated = refresh_user_likes_stats()
+        self.stdout.write(f"Обновлено строк статистики: {updated}")
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from video_hosting_app.seeding import SEED_PASSWORD, seed_data
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу тестовыми данными через COPY: пользователи, видео, видео-файлы "
+        f"и лайки со степенным распределением по видео. Пароль пользователей - {SEED_PASSWORD}"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000, help="количество пользователей")
+        parser.add_argument("--videos", type=int, default=100000, help="количество видео")
+        parser.add_argument(
+            "--likes", type=int, default=1000000, help="примерное количество лайков"
+        )
+        parser.add_argument(
+            "--published-ratio", type=float, default=0.5, help="доля опубликованных видео"
+        )
+        parser.add_argument(
+            "--likes-exponent",
+            type=float,
+            default=1.0,
+            help="показатель степени закона Ципфа: чем больше, тем сильнее лайки сосредоточены "
+            "на самых популярных видео",
+        )
+        parser.add_argument("--seed", type=int, help="зерно генератора для воспроизводимых данных")
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="предварительно удалить всех пользователей, видео и связанные с ними данные",
+        )
+
+    def handle(self, *args, **options):
+        if min(options["users"], options["videos"], options["likes"]) < 0:
+            raise CommandError("Количества не могут быть отрицательными")
+        if options["videos"] and not options["users"]:
+            raise CommandError("Для видео нужен хотя бы один пользователь")
+        if not 0 <= options["published_ratio"] <= 1:
+            raise CommandError("--published-ratio должен быть от 0 до 1")
+
+        started = time.monotonic()
+        created = seed_data(
+            users=options["users"],
+            videos=options["videos"],
+            likes=options["likes"],
+            published_ratio=options["published_ratio"],
+            exponent=options["likes_exponent"],
+            seed=options["seed"],
+            clear=options["clear"],
+        )
+        for table, count in created.items():
+            self.stdout.write(f"{table}: {count}")
+        self.stdout.write(f"Готово за {time.monotonic() - started:.1f} с")
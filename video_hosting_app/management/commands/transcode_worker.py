@@ -0,0 +1,38 @@
+import shlex
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from video_hosting_app.transcoding import default_workers, run_worker
+
+
+class Command(BaseCommand):
+    help = "Выполняет очередь перекодирования видео-файлов в пуле процессов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=0,
+            help="количество одновременных задач, 0 - TRANSCODE_JOBS_PER_CORE на ядро",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="пауза между проверками очереди, секунд",
+        )
+        parser.add_argument(
+            "--drain",
+            action="store_true",
+            help="завершиться, когда в очереди не останется готовых задач",
+        )
+
+    def handle(self, *args, **options):
+        executable = shlex.split(settings.TRANSCODE_ENCODER_COMMAND)[0]
+        if "{" not in executable and shutil.which(executable) is None:
+            raise CommandError(f"Кодировщик {executable} не найден")
+        workers = options["workers"] or default_workers()
+        self.stdout.write(f"Воркер перекодирования: {workers} процесс(ов)")
+        run_worker(workers, options["interval"], options["drain"], self.stdout)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("video_hosting_app", "0003_alter_video_owner"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="video",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="video_created_at_id_idx"
+            ),
+        ),
+    ]
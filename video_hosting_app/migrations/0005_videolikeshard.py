@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("video_hosting_app", "0004_video_created_at_id_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VideoLikeShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("shard", models.PositiveSmallIntegerField()),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "video",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="like_shards",
+                        to="video_hosting_app.video",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("video", "shard"), name="video_like_shard_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.RunSQL(
+            sql=(
+                "INSERT INTO video_hosting_app_videolikeshard (video_id, shard, count) "
+                "SELECT id, 0, total_likes FROM video_hosting_app_video "
+                "WHERE total_likes > 0"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("video_hosting_app", "0005_videolikeshard"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Удаление дублей лайков с компенсацией в шарде 0 счетчика лайков
+        migrations.RunSQL(
+            sql="""
+            WITH removed AS (
+                DELETE FROM video_hosting_app_like AS duplicate
+                USING video_hosting_app_like AS original
+                WHERE duplicate.video_id = original.video_id
+                    AND duplicate.user_id = original.user_id
+                    AND duplicate.id > original.id
+                RETURNING duplicate.video_id
+            )
+            INSERT INTO video_hosting_app_videolikeshard (video_id, shard, count)
+            SELECT video_id, 0, -COUNT(*) FROM removed GROUP BY video_id
+            ON CONFLICT (video_id, shard) DO UPDATE
+            SET count = video_hosting_app_videolikeshard.count + EXCLUDED.count
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="like",
+            constraint=models.UniqueConstraint(
+                fields=("video", "user"), name="like_video_user_unique"
+            ),
+        ),
+    ]
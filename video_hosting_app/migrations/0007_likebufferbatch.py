@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("video_hosting_app", "0006_like_video_user_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LikeBufferBatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("applied_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+STATS_TABLE = "video_hosting_app_userlikesstats"
+VIDEO_TABLE = "video_hosting_app_video"
+
+CREATE_TRIGGERS_SQL = f"""
+CREATE FUNCTION video_hosting_app_video_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE {STATS_TABLE}
+        SET videos_count = videos_count - 1,
+            total_likes = total_likes - OLD.total_likes,
+            published_likes = published_likes
+                - CASE WHEN OLD.is_published THEN OLD.total_likes ELSE 0 END
+        WHERE user_id = OLD.owner_id;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        INSERT INTO {STATS_TABLE} (user_id, videos_count, total_likes, published_likes)
+        VALUES (
+            NEW.owner_id, 1, NEW.total_likes,
+            CASE WHEN NEW.is_published THEN NEW.total_likes ELSE 0 END
+        )
+        ON CONFLICT (user_id) DO UPDATE
+        SET videos_count = {STATS_TABLE}.videos_count + EXCLUDED.videos_count,
+            total_likes = {STATS_TABLE}.total_likes + EXCLUDED.total_likes,
+            published_likes = {STATS_TABLE}.published_likes
+                + EXCLUDED.published_likes;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER video_stats_insert_delete
+AFTER INSERT OR DELETE ON {VIDEO_TABLE}
+FOR EACH ROW EXECUTE FUNCTION video_hosting_app_video_stats();
+
+CREATE TRIGGER video_stats_update
+AFTER UPDATE OF owner_id, is_published, total_likes ON {VIDEO_TABLE}
+FOR EACH ROW
+WHEN (
+    (OLD.owner_id, OLD.is_published, OLD.total_likes)
+    IS DISTINCT FROM (NEW.owner_id, NEW.is_published, NEW.total_likes)
+)
+EXECUTE FUNCTION video_hosting_app_video_stats();
+
+CREATE FUNCTION video_hosting_app_user_stats() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO {STATS_TABLE} (user_id, videos_count, total_likes, published_likes)
+    VALUES (NEW.id, 0, 0, 0)
+    ON CONFLICT (user_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER user_stats_insert
+AFTER INSERT ON auth_user
+FOR EACH ROW EXECUTE FUNCTION video_hosting_app_user_stats();
+
+INSERT INTO {STATS_TABLE} (user_id, videos_count, total_likes, published_likes)
+SELECT
+    u.id,
+    COUNT(v.id),
+    COALESCE(SUM(v.total_likes), 0),
+    COALESCE(SUM(v.total_likes) FILTER (WHERE v.is_published), 0)
+FROM auth_user AS u
+LEFT JOIN {VIDEO_TABLE} AS v ON v.owner_id = u.id
+GROUP BY u.id;
+"""
+
+DROP_TRIGGERS_SQL = f"""
+DROP TRIGGER IF EXISTS user_stats_insert ON auth_user;
+DROP FUNCTION IF EXISTS video_hosting_app_user_stats();
+DROP TRIGGER IF EXISTS video_stats_update ON {VIDEO_TABLE};
+DROP TRIGGER IF EXISTS video_stats_insert_delete ON {VIDEO_TABLE};
+DROP FUNCTION IF EXISTS video_hosting_app_video_stats();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("video_hosting_app", "0007_likebufferbatch"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserLikesStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="likes_stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("videos_count", models.PositiveIntegerField(default=0)),
+                ("total_likes", models.BigIntegerField(default=0)),
+                ("published_likes", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["-total_likes", "user"], name="stats_total_likes_idx"
+                    ),
+                    models.Index(
+                        fields=["-published_likes", "user"],
+                        name="stats_published_likes_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunSQL(sql=CREATE_TRIGGERS_SQL, reverse_sql=DROP_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("video_hosting_app", "0009_video_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunSQL(
+            sql="UPDATE video_hosting_app_video SET updated_at = created_at",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:43
+
+import video_hosting_app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("video_hosting_app", "0011_uploadsession"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadsession",
+            name="sha256",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name="videofile",
+            name="file",
+            field=models.FileField(
+                storage=video_hosting_app.storage.video_storage, upload_to="videos/"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="videofile",
+            index=models.Index(fields=["file"], name="videofile_file_idx"),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("video_hosting_app", "0013_transcodejob"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="transcodejob",
+            name="transcode_job_active_unique",
+        ),
+        migrations.AddField(
+            model_name="transcodejob",
+            name="kind",
+            field=models.CharField(
+                choices=[("transcode", "Перекодирование"), ("package", "Нарезка HLS")],
+                default="transcode",
+                max_length=9,
+            ),
+        ),
+        migrations.AddField(
+            model_name="videofile",
+            name="hls_average_bandwidth",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="videofile",
+            name="hls_bandwidth",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="videofile",
+            name="hls_key",
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddConstraint(
+            model_name="transcodejob",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", ["pending", "running"])),
+                fields=("video", "quality", "kind"),
+                name="transcode_job_active_unique",
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:22
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+VIDEO_TABLE = "video_hosting_app_video"
+
+# Триграммный индекс для нечеткого поиска создается, только если расширение pg_trgm доступно
+# на сервере (в образе postgres оно есть); без него поиск работает без нечетких совпадений
+CREATE_TRIGRAM_SQL = f"""
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS video_name_trgm_idx
+            ON {VIDEO_TABLE} USING gin (name gin_trgm_ops);
+    END IF;
+END
+$$;
+"""
+
+DROP_TRIGRAM_SQL = "DROP INDEX IF EXISTS video_name_trgm_idx;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("video_hosting_app", "0014_hls_packaging"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="search_vector",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.contrib.postgres.search.SearchVector(
+                    "name", config="russian"
+                ),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="video",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="video_search_vector_idx"
+            ),
+        ),
+        migrations.RunSQL(CREATE_TRIGRAM_SQL, DROP_TRIGRAM_SQL),
+    ]
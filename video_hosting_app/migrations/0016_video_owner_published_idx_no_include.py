@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("video_hosting_app", "0015_video_search"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="video",
+            name="video_owner_published_idx",
+        ),
+        migrations.AddIndex(
+            model_name="video",
+            index=models.Index(
+                fields=["owner", "is_published"], name="video_owner_published_idx"
+            ),
+        ),
+    ]
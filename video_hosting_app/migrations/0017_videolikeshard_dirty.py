@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("video_hosting_app", "0016_video_owner_published_idx_no_include"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="videolikeshard",
+            name="dirty",
+            field=models.BooleanField(db_default=False),
+        ),
+        migrations.AddIndex(
+            model_name="videolikeshard",
+            index=models.Index(
+                condition=models.Q(("dirty", True)),
+                fields=["video"],
+                name="video_like_shard_dirty_idx",
+            ),
+        ),
+    ]
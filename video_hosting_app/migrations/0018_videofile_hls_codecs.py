@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("video_hosting_app", "0017_videolikeshard_dirty"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="videofile",
+            name="hls_codecs",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
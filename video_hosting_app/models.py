@@ -1,6 +1,16 @@
+import uuid
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .storage import video_storage
+
+# Конфигурация полнотекстового поиска: русская морфология, латинские слова - английская
+SEARCH_CONFIG = "russian"
+
 
 class Video(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="videos")
@@ -8,6 +18,30 @@ class Video(models.Model):
     name = models.CharField(max_length=255)
     total_likes = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Поисковый вектор названия вычисляется Postgres при каждой записи (search.py)
+    search_vector = models.GeneratedField(
+        expression=SearchVector("name", config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="video_created_at_id_idx"),
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(is_published=True),
+                name="video_published_created_idx",
+            ),
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_published=True),
+                name="video_published_id_idx",
+            ),
+            models.Index(fields=["owner", "is_published"], name="video_owner_published_idx"),
+            GinIndex(fields=["search_vector"], name="video_search_vector_idx"),
+        ]
 
 
 class VideoFile(models.Model):
@@ -17,13 +51,155 @@ class VideoFile(models.Model):
         ("UHD", "UHD (4k)"),
     ]
     video = models.ForeignKey(Video, on_delete=models.CASCADE)
-    file = models.FileField(upload_to="videos/")
+    file = models.FileField(upload_to="videos/", storage=video_storage)
     quality = models.CharField(max_length=3, choices=QUALITY_CHOICES)
+    # Нарезка HLS: ключ каталога сегментов, битрейт и кодеки для мастер-плейлиста
+    hls_key = models.CharField(max_length=32, blank=True)
+    hls_bandwidth = models.PositiveIntegerField(default=0)
+    hls_average_bandwidth = models.PositiveIntegerField(default=0)
+    hls_codecs = models.CharField(max_length=100, blank=True)
 
     class Meta:
         unique_together = ("video", "quality")
+        indexes = [
+            # Подсчет ссылок на файл хранилища перед его удалением
+            models.Index(fields=["file"], name="videofile_file_idx"),
+        ]
 
 
 class Like(models.Model):
     video = models.ForeignKey(Video, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["video", "user"], name="like_video_user_unique"),
+        ]
+
+
+class VideoLikeShard(models.Model):
+    """
+    Шард счетчика лайков видео: запись лайка увеличивает случайный шард и ставит dirty,
+    Video.total_likes периодически пересчитывается как сумма шардов видео с отметкой dirty
+    """
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name="like_shards")
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+    dirty = models.BooleanField(db_default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["video", "shard"], name="video_like_shard_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["video"],
+                condition=models.Q(dirty=True),
+                name="video_like_shard_dirty_idx",
+            ),
+        ]
+
+
+class LikeBufferBatch(models.Model):
+    """
+    Отметка о применении пачки событий из журнала лайков (режим LIKE_WRITE_BEHIND),
+    пишется в одной транзакции с самой пачкой
+    """
+    name = models.CharField(max_length=255, unique=True)
+    applied_at = models.DateTimeField(auto_now_add=True)
+
+
+class UserLikesStats(models.Model):
+    """
+    Материализованная статистика лайков по владельцам видео.
+    Поддерживается триггерами базы данных на таблицах видео и пользователей
+    (миграция 0008), полностью пересчитывается командой refresh_stats
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="likes_stats"
+    )
+    videos_count = models.PositiveIntegerField(default=0)
+    total_likes = models.BigIntegerField(default=0)
+    published_likes = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-total_likes", "user"], name="stats_total_likes_idx"),
+            models.Index(
+                fields=["-published_likes", "user"],
+                name="stats_published_likes_idx",
+            ),
+        ]
+
+
+class UploadSession(models.Model):
+    """
+    Сессия возобновляемой загрузки видео-файла по частям.
+    Части пишутся сразу в итоговый файл path, VideoFile создается при завершении загрузки
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="uploads")
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name="uploads")
+    quality = models.CharField(max_length=3, choices=VideoFile.QUALITY_CHOICES)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    path = models.CharField(max_length=255)
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+
+class TranscodeJob(models.Model):
+    """
+    Задача очереди перекодирования: получить видео-файл качества quality
+    из исходного файла качества source_quality (kind="transcode") или нарезать
+    видео-файл качества quality на сегменты HLS (kind="package").
+    Выполняется командой transcode_worker
+    """
+    TRANSCODE = "transcode"
+    PACKAGE = "package"
+    KIND_CHOICES = [
+        (TRANSCODE, "Перекодирование"),
+        (PACKAGE, "Нарезка HLS"),
+    ]
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Готово"),
+        (FAILED, "Ошибка"),
+    ]
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name="transcode_jobs")
+    kind = models.CharField(max_length=9, choices=KIND_CHOICES, default=TRANSCODE)
+    source_quality = models.CharField(max_length=3, choices=VideoFile.QUALITY_CHOICES)
+    quality = models.CharField(max_length=3, choices=VideoFile.QUALITY_CHOICES)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Не больше одной незавершенной задачи каждого вида на качество видео
+            models.UniqueConstraint(
+                fields=["video", "quality", "kind"],
+                condition=models.Q(status__in=["pending", "running"]),
+                name="transcode_job_active_unique",
+            ),
+        ]
+        indexes = [
+            # Выборка очередной задачи воркером
+            models.Index(
+                fields=["run_after", "id"],
+                condition=models.Q(status="pending"),
+                name="transcode_job_pending_idx",
+            ),
+        ]
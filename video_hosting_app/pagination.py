@@ -1,7 +1,256 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class MyPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        Асинхронный вариант paginate_queryset: COUNT(*) через acount, строки страницы через async for
+        """
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        # count у Paginator - cached_property, заранее посчитанное значение запрос не повторяет
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            )
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        self.request = request
+        return self.page.object_list
+
+
+class VideoCursorPagination(BasePagination):
+    """
+    Keyset-пагинация по паре (created_at, id), сортировка от новых к старым.
+    Вместо OFFSET страница выбирается условием по ключу последней записи,
+    поэтому любая страница стоит столько же, сколько первая, а COUNT(*) не выполняется.
+    Оценку количества записей можно запросить параметром ?count=estimate
+    """
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Некорректный курсор"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.prepare_queryset(queryset, request)
+        if self.count_requested:
+            self.count_estimate = self.estimate_count(queryset)
+        return self.set_page(list(self.page_queryset(queryset)))
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        Асинхронный вариант paginate_queryset для асинхронных эндпоинтов
+        """
+        queryset = self.prepare_queryset(queryset, request)
+        if self.count_requested:
+            self.count_estimate = await sync_to_async(self.estimate_count)(queryset)
+        return self.set_page([obj async for obj in self.page_queryset(queryset)])
+
+    @classmethod
+    def estimate_requested(cls, request):
+        return request.query_params.get(cls.count_query_param) == "estimate"
+
+    def prepare_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count_estimate = None
+        self.count_requested = self.estimate_requested(request)
+        self.cursor = self.decode_cursor(request)
+        self.reverse = bool(self.cursor and self.cursor["reverse"])
+        return queryset
+
+    def page_queryset(self, queryset):
+        """
+        Запрос страницы: на одну запись больше размера страницы, чтобы узнать, есть ли следующая
+        """
+        if self.cursor:
+            created_at, pk = self.cursor["created_at"], self.cursor["id"]
+            # Условие по одному created_at нужно, чтобы Postgres начал сканирование индекса
+            # сразу с позиции курсора, а не фильтровал строки от начала индекса
+            if self.reverse:
+                queryset = queryset.filter(created_at__gte=created_at).filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(created_at__lte=created_at).filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                )
+
+        if self.reverse:
+            queryset = queryset.order_by("created_at", "id")
+        else:
+            queryset = queryset.order_by("-created_at", "-id")
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def load_cursor(self, request):
+        """
+        Поля курсора из параметра запроса или None; некорректный курсор - ошибка 404
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(b64decode(encoded.encode("ascii")).decode("utf-8"))
+        except (BinasciiError, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(cursor, dict):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def dump_cursor(self, cursor):
+        encoded = b64encode(json.dumps(cursor).encode("utf-8")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        cursor = self.load_cursor(request)
+        if cursor is None:
+            return None
+        try:
+            created_at = parse_datetime(cursor["created_at"])
+            pk = int(cursor["id"])
+            reverse = bool(cursor.get("reverse", False))
+        except (ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return {"created_at": created_at, "id": pk, "reverse": reverse}
+
+    def encode_cursor(self, obj, reverse):
+        return self.dump_cursor(
+            {"created_at": obj.created_at.isoformat(), "id": obj.pk, "reverse": reverse}
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def estimate_count(self, queryset):
+        """
+        Оценка количества строк по плану запроса Postgres (EXPLAIN), без COUNT(*)
+        """
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def get_paginated_data(self, data):
+        response = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        if self.count_estimate is not None:
+            response["count_estimate"] = self.count_estimate
+        return response
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "count_estimate": {"type": "integer"},
+                "results": schema,
+            },
+        }
+
+
+class SearchCursorPagination(VideoCursorPagination):
+    """
+    Keyset-пагинация результатов поиска по паре (rank, id), от более релевантных к менее
+    """
+
+    def page_queryset(self, queryset):
+        if self.cursor:
+            rank, pk = self.cursor["rank"], self.cursor["id"]
+            if self.reverse:
+                queryset = queryset.filter(Q(rank__gt=rank) | Q(rank=rank, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, id__lt=pk))
+
+        if self.reverse:
+            queryset = queryset.order_by("rank", "id")
+        else:
+            queryset = queryset.order_by("-rank", "-id")
+        return queryset[: self.page_size + 1]
+
+    def decode_cursor(self, request):
+        cursor = self.load_cursor(request)
+        if cursor is None:
+            return None
+        try:
+            return {
+                "rank": float(cursor["rank"]),
+                "id": int(cursor["id"]),
+                "reverse": bool(cursor.get("reverse", False)),
+            }
+        except (ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        return self.dump_cursor({"rank": obj.rank, "id": obj.pk, "reverse": reverse})
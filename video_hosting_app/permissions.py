@@ -5,7 +5,7 @@ class IsOwner(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         if obj:
-            if obj.owner == request.user:
+            if obj.owner_id == request.user.id:
                 return True
             return False
         return False
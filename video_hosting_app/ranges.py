@@ -0,0 +1,152 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.negotiation import BaseContentNegotiation
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class FileRange:
+    """
+    Файловый объект, ограниченный диапазоном [start, start + length).
+    fileno() отдает дескриптор исходного файла, уже спозиционированный на start,
+    поэтому WSGI-сервер с поддержкой sendfile (gunicorn) передает диапазон без копирования
+    в Python, а остальные читают его через read() не дальше конца диапазона
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b""
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+class FileContentNegotiation(BaseContentNegotiation):
+    """
+    Не проверяет заголовок Accept: плееры запрашивают video/*, а ответ - сам файл
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def parse_range(header, size):
+    """
+    Разбирает заголовок Range с одним диапазоном байт.
+    Возвращает (start, end) включительно, None - если заголовок нужно проигнорировать
+    (отсутствует, несколько диапазонов, неизвестные единицы), "unsatisfiable" - если диапазон вне файла
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        suffix = int(last)
+        if suffix == 0:
+            return "unsatisfiable"
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return "unsatisfiable"
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """
+    If-Range: диапазон отдается, только если валидатор клиента совпадает с текущим
+    """
+    value = request.META.get("HTTP_IF_RANGE")
+    if value is None:
+        return True
+    if value.startswith('"') or value.startswith("W/"):
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+def file_validators(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"', int(stat.st_mtime)
+
+
+def offload_response(field_file, content_type):
+    """
+    Ответ, который передает отдачу файла веб-серверу (nginx X-Accel-Redirect или Apache X-Sendfile),
+    Range и условные заголовки веб-сервер обрабатывает сам
+    """
+    response = HttpResponse(content_type=content_type)
+    if settings.VIDEO_SENDFILE_BACKEND == "nginx":
+        response["X-Accel-Redirect"] = settings.VIDEO_ACCEL_REDIRECT_PREFIX + field_file.name
+    else:
+        response["X-Sendfile"] = field_file.path
+    return response
+
+
+def range_file_response(request, field_file, content_type=None):
+    """
+    Отдает файл FileField с поддержкой Range/If-Range (206 Partial Content),
+    ETag/Last-Modified и 304; сам файл в память не читается
+    """
+    content_type = (
+        content_type
+        or mimetypes.guess_type(field_file.name)[0]
+        or "application/octet-stream"
+    )
+    if settings.VIDEO_SENDFILE_BACKEND:
+        return offload_response(field_file, content_type)
+
+    try:
+        stat = os.stat(field_file.path)
+    except FileNotFoundError:
+        raise Http404("Файл не найден")
+    etag, last_modified = file_validators(stat)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    size = stat.st_size
+    byte_range = None
+    if if_range_matches(request, etag, last_modified):
+        byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+
+    if byte_range == "unsatisfiable":
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+    else:
+        file = open(field_file.path, "rb")
+        if byte_range is None:
+            response = FileResponse(file, content_type=content_type)
+        else:
+            start, end = byte_range
+            response = FileResponse(
+                FileRange(file, start, end - start + 1),
+                status=206,
+                content_type=content_type,
+            )
+            response["Content-Length"] = end - start + 1
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
@@ -0,0 +1,23 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+from .instrumentation import measure
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson: тот же компактный UTF-8 вывод в несколько раз быстрее.
+    Даты и типы, которых нет в orjson, кодируются как в DRF (encoder_class), для ответов
+    с отступами (Accept: application/json; indent=N) используется стандартный JSONRenderer
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        with measure("serialize"):
+            if self.get_indent(accepted_media_type, renderer_context or {}):
+                return super().render(data, accepted_media_type, renderer_context)
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        # Как в JSONRenderer: U+2028 и U+2029 экранируются для встраивания в <script>
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
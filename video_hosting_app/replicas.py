@@ -0,0 +1,208 @@
+"""
+Чтение с реплик Postgres. ReplicaRouter отправляет чтения безопасных HTTP-запросов (GET, HEAD, OPTIONS)
+на здоровую реплику с отставанием не больше DB_REPLICA_MAX_LAG секунд, остальные запросы, транзакции
+и все вне HTTP-запросов (команды, воркеры) идут в основную базу. После записи клиент
+DB_PRIMARY_STICKY_SECONDS секунд читает из основной базы (cookie PRIMARY_COOKIE) и видит свои изменения
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .streaming import stream_in_context
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+PRIMARY_COOKIE = "db_primary"
+
+# Отставание реплики в секундах; реплика, которая применила все полученные изменения, не отстает,
+# даже если последняя транзакция на основной базе была давно
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+class RoutingState:
+    """
+    Маршрутизация текущего HTTP-запроса: можно ли читать с реплики, какая реплика выбрана
+    (одна на весь запрос, чтобы его чтения были согласованы), была ли запись
+    """
+
+    def __init__(self, pinned, safe):
+        self.pinned = pinned
+        self.allow_replica = safe and not pinned and bool(settings.DATABASE_REPLICAS)
+        self.replica = None
+        self.wrote = False
+
+
+_state = ContextVar("db_routing", default=None)
+
+
+def primary_pinned():
+    """
+    Клиент недавно писал: его запросы читают из основной базы
+    """
+    state = _state.get()
+    return state is not None and state.pinned
+
+
+def replica_used():
+    """
+    Чтения текущего запроса шли с реплики
+    """
+    state = _state.get()
+    return state is not None and state.replica not in (None, DEFAULT_DB_ALIAS)
+
+
+class ReplicaHealth:
+    """
+    Доступность и отставание реплик, проверяются не чаще раза в DB_REPLICA_CHECK_INTERVAL секунд
+    на процесс; пока одна реплика проверяется, остальные потоки используют прошлый результат
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked = {}
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self.lock:
+            checked_at, healthy, lag = self.checked.get(alias, (None, False, None))
+            if checked_at is not None and now - checked_at < settings.DB_REPLICA_CHECK_INTERVAL:
+                return healthy
+            self.checked[alias] = (now, healthy, lag)
+        healthy, lag = self.check(alias)
+        with self.lock:
+            self.checked[alias] = (time.monotonic(), healthy, lag)
+        return healthy
+
+    def check(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                lag = cursor.fetchone()[0]
+        except DatabaseError as exc:
+            logger.warning("Реплика %s недоступна, чтение идет из основной базы: %s", alias, exc)
+            connections[alias].close()
+            return False, None
+        lag = None if lag is None else float(lag)
+        if lag is None or lag > settings.DB_REPLICA_MAX_LAG:
+            logger.warning("Реплика %s отстает на %s с, чтение идет из основной базы", alias, lag)
+            return False, lag
+        return True, lag
+
+    def status(self):
+        with self.lock:
+            return {
+                alias: {"healthy": healthy, "lag": lag}
+                for alias, (_, healthy, lag) in self.checked.items()
+            }
+
+    def clear(self):
+        with self.lock:
+            self.checked.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+def read_alias():
+    state = _state.get()
+    if (
+        state is None
+        or not state.allow_replica
+        or state.wrote
+        or connections[DEFAULT_DB_ALIAS].in_atomic_block
+    ):
+        return DEFAULT_DB_ALIAS
+    if state.replica is None:
+        healthy = [alias for alias in settings.DATABASE_REPLICAS if replica_health.is_healthy(alias)]
+        state.replica = random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+    return state.replica
+
+
+class ReplicaRouter:
+    """
+    Роутер баз данных: чтения - read_alias, записи и миграции - основная база
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Задает маршрутизацию запроса и после успешного небезопасного запроса (или записи через ORM)
+    ставит cookie, с которой следующие DB_PRIMARY_STICKY_SECONDS секунд чтения идут в основную базу.
+    Тело потокового ответа читает с той же базы, что и остальной запрос
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.get_state(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(request, response, state)
+
+    async def __acall__(self, request):
+        state = self.get_state(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(request, response, state)
+
+    def get_state(self, request):
+        safe = request.method in SAFE_METHODS
+        return RoutingState(pinned=not safe or PRIMARY_COOKIE in request.COOKIES, safe=safe)
+
+    def finish(self, request, response, state):
+        if response.streaming:
+            stream_in_context(response, _state, state)
+        # Запись сырым SQL (toggle_like) проходит мимо роутера, поэтому учитывается и метод запроса
+        wrote = state.wrote or (request.method not in SAFE_METHODS and response.status_code < 400)
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PRIMARY_COOKIE,
+                "1",
+                max_age=settings.DB_PRIMARY_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
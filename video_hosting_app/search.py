@@ -0,0 +1,69 @@
+"""
+Поиск видео по названию. Полнотекстовый поиск идет по Video.search_vector (GIN-индекс
+video_search_vector_idx), последнее слово запроса ищется как префикс, чтобы поиск работал
+по мере набора. Если на сервере установлено расширение pg_trgm, добавляются нечеткие совпадения
+по триграммам (опечатки, части слов) через индекс video_name_trgm_idx.
+Результаты аннотируются релевантностью rank
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+from .models import SEARCH_CONFIG
+
+MIN_QUERY_LENGTH = 2
+MAX_QUERY_LENGTH = 100
+MAX_QUERY_WORDS = 10
+WORD_RE = re.compile(r"\w+")
+
+_trigram_installed = {}
+
+
+def has_trigram(alias):
+    """
+    Установлено ли pg_trgm в базе alias; проверяется один раз на процесс
+    """
+    if alias not in _trigram_installed:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+            _trigram_installed[alias] = cursor.fetchone()[0]
+    return _trigram_installed[alias]
+
+
+def validate_search_text(text):
+    """
+    Сообщение об ошибке для некорректного запроса или None
+    """
+    if len(text) < MIN_QUERY_LENGTH or not WORD_RE.search(text):
+        return f"Параметр q должен содержать не меньше {MIN_QUERY_LENGTH} символов"
+    if len(text) > MAX_QUERY_LENGTH:
+        return f"Параметр q должен содержать не больше {MAX_QUERY_LENGTH} символов"
+    return None
+
+
+def search_query(text):
+    """
+    tsquery из слов запроса: все слова обязательны, последнее - префикс
+    """
+    words = WORD_RE.findall(text.lower())[:MAX_QUERY_WORDS]
+    terms = [f"'{word}'" for word in words]
+    terms[-1] += ":*"
+    return " & ".join(terms)
+
+
+def search_videos(queryset, text):
+    """
+    Видео queryset, подходящие под запрос text, с релевантностью rank: ранг полнотекстового
+    совпадения плюс сходство по триграммам (с pg_trgm). rank - double precision, чтобы значение
+    из курсора пагинации сравнивалось с ним без потери точности
+    """
+    query = SearchQuery(search_query(text), search_type="raw", config=SEARCH_CONFIG)
+    condition = Q(search_vector=query)
+    rank = SearchRank(F("search_vector"), query)
+    if has_trigram(queryset.db):
+        condition |= Q(name__trigram_word_similar=text)
+        rank = rank + TrigramWordSimilarity(text, "name")
+    return queryset.filter(condition).annotate(rank=Cast(rank, output_field=FloatField()))
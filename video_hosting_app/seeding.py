@@ -0,0 +1,244 @@
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+from math import gcd
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Like, Video, VideoFile, VideoLikeShard
+from .statistics import refresh_user_likes_stats
+from .streaming import iter_chunks
+
+SEED_PASSWORD = "testpas"
+COPY_CHUNK_SIZE = 50000
+# Простое число: ранг популярности видео = (номер видео * RANK_MULTIPLIER) mod количество видео,
+# поэтому популярные видео разбросаны по всей таблице, а не идут подряд
+RANK_MULTIPLIER = 1000003
+CREATED_WITHIN = timedelta(days=365)
+INDEX_BUILD_MEMORY = "256MB"
+
+# Значения по умолчанию полей Django задаются не в базе, поэтому в COPY передаются все
+# обязательные столбцы
+USER_COLUMNS = (
+    "id",
+    "username",
+    "email",
+    "password",
+    "first_name",
+    "last_name",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "date_joined",
+)
+VIDEO_COLUMNS = (
+    "id",
+    "owner_id",
+    "is_published",
+    "name",
+    "total_likes",
+    "created_at",
+    "updated_at",
+)
+VIDEO_FILE_COLUMNS = (
+    "video_id",
+    "file",
+    "quality",
+    "hls_key",
+    "hls_bandwidth",
+    "hls_average_bandwidth",
+    "hls_codecs",
+)
+
+
+def copy_rows(cursor, table, columns, rows, chunk_size=COPY_CHUNK_SIZE):
+    """
+    Записывает строки (кортежи) в таблицу через COPY порциями по chunk_size строк,
+    расход памяти не зависит от количества строк
+    """
+    with cursor.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+        for chunk in iter_chunks(rows, chunk_size):
+            copy.write("".join("\t".join(map(str, row)) + "\n" for row in chunk))
+
+
+@contextmanager
+def without_indexes(cursor, model):
+    """
+    На время загрузки удаляет индексы (кроме первичного ключа), внешние ключи и ограничения
+    уникальности таблицы и создает их заново после нее: построение индекса и проверка
+    ограничения по всей таблице сразу во много раз быстрее проверки каждой строки
+    """
+    table = model._meta.db_table
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('f', 'u')
+        """,
+        [table],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        """
+        SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) FROM pg_index
+        WHERE indrelid = %s::regclass AND NOT indisprimary
+            AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = indexrelid)
+        """,
+        [table],
+    )
+    indexes = cursor.fetchall()
+    for name, _ in constraints:
+        cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+    for name, _ in indexes:
+        cursor.execute(f"DROP INDEX {name}")
+    yield
+    for _, definition in indexes:
+        cursor.execute(definition)
+    for name, definition in constraints:
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}')
+
+
+def reserve_ids(cursor, model, count):
+    """
+    Резервирует в последовательности первичного ключа count идущих подряд id, возвращает первый
+    """
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [model._meta.db_table])
+    sequence = cursor.fetchone()[0]
+    cursor.execute("SELECT nextval(%s)", [sequence])
+    start = cursor.fetchone()[0]
+    cursor.execute("SELECT setval(%s, %s)", [sequence, start + count - 1])
+    return start
+
+
+def popularity(videos, users, likes, published_ratio, exponent, rng):
+    """
+    Опубликованность и количество лайков каждого видео. Лайки распределены по закону Ципфа:
+    видео с рангом популярности r получает долю, пропорциональную r ** -exponent;
+    лайки получают только опубликованные видео, у одного видео не больше лайков, чем пользователей.
+    Результат - компактные массивы (1 + 4 байта на видео)
+    """
+    published = bytearray(videos)
+    counts = array("I", bytes(4 * videos))
+    for index in range(videos):
+        published[index] = rng.random() < published_ratio
+    if not videos or not users or not likes or not published_ratio:
+        return published, counts
+    multiplier = RANK_MULTIPLIER
+    while gcd(multiplier, videos) != 1:
+        multiplier += 1
+    scale = likes / published_ratio / sum(rank**-exponent for rank in range(1, videos + 1))
+    for index in range(videos):
+        if published[index]:
+            rank = index * multiplier % videos + 1
+            # Дробная часть округляется случайно, чтобы сумма совпадала с likes в среднем
+            counts[index] = min(int(scale * rank**-exponent + rng.random()), users)
+    return published, counts
+
+
+def seed_data(users, videos, likes, published_ratio=0.5, exponent=1.0, seed=None, clear=False):
+    """
+    Заполняет базу тестовыми данными через COPY: пользователи (пароль SEED_PASSWORD),
+    видео со случайным владельцем и датой создания за последний год, по видео-файлу
+    каждого качества, лайки со степенным распределением по видео (popularity)
+    и шарды счетчика лайков, согласованные с Video.total_likes.
+    Триггеры статистики на время загрузки отключаются, статистика пересчитывается в конце,
+    индексы и ограничения таблиц создаются заново после загрузки (without_indexes).
+    Возвращает количество созданных строк по таблицам
+    """
+    rng = random.Random(seed)
+    published, counts = popularity(videos, users, likes, published_ratio, exponent, rng)
+    now = timezone.now()
+    # Один хэш на всех пользователей: PBKDF2 для каждого из миллионов пользователей занял бы часы
+    password = make_password(SEED_PASSWORD)
+    video_table, user_table = Video._meta.db_table, User._meta.db_table
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if clear:
+            cursor.execute(f"TRUNCATE {user_table}, {video_table} RESTART IDENTITY CASCADE")
+        # Отложенные проверки внешних ключей выполняются сразу: ALTER TABLE невозможен,
+        # пока у таблицы есть отложенные события триггеров
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"SET LOCAL maintenance_work_mem = '{INDEX_BUILD_MEMORY}'")
+        cursor.execute(f"ALTER TABLE {user_table} DISABLE TRIGGER USER")
+        cursor.execute(f"ALTER TABLE {video_table} DISABLE TRIGGER USER")
+        raw_cursor = cursor.cursor
+
+        user_start = reserve_ids(cursor, User, users) if users else 0
+        copy_rows(
+            raw_cursor,
+            user_table,
+            USER_COLUMNS,
+            (
+                (pk, f"user_{pk}", f"user_{pk}@example.com", password, "", "")
+                + (True, False, False, now)
+                for pk in range(user_start, user_start + users)
+            ),
+        )
+
+        video_start = reserve_ids(cursor, Video, videos) if videos else 0
+
+        def video_rows():
+            for index in range(videos):
+                pk = video_start + index
+                owner_id = user_start + rng.randrange(users)
+                created_at = now - CREATED_WITHIN * rng.random()
+                yield (
+                    pk,
+                    owner_id,
+                    bool(published[index]),
+                    f"Видео {pk}",
+                    counts[index],
+                    created_at,
+                    created_at,
+                )
+
+        with without_indexes(cursor, Video):
+            copy_rows(raw_cursor, video_table, VIDEO_COLUMNS, video_rows())
+        with without_indexes(cursor, VideoFile):
+            copy_rows(
+                raw_cursor,
+                VideoFile._meta.db_table,
+                VIDEO_FILE_COLUMNS,
+                (
+                    (pk, f"videos/video_{quality}.mp4", quality, "", 0, 0, "")
+                    for pk in range(video_start, video_start + videos)
+                    for quality, _ in VideoFile.QUALITY_CHOICES
+                ),
+            )
+        with without_indexes(cursor, Like):
+            copy_rows(
+                raw_cursor,
+                Like._meta.db_table,
+                ("video_id", "user_id"),
+                (
+                    (video_start + index, user_start + user)
+                    for index, count in enumerate(counts)
+                    if count
+                    for user in rng.sample(range(users), count)
+                ),
+            )
+        with without_indexes(cursor, VideoLikeShard):
+            copy_rows(
+                raw_cursor,
+                VideoLikeShard._meta.db_table,
+                ("video_id", "shard", "count"),
+                ((video_start + index, 0, count) for index, count in enumerate(counts) if count),
+            )
+
+        cursor.execute(f"ALTER TABLE {user_table} ENABLE TRIGGER USER")
+        cursor.execute(f"ALTER TABLE {video_table} ENABLE TRIGGER USER")
+        cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+        refresh_user_likes_stats()
+        # Свежая статистика планировщика, чтобы замеры на новых данных шли по нужным индексам
+        for model in (User, Video, VideoFile, Like, VideoLikeShard):
+            cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+    return {
+        "users": users,
+        "videos": videos,
+        "video_files": videos * len(VideoFile.QUALITY_CHOICES),
+        "likes": sum(counts),
+    }
@@ -1,7 +1,14 @@
+import os
+from collections import defaultdict
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
-from .models import Like, Video, VideoFile
+from .models import Like, TranscodeJob, UploadSession, Video, VideoFile
+from .storage import video_storage
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -10,12 +17,27 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ("id", "username", "email", "password")
 
 
+class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    В токен добавляются username и is_staff, чтобы в режиме JWT_STATELESS_USER
+    пользователь и его права определялись без запроса к базе
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["username"] = user.username
+        token["is_staff"] = user.is_staff
+        return token
+
+
 class VideoFileSerializer(serializers.ModelSerializer):
     quality_display = serializers.SerializerMethodField()
 
     class Meta:
         model = VideoFile
-        fields = ("file", "quality_display")
+        fields = ("file", "quality", "quality_display")
+        extra_kwargs = {"quality": {"write_only": True}}
 
     def get_quality_display(self, obj):
         return obj.get_quality_display()
@@ -36,6 +58,67 @@ class VideoSerializer(serializers.ModelSerializer):
         )
 
 
+# Быстрый путь чтения видео: ответ того же вида, что у VideoSerializer, собирается из строк
+# values_list без объектов моделей и полей сериализатора
+
+QUALITY_LABELS = dict(VideoFile.QUALITY_CHOICES)
+
+VIDEO_ROW_FIELDS = ("pk", "name", "total_likes", "created_at", "updated_at", "owner__username")
+
+
+def video_rows(queryset, *fields):
+    """
+    Строки видео - именованные кортежи: pk, created_at и updated_at доступны как атрибуты,
+    поэтому пагинация и ETag работают со строками так же, как с моделями.
+    fields - дополнительные поля и аннотации (например, rank поиска)
+    """
+    return queryset.values_list(*VIDEO_ROW_FIELDS, *fields, named=True)
+
+
+def video_file_rows(rows):
+    """
+    Видео-файлы строк видео одним запросом
+    """
+    return (
+        VideoFile.objects.filter(video_id__in=[row.pk for row in rows])
+        .order_by("id")
+        .values_list("video_id", "file", "quality")
+    )
+
+
+def video_data(rows, file_rows):
+    """
+    Данные видео как у VideoSerializer(many=True) по строкам video_rows и video_file_rows
+    """
+    url = video_storage().url
+    files = defaultdict(list)
+    for video_id, name, quality in file_rows:
+        files[video_id].append(
+            {
+                "file": url(name) if name else None,
+                "quality_display": QUALITY_LABELS.get(quality, quality),
+            }
+        )
+    # Как DateTimeField: ISO 8601 в текущей зоне, UTC - с суффиксом Z;
+    # зона определяется один раз на страницу, а не для каждой даты
+    tz = timezone.get_current_timezone()
+
+    def created_at(value):
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    return [
+        {
+            "owner": row.owner__username,
+            "name": row.name,
+            "total_likes": row.total_likes,
+            "created_at": created_at(row.created_at),
+            "video_files": files[row.pk],
+        }
+        for row in rows
+    ]
+
+
 class LikeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Like
@@ -46,3 +129,57 @@ class IDSerializer(serializers.ModelSerializer):
     class Meta:
         model = Video
         fields = ("id",)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    filename = serializers.CharField(write_only=True, required=False, default="video.mp4")
+
+    class Meta:
+        model = UploadSession
+        fields = (
+            "id",
+            "video",
+            "quality",
+            "size",
+            "offset",
+            "filename",
+            "sha256",
+            "completed_at",
+        )
+        read_only_fields = ("id", "video", "offset", "completed_at")
+
+    def validate_size(self, value):
+        if value <= 0 or value > settings.VIDEO_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Размер файла должен быть от 1 до {settings.VIDEO_UPLOAD_MAX_SIZE} байт"
+            )
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and (len(value) != 64 or not all(c in "0123456789abcdef" for c in value)):
+            raise serializers.ValidationError("SHA-256 должен быть 64 hex-символами")
+        return value
+
+    def validate_filename(self, value):
+        extension = os.path.splitext(value)[1].lower()
+        if not extension.isascii() or not extension[1:].isalnum():
+            raise serializers.ValidationError("Некорректное расширение файла")
+        return value
+
+
+class TranscodeJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TranscodeJob
+        fields = (
+            "id",
+            "kind",
+            "source_quality",
+            "quality",
+            "status",
+            "attempts",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        )
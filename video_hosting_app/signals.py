@@ -0,0 +1,77 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .authentication import user_cache
+from .blobs import release_blobs
+from .caching import invalidate_videos
+from .instrumentation import install_query_recorder
+from .models import Video, VideoFile
+
+
+@receiver([post_save, post_delete], sender=Video)
+def video_changed(sender, instance, **kwargs):
+    video_id = instance.pk
+    transaction.on_commit(lambda: invalidate_videos([video_id]))
+
+
+@receiver([post_save, post_delete], sender=VideoFile)
+def video_file_changed(sender, instance, **kwargs):
+    video_id = instance.video_id
+    Video.objects.filter(pk=video_id).update(updated_at=timezone.now())
+    transaction.on_commit(lambda: invalidate_videos([video_id]))
+
+
+@receiver(post_init, sender=VideoFile)
+def video_file_loaded(sender, instance, **kwargs):
+    # Имя файла при загрузке из базы - чтобы после замены освободить старый файл.
+    # Берется из __dict__, чтобы не загружать отложенное поле
+    file = instance.__dict__.get("file")
+    instance._loaded_file_name = getattr(file, "name", file)
+
+
+@receiver(post_save, sender=VideoFile)
+def video_file_replaced(sender, instance, created, **kwargs):
+    old_name = instance._loaded_file_name
+    instance._loaded_file_name = instance.file.name
+    if not created and old_name and old_name != instance.file.name:
+        transaction.on_commit(lambda: release_blobs([old_name]))
+
+
+@receiver(post_delete, sender=VideoFile)
+def video_file_deleted(sender, instance, **kwargs):
+    name = instance.file.name
+    if name:
+        transaction.on_commit(lambda: release_blobs([name]))
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    # Имя владельца входит в ответы видео, но хранится вне их строк
+    instance._loaded_username = instance.__dict__.get("username")
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, created, **kwargs):
+    old_username = instance._loaded_username
+    instance._loaded_username = instance.username
+    if created or old_username is None or old_username == instance.username:
+        return
+    # updated_at меняет ETag и Last-Modified видео владельца, сброс версий - их кэш
+    videos = Video.objects.filter(owner_id=instance.pk)
+    video_ids = list(videos.values_list("id", flat=True))
+    videos.update(updated_at=timezone.now())
+    transaction.on_commit(lambda: invalidate_videos(video_ids))
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    install_query_recorder(connection)
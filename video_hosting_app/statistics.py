@@ -0,0 +1,36 @@
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from .models import UserLikesStats, Video
+
+
+def refresh_user_likes_stats():
+    """
+    Полностью пересчитывает UserLikesStats из таблицы видео.
+    На время пересчета запись в таблицу видео блокируется, чтобы изменения,
+    которые вносят триггеры, не потерялись. Возвращает количество измененных строк
+    """
+    stats_table = UserLikesStats._meta.db_table
+    video_table = Video._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {video_table} IN SHARE MODE")
+        cursor.execute(
+            f"""
+            INSERT INTO {stats_table} (user_id, videos_count, total_likes, published_likes)
+            SELECT
+                u.id,
+                COUNT(v.id),
+                COALESCE(SUM(v.total_likes), 0),
+                COALESCE(SUM(v.total_likes) FILTER (WHERE v.is_published), 0)
+            FROM {User._meta.db_table} AS u
+            LEFT JOIN {video_table} AS v ON v.owner_id = u.id
+            GROUP BY u.id
+            ON CONFLICT (user_id) DO UPDATE
+            SET videos_count = EXCLUDED.videos_count,
+                total_likes = EXCLUDED.total_likes,
+                published_likes = EXCLUDED.published_likes
+            WHERE ({stats_table}.videos_count, {stats_table}.total_likes, {stats_table}.published_likes)
+                IS DISTINCT FROM (EXCLUDED.videos_count, EXCLUDED.total_likes, EXCLUDED.published_likes)
+            """
+        )
+        return cursor.rowcount
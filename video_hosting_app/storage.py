@@ -0,0 +1,121 @@
+import hashlib
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+
+BLOB_PREFIX = "videos/blobs"
+TMP_PREFIX = "videos/blobs/tmp"
+HASH_BLOCK_SIZE = 1024 * 1024
+URL_CACHE_SIZE = 100000
+
+
+class HashingFile(File):
+    """
+    Обертка над загружаемым файлом, считающая SHA-256 по мере чтения частей
+    """
+
+    def __init__(self, file):
+        super().__init__(file.file if isinstance(file, File) else file, file.name)
+        self.source = file
+        self.digest = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        for chunk in self.source.chunks(chunk_size):
+            self.digest.update(chunk)
+            yield chunk
+
+
+def blob_name(sha256, extension):
+    return f"{BLOB_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension.lower()}"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище видео-файлов с адресацией по содержимому: файл сохраняется один раз
+    по пути от его SHA-256, повторная загрузка того же содержимого только возвращает
+    имя существующего файла. Ссылками на файлы считаются записи VideoFile
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.urls = {}
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def url(self, name):
+        """
+        URL файла; содержимое по имени не меняется, поэтому URL запоминаются
+        (urljoin и экранирование - основная цена сериализации списка видео)
+        """
+        url = self.urls.get(name)
+        if url is None:
+            if len(self.urls) >= URL_CACHE_SIZE:
+                self.urls.clear()
+            url = self.urls[name] = super().url(name)
+        return url
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == "MEDIA_URL":
+            self.urls.clear()
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1]
+        content = HashingFile(content)
+        tmp_name = super()._save(f"{TMP_PREFIX}/{uuid.uuid4().hex}{extension}", content)
+        return self.commit_blob(tmp_name, content.digest.hexdigest(), extension)
+
+    def file_sha256(self, name):
+        """
+        SHA-256 файла, уже записанного в хранилище (например, загруженного по частям)
+        """
+        digest = hashlib.sha256()
+        with open(self.path(name), "rb") as file:
+            while block := file.read(HASH_BLOCK_SIZE):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def commit_blob(self, name, sha256, extension, keep_source=False):
+        """
+        Переносит файл name на место по его SHA-256, а если такой файл уже есть - удаляет name.
+        С keep_source файл name не трогается (на место blob ставится жесткая ссылка на него):
+        вызывающий удаляет name сам, когда ссылка на blob сохранена в базе
+        """
+        final_name = blob_name(sha256, extension)
+        final_path = self.path(final_name)
+        if keep_source:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            try:
+                os.link(self.path(name), final_path)
+            except FileExistsError:
+                self.touch(final_name)
+        elif os.path.exists(final_path):
+            os.remove(self.path(name))
+            self.touch(final_name)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(self.path(name), final_path)
+        return final_name
+
+    def touch(self, name):
+        """
+        Отмечает повторное использование файла, чтобы сборка мусора не удалила его
+        до того, как новая ссылка на него будет сохранена
+        """
+        os.utime(self.path(name))
+
+    def is_collectable(self, name):
+        try:
+            age = time.time() - os.path.getmtime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return name.startswith(f"{BLOB_PREFIX}/") and age > settings.VIDEO_BLOB_GC_GRACE
+
+
+def video_storage():
+    return storages["videos"]
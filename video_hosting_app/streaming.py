@@ -0,0 +1,170 @@
+import json
+import struct
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+
+IDS_CHUNK_SIZE = 5000
+
+STREAM_CONTENT_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "packed": "application/octet-stream",
+}
+
+
+def iter_chunks(iterable, size):
+    """
+    Разбивает итератор на списки длиной не более size
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+async def aiter_chunks(iterable, size):
+    """
+    Асинхронный вариант iter_chunks
+    """
+    chunk = []
+    async for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class JSONIds:
+    """
+    JSON-массив вида [{"id": 1}, ...], совпадает с ответом IDSerializer
+    """
+    head, tail = "[", "]"
+
+    @staticmethod
+    def encode(chunk, first):
+        return ("" if first else ",") + ",".join(json.dumps({"id": pk}) for pk in chunk)
+
+
+class NDJSONIds:
+    """
+    Один id на строку
+    """
+    head, tail = "", ""
+
+    @staticmethod
+    def encode(chunk, first):
+        return "".join(f"{pk}\n" for pk in chunk)
+
+
+class PackedIds:
+    """
+    Массив 64-битных знаковых целых little-endian без разделителей
+    """
+    head, tail = b"", b""
+
+    @staticmethod
+    def encode(chunk, first):
+        return struct.pack(f"<{len(chunk)}q", *chunk)
+
+
+STREAM_GENERATORS = {
+    "json": JSONIds,
+    "ndjson": NDJSONIds,
+    "packed": PackedIds,
+}
+
+
+def encode_ids(encoder, chunks):
+    if encoder.head:
+        yield encoder.head
+    first = True
+    for chunk in chunks:
+        yield encoder.encode(chunk, first)
+        first = False
+    if encoder.tail:
+        yield encoder.tail
+
+
+async def aencode_ids(encoder, chunks):
+    if encoder.head:
+        yield encoder.head
+    first = True
+    async for chunk in chunks:
+        yield encoder.encode(chunk, first)
+        first = False
+    if encoder.tail:
+        yield encoder.tail
+
+
+def stream_ids(queryset, stream_format, chunk_size=IDS_CHUNK_SIZE):
+    """
+    Потоковый ответ со списком id: строки читаются серверным курсором порциями по chunk_size,
+    поэтому память не зависит от количества записей, а первые байты уходят сразу
+    """
+    ids = queryset.values_list("id", flat=True).iterator(chunk_size=chunk_size)
+    return StreamingHttpResponse(
+        encode_ids(STREAM_GENERATORS[stream_format], iter_chunks(ids, chunk_size)),
+        content_type=STREAM_CONTENT_TYPES[stream_format],
+    )
+
+
+def astream_ids(queryset, stream_format, chunk_size=IDS_CHUNK_SIZE):
+    """
+    Асинхронный вариант stream_ids для ASGI: порции читаются через aiterator,
+    пока клиент принимает данные, процесс обслуживает другие запросы
+    """
+    ids = queryset.values_list("id", flat=True).aiterator(chunk_size=chunk_size)
+    return StreamingHttpResponse(
+        aencode_ids(STREAM_GENERATORS[stream_format], aiter_chunks(ids, chunk_size)),
+        content_type=STREAM_CONTENT_TYPES[stream_format],
+    )
+
+
+def iterate_in_context(content, var, value):
+    """
+    Итерирует content, выставляя var = value на время вычисления каждой порции
+    """
+    iterator = iter(content)
+    while True:
+        token = var.set(value)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            var.reset(token)
+        yield chunk
+
+
+async def aiterate_in_context(content, var, value):
+    """
+    Асинхронный вариант iterate_in_context
+    """
+    iterator = aiter(content)
+    while True:
+        token = var.set(value)
+        try:
+            chunk = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            var.reset(token)
+        yield chunk
+
+
+def stream_in_context(response, var, value):
+    """
+    Middleware сбрасывает свое состояние (ContextVar), когда get_response возвращает ответ,
+    а тело потокового ответа и его SQL-запросы вычисляются позже, при отправке клиенту.
+    Оборачивает тело так, чтобы на время его вычисления var снова был равен value.
+    Файловые ответы не трогаются: их тело не обращается к базе, а замена streaming_content
+    отключила бы отдачу файла через wsgi.file_wrapper
+    """
+    if getattr(response, "file_to_stream", None) is not None:
+        return
+    if response.is_async:
+        response.streaming_content = aiterate_in_context(response.streaming_content, var, value)
+    else:
+        response.streaming_content = iterate_in_context(response.streaming_content, var, value)
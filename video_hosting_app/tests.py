@@ -1,3 +1,1206 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
+from collections import Counter
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from .async_views import (
+    IDListView,
+    LikesStatisticsView,
+    VideoListView,
+    VideoRetrieveView,
+    VideoSearchView,
+)
+from .authentication import CachedJWTAuthentication, user_cache
+from .caching import store_timeout, video_cache
+from .hls import is_packaged
+from .instrumentation import PerformanceMiddleware, fingerprint, render_metrics, reset_metrics
+from .management.commands.benchmark import summarize, summary_line
+from .like_buffer import (
+    append_like_event,
+    flush_journal,
+    flush_like_buffer,
+    journal_path,
+    pending_journals,
+    rotate_journal,
+)
+from .likes import aggregate_like_shards
+from .models import (
+    Like,
+    LikeBufferBatch,
+    TranscodeJob,
+    UploadSession,
+    UserLikesStats,
+    Video,
+    VideoFile,
+    VideoLikeShard,
+)
+from .renderers import ORJSONRenderer
+from .replicas import (
+    PRIMARY_COOKIE,
+    ReplicaRouter,
+    ReplicaRoutingMiddleware,
+    primary_pinned,
+    read_alias,
+    replica_health,
+)
+from .serializers import (
+    UserTokenObtainPairSerializer,
+    VideoSerializer,
+    video_data,
+    video_file_rows,
+    video_rows,
+)
+from .storage import blob_name, video_storage
+from .streaming import stream_ids
+from .transcoding import (
+    enqueue_missing_packaging,
+    enqueue_packaging,
+    enqueue_renditions,
+    run_worker,
+)
+from .uploads import OffsetConflict, expire_uploads, finalize_upload, write_chunk
+from .views import SubQueryViewSet, VideoViewSet
+
+
+class VideoTestDataMixin:
+    """
+    Общие тестовые данные: обычный пользователь, служебный пользователь,
+    видео с тремя видео-файлами каждое
+    """
+    videos_count = 15
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="user", password="testpas")
+        cls.staff = User.objects.create_user(
+            username="staff", password="testpas", is_staff=True
+        )
+        videos = Video.objects.bulk_create(
+            [
+                Video(owner=cls.user, name=f"Видео {i}", is_published=i % 2 == 0)
+                for i in range(cls.videos_count)
+            ]
+        )
+        VideoFile.objects.bulk_create(
+            [
+                VideoFile(video=video, file=f"videos/video_{quality}.mp4", quality=quality)
+                for video in videos
+                for quality, _ in VideoFile.QUALITY_CHOICES
+            ]
+        )
+        cls.video = videos[0]
+
+
+class VideoQueryBudgetTests(VideoTestDataMixin, APITestCase):
+    """
+    Фиксированный бюджет SQL-запросов на эндпоинт, не зависящий от размера страницы
+    """
+    # (владелец JOIN видео) + prefetch видео-файлов
+    LIST_BUDGET = 2
+    RETRIEVE_BUDGET = 2
+
+    def setUp(self):
+        video_cache().clear()
+
+    def assert_list_budget(self, user=None):
+        if user:
+            self.client.force_authenticate(user)
+        url = reverse("video_hosting_app:list")
+        with self.assertNumQueries(self.LIST_BUDGET):
+            response = self.client.get(url, {"page_size": 100})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["results"])
+        for video in response.data["results"]:
+            self.assertEqual(len(video["video_files"]), 3)
+
+    def test_list_anonymous(self):
+        self.assert_list_budget()
+
+    def test_list_authenticated(self):
+        self.assert_list_budget(self.user)
+
+    def test_list_staff(self):
+        self.assert_list_budget(self.staff)
+
+    def test_retrieve(self):
+        url = reverse("video_hosting_app:retrieve", kwargs={"pk": self.video.pk})
+        with self.assertNumQueries(self.RETRIEVE_BUDGET):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["owner"], self.user.username)
+        self.assertEqual(len(response.data["video_files"]), 3)
+
+
+class VideoFastPathTests(VideoTestDataMixin, APITestCase):
+    """
+    Быстрый путь чтения (video_data, ORJSONRenderer) совпадает с VideoSerializer и JSONRenderer
+    """
+
+    def test_video_data_matches_serializer(self):
+        VideoFile.objects.filter(video=self.video, quality="UHD").update(file="")
+        videos = list(VideoViewSet().get_queryset().order_by("id"))
+        rows = list(video_rows(Video.objects.order_by("id")))
+        expected = VideoSerializer(videos, many=True).data
+        data = video_data(rows, video_file_rows(rows))
+        self.assertEqual(data, expected)
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(expected))
+
+    def test_endpoints_match_serializer(self):
+        video_cache().clear()
+        response = self.client.get(reverse("video_hosting_app:list"), {"page_size": 100})
+        names = [video["name"] for video in response.json()["results"]]
+        videos = Video.objects.filter(is_published=True).order_by("-created_at", "-id")
+        expected = VideoSerializer(VideoViewSet().get_queryset().filter(name__in=names), many=True)
+        self.assertEqual(names, [video.name for video in videos])
+        self.assertCountEqual(response.json()["results"], expected.data)
+
+        url = reverse("video_hosting_app:retrieve", kwargs={"pk": self.video.pk})
+        self.assertEqual(self.client.get(url).json(), VideoSerializer(self.video).data)
+
+
+class VideoSearchTests(VideoTestDataMixin, APITestCase):
+    """
+    Поиск по названиям: префикс последнего слова, релевантность, видимость и keyset-пагинация
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Video.objects.bulk_create(
+            [
+                Video(owner=cls.user, name="Котики играют с котиками", is_published=True),
+                Video(owner=cls.user, name="Котик спит", is_published=True),
+                Video(owner=cls.user, name="Собаки и котики", is_published=True),
+                Video(owner=cls.user, name="Котики черновик", is_published=False),
+            ]
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse("video_hosting_app:search"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, **params):
+        return [video["name"] for video in self.search(**params)["results"]]
+
+    def test_ranked_prefix_search(self):
+        names = self.names(q="кот")
+        self.assertEqual(len(names), 3)
+        # Два вхождения слова ранжируются выше одного
+        self.assertEqual(names[0], "Котики играют с котиками")
+        self.assertEqual(self.names(q="собаки кот"), ["Собаки и котики"])
+        self.assertEqual(self.names(q="спящий слон"), [])
+
+    def test_visibility(self):
+        self.assertNotIn("Котики черновик", self.names(q="котики"))
+        self.client.force_authenticate(self.user)
+        self.assertIn("Котики черновик", self.names(q="котики"))
+
+    def test_keyset_pagination(self):
+        data = self.search(q="видео", page_size=4)
+        names = [video["name"] for video in data["results"]]
+        while data["next"]:
+            data = self.client.get(data["next"]).json()
+            names += [video["name"] for video in data["results"]]
+        expected = Video.objects.filter(is_published=True, name__startswith="Видео")
+        self.assertCountEqual(names, [video.name for video in expected])
+
+    def test_invalid_query(self):
+        url = reverse("video_hosting_app:search")
+        self.assertEqual(self.client.get(url, {"q": "к"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"q": "?!"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"q": "кот", "cursor": "x"}).status_code, 404)
+
+
+class JWTAuthenticationTests(VideoTestDataMixin, APITestCase):
+    """
+    Пользователь JWT-запроса берется из кэша процесса или из полей токена, а не из базы
+    """
+
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+
+    def login(self, user):
+        response = self.client.post(
+            reverse("video_hosting_app:login"),
+            {"username": user.username, "password": "testpas"},
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def assert_list_queries(self, count):
+        with self.assertNumQueries(count):
+            response = self.client.get(reverse("video_hosting_app:list"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_is_cached_until_saved(self):
+        self.login(self.user)
+        budget = VideoQueryBudgetTests.LIST_BUDGET
+        self.assert_list_queries(budget + 1)
+        self.assert_list_queries(budget)
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse("video_hosting_app:list"))
+        self.assertEqual(response.status_code, 401)
+
+    def test_async_authentication_uses_cached_user(self):
+        token = UserTokenObtainPairSerializer.get_token(self.user).access_token
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        authentication = CachedJWTAuthentication()
+        user, _ = async_to_sync(authentication.aauthenticate)(request)
+        self.assertEqual(user.pk, self.user.pk)
+        # Попадание в кэш не вызывает синхронный get_user, который на промахе пошел бы в базу
+        with mock.patch.object(CachedJWTAuthentication, "get_user", side_effect=AssertionError):
+            cached, _ = async_to_sync(authentication.aauthenticate)(request)
+        self.assertEqual(cached.pk, self.user.pk)
+        self.assertIsNot(cached, user)
+
+    @override_settings(JWT_STATELESS_USER=True)
+    def test_stateless_user(self):
+        self.login(self.staff)
+        self.assert_list_queries(VideoQueryBudgetTests.LIST_BUDGET)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("video_hosting_app:cache_stats"))
+        self.assertEqual(response.status_code, 200)
+
+
+class AsyncViewsTests(VideoTestDataMixin, APITestCase):
+    """
+    Асинхронные эндпоинты отвечают так же, как синхронные
+    """
+
+    def setUp(self):
+        video_cache().clear()
+        user_cache.clear()
+        self.factory = AsyncRequestFactory()
+
+    async def aget(self, view, url, user=None, **kwargs):
+        headers = {}
+        if user:
+            token = UserTokenObtainPairSerializer.get_token(user).access_token
+            headers["Authorization"] = f"Bearer {token}"
+        return await view(self.factory.get(url, headers=headers), **kwargs)
+
+    def sync_json(self, url, user=None):
+        self.client.force_authenticate(user)
+        return self.client.get(url).json()
+
+    async def test_list_and_retrieve(self):
+        list_url = reverse("video_hosting_app:list") + "?page_size=4"
+        for user in (None, self.user, self.staff):
+            response = await self.aget(VideoListView.as_view(), list_url, user)
+            self.assertEqual(response.status_code, 200)
+            expected = await sync_to_async(self.sync_json)(list_url, user)
+            self.assertEqual(json.loads(response.content), expected)
+
+        video_url = reverse("video_hosting_app:retrieve", kwargs={"pk": self.video.pk})
+        response = await self.aget(VideoRetrieveView.as_view(), video_url, pk=self.video.pk)
+        expected = await sync_to_async(self.sync_json)(video_url)
+        self.assertEqual(json.loads(response.content), expected)
+        response = await self.aget(VideoRetrieveView.as_view(), video_url, pk=0)
+        self.assertEqual(response.status_code, 404)
+
+        query = urlencode({"q": "видео", "page_size": 4})
+        search_url = f"{reverse('video_hosting_app:search')}?{query}"
+        response = await self.aget(VideoSearchView.as_view(), search_url, self.user)
+        expected = await sync_to_async(self.sync_json)(search_url, self.user)
+        self.assertEqual(json.loads(response.content), expected)
+
+    async def test_ids_and_statistics_for_staff_only(self):
+        url = reverse("video_hosting_app:ids_list")
+        self.assertEqual((await self.aget(IDListView.as_view(), url)).status_code, 401)
+        response = await self.aget(IDListView.as_view(), url, self.user)
+        self.assertEqual(response.status_code, 403)
+
+        response = await self.aget(IDListView.as_view(), url, self.staff)
+        expected = await sync_to_async(self.sync_json)(url, self.staff)
+        self.assertEqual(json.loads(response.content), expected)
+        response = await self.aget(IDListView.as_view(), url + "?stream=ndjson", self.staff)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(content.decode().split(), [str(row["id"]) for row in expected])
+
+        view = LikesStatisticsView.as_view(viewset=SubQueryViewSet)
+        url = reverse("video_hosting_app:statistics_subquery")
+        response = await self.aget(view, url + "?page_size=1", self.staff)
+        expected = await sync_to_async(self.sync_json)(url + "?page_size=1", self.staff)
+        self.assertEqual(json.loads(response.content), expected)
+
+
+class IDStreamTests(VideoTestDataMixin, APITestCase):
+    """
+    Потоковый список id совпадает с обычным ответом во всех форматах
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(self.staff)
+        self.url = reverse("video_hosting_app:ids_list")
+        self.ids = list(
+            Video.objects.filter(is_published=True).order_by("id").values_list("id", flat=True)
+        )
+
+    def stream(self, stream_format):
+        response = self.client.get(self.url, {"stream": stream_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_json(self):
+        expected = self.client.get(self.url).json()
+        self.assertEqual(expected, [{"id": pk} for pk in self.ids])
+        self.assertEqual(json.loads(self.stream("json")), expected)
+        # Порции по 3 id: запятые между порциями
+        queryset = Video.objects.filter(is_published=True).order_by("id")
+        body = b"".join(stream_ids(queryset, "json", chunk_size=3).streaming_content)
+        self.assertEqual(json.loads(body), expected)
+
+    def test_ndjson_and_packed(self):
+        self.assertEqual([int(line) for line in self.stream("ndjson").splitlines()], self.ids)
+        body = self.stream("packed")
+        self.assertEqual(list(struct.unpack(f"<{len(body) // 8}q", body)), self.ids)
+
+    def test_unknown_format(self):
+        response = self.client.get(self.url, {"stream": "xml"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Ошибка", response.json())
+
+
+class DatabaseStatsTests(VideoTestDataMixin, APITestCase):
+    def test_stats_for_staff_only(self):
+        url = reverse("video_hosting_app:db_stats")
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.data["max_connections"], 0)
+        self.assertGreaterEqual(sum(response.data["server_connections"].values()), 1)
+
+
+class PerformanceInstrumentationTests(VideoTestDataMixin, APITestCase):
+    """
+    Замеры запроса: Server-Timing, метрики Prometheus и обнаружение повторов запросов (N+1)
+    """
+
+    def setUp(self):
+        video_cache().clear()
+        reset_metrics()
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.get(reverse("video_hosting_app:list"))
+        timing = response["Server-Timing"]
+        for name in ("db;dur=", 'desc="2 queries"', "serialize;dur=", "app;dur=", "total;dur="):
+            self.assertIn(name, timing)
+
+        metrics = self.client.get(reverse("metrics"))
+        self.assertEqual(metrics.status_code, 200)
+        labels = 'route="v1/videos/",method="GET",status="200"'
+        text = metrics.content.decode()
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 1', text)
+        self.assertIn(f'http_request_queries_bucket{{{labels},le="2"}} 1', text)
+        self.assertIn(f'http_response_size_bytes_sum{{{labels}}} {len(response.content)}', text)
+
+    def test_streamed_queries_in_metrics(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(reverse("video_hosting_app:ids_list"), {"stream": "ndjson"})
+        self.assertIn('desc="0 queries"', response["Server-Timing"])
+        self.assertNotIn("http_request_queries_count", render_metrics())
+        b"".join(response.streaming_content)
+
+        labels = 'route="v1/videos/ids/",method="GET",status="200"'
+        text = render_metrics()
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 1', text)
+        self.assertIn(f'http_request_queries_bucket{{{labels},le="0"}} 0', text)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 401)
+        response = self.client.get(url, headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_duplicate_queries_logged(self):
+        def view(request):
+            for video in Video.objects.order_by("id")[:6]:
+                list(video.videofile_set.all())
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        with self.assertLogs("video_hosting_app.instrumentation", "WARNING") as logs:
+            PerformanceMiddleware(view)(request)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("6 раз", logs.output[0])
+        self.assertIn("db_duplicate_queries_total", render_metrics())
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (1, 2,  3) AND name = 'it''s'"),
+            fingerprint("SELECT * FROM t WHERE id IN (4) AND name = 'x'"),
+        )
+
+
+@override_settings(DATABASE_REPLICAS=["default"])
+class ReplicaRoutingTests(VideoTestDataMixin, APITestCase):
+    """
+    Чтение с реплик: закрепление клиента за основной базой после записи и проверка отставания.
+    Репликой служит сама тестовая база
+    """
+
+    def setUp(self):
+        replica_health.clear()
+
+    def route(self, request):
+        seen = {}
+
+        def view(request):
+            seen["pinned"], seen["alias"] = primary_pinned(), read_alias()
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(request)
+        return seen
+
+    def test_sticky_primary_after_write(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("video_hosting_app:like", kwargs={"video_id": self.video.pk})
+        self.assertNotIn(PRIMARY_COOKIE, self.client.get(reverse("video_hosting_app:list")).cookies)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.cookies[PRIMARY_COOKIE]["max-age"], settings.DB_PRIMARY_STICKY_SECONDS
+        )
+
+        request = RequestFactory().get("/")
+        self.assertFalse(self.route(request)["pinned"])
+        request.COOKIES[PRIMARY_COOKIE] = "1"
+        self.assertTrue(self.route(request)["pinned"])
+
+    def test_streamed_body_keeps_routing(self):
+        def view(request):
+            return StreamingHttpResponse(str(primary_pinned()) for _ in range(2))
+
+        request = RequestFactory().get("/")
+        request.COOKIES[PRIMARY_COOKIE] = "1"
+        response = ReplicaRoutingMiddleware(view)(request)
+        self.assertEqual(b"".join(response.streaming_content), b"TrueTrue")
+
+    def test_replica_lag_check(self):
+        # Тест идет внутри транзакции, поэтому read_alias здесь всегда выбирает основную базу
+        self.assertEqual(self.route(RequestFactory().get("/"))["alias"], "default")
+        self.assertTrue(replica_health.is_healthy("default"))
+        self.assertEqual(replica_health.status(), {"default": {"healthy": True, "lag": 0.0}})
+
+        replica_health.clear()
+        with override_settings(DB_REPLICA_MAX_LAG=-1):
+            with self.assertLogs("video_hosting_app.replicas", "WARNING"):
+                self.assertFalse(replica_health.is_healthy("default"))
+
+    @override_settings(
+        DATABASE_REPLICAS=["replica_1", "replica_2"],
+        VIDEO_CACHE_TIMEOUT=300,
+        DB_REPLICA_MAX_LAG=5,
+    )
+    def test_replica_selection(self):
+        # Реплики - зеркала тестовой базы, к которым view не обращается: проверка здоровья
+        # подменена, а транзакция теста скрыта, чтобы read_alias мог выбрать реплику
+        healthy = {"replica_2"}
+        seen = []
+
+        def view(request):
+            seen.append((read_alias(), store_timeout()))
+            healthy.clear()
+            seen.append((read_alias(), store_timeout()))
+            ReplicaRouter().db_for_write(Video)
+            seen.append((read_alias(), store_timeout()))
+            return HttpResponse()
+
+        self.enterContext(mock.patch.object(connection, "in_atomic_block", False))
+        self.enterContext(
+            mock.patch.object(
+                replica_health, "is_healthy", side_effect=lambda alias: alias in healthy
+            )
+        )
+        ReplicaRoutingMiddleware(view)(RequestFactory().get("/"))
+        # Реплика выбирается один раз и остается до конца запроса, даже если стала нездоровой;
+        # после записи чтения идут в основную базу, но кэш все равно живет не дольше отставания
+        self.assertEqual(seen, [("replica_2", 5), ("replica_2", 5), ("default", 5)])
+        self.assertEqual(replica_health.is_healthy.call_count, 2)
+
+        seen.clear()
+        ReplicaRoutingMiddleware(view)(RequestFactory().get("/"))
+        self.assertEqual(seen[0], ("default", 300))
+
+
+class VideoCacheTests(VideoTestDataMixin, APITestCase):
+    """
+    Кэш ответов для анонимных пользователей и его сброс при изменении видео
+    """
+
+    def setUp(self):
+        video_cache().clear()
+
+    def test_retrieve_cached_until_video_changes(self):
+        url = reverse("video_hosting_app:retrieve", kwargs={"pk": self.video.pk})
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.video.name = "Новое название"
+            self.video.save()
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["name"], "Новое название")
+
+    def test_list_cached_for_anonymous_only(self):
+        url = reverse("video_hosting_app:list")
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            VideoFile.objects.filter(video=self.video).first().delete()
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+
+        self.client.force_authenticate(self.user)
+        self.assertFalse(self.client.get(url).has_header("X-Cache"))
+
+
+class ConditionalRequestTests(VideoTestDataMixin, APITestCase):
+    """
+    ETag/Last-Modified и ответ 304 без сериализации
+    """
+
+    def setUp(self):
+        video_cache().clear()
+
+    def test_retrieve_not_modified(self):
+        url = reverse("video_hosting_app:retrieve", kwargs={"pk": self.video.pk})
+        etag = self.client.get(url)["ETag"]
+        video_cache().clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            VideoFile.objects.filter(video=self.video).first().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_not_modified(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("video_hosting_app:list")
+        response = self.client.get(url)
+        self.assertTrue(response.has_header("Last-Modified"))
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(url, {"count": "estimate"})
+        self.assertIn("count_estimate", response.data)
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_owner_rename_changes_etag(self):
+        url = reverse("video_hosting_app:retrieve", kwargs={"pk": self.video.pk})
+        etag = self.client.get(url)["ETag"]
+        owner = self.video.owner
+        owner.username = "renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            owner.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["owner"], "renamed")
+
+
+class VideoFileStreamTests(VideoTestDataMixin, APITestCase):
+    """
+    Отдача видео-файла диапазонами байт
+    """
+    content = bytes(range(256)) * 40
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.video_file = VideoFile.objects.get(video=self.video, quality="HD")
+        self.video_file.file.save("video.mp4", ContentFile(self.content))
+        self.url = reverse("video_hosting_app:file_stream", kwargs={"pk": self.video_file.pk})
+
+    def get(self, **headers):
+        response = self.client.get(self.url, HTTP_ACCEPT="video/*", **headers)
+        return response, b"".join(getattr(response, "streaming_content", []))
+
+    def test_full_file(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(body, self.content)
+
+    def test_ranges(self):
+        size = len(self.content)
+        for header, start, end in (
+            ("bytes=100-199", 100, 199),
+            ("bytes=10000-", 10000, size - 1),
+            ("bytes=-50", size - 50, size - 1),
+        ):
+            response, body = self.get(HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response["Content-Range"], f"bytes {start}-{end}/{size}")
+            self.assertEqual(int(response["Content-Length"]), end - start + 1)
+            self.assertEqual(body, self.content[start : end + 1])
+
+    def test_unsatisfiable_range(self):
+        response, _ = self.get(HTTP_RANGE=f"bytes={len(self.content)}-")
+        self.assertEqual(response.status_code, 416)
+
+    def test_if_range(self):
+        etag = self.get()[0]["ETag"]
+        self.assertEqual(self.get(HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=etag)[0].status_code, 206)
+        self.assertEqual(self.get(HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"old"')[0].status_code, 200)
+
+    def test_unpublished_video_hidden(self):
+        video_file = VideoFile.objects.filter(video__is_published=False).first()
+        url = reverse("video_hosting_app:file_stream", kwargs={"pk": video_file.pk})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ChunkedUploadTests(VideoTestDataMixin, APITestCase):
+    """
+    Возобновляемая загрузка видео-файла по частям
+    """
+    content = bytes(range(256)) * 64
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            reverse("video_hosting_app:upload_create", kwargs={"video_id": self.video.pk}),
+            {"quality": "UHD", "size": len(self.content), "filename": "movie.mp4"},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.url = response["Location"]
+        self.session = UploadSession.objects.get(pk=response.data["id"])
+
+    def patch(self, offset, chunk, checksum=None):
+        checksum = checksum or base64.b64encode(hashlib.sha256(chunk).digest()).decode()
+        return self.client.patch(
+            self.url,
+            chunk,
+            content_type="application/offset+octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+            HTTP_UPLOAD_CHECKSUM=f"sha256 {checksum}",
+        )
+
+    def test_upload_in_chunks(self):
+        middle = len(self.content) // 2
+        response = self.patch(0, self.content[:middle])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(int(response["Upload-Offset"]), middle)
+
+        self.assertEqual(self.patch(0, self.content[:middle]).status_code, 409)
+        self.assertEqual(
+            self.patch(middle, self.content[middle:], checksum="AAAA").status_code, 460
+        )
+        self.assertEqual(self.client.head(self.url)["Upload-Offset"], str(middle))
+        finalize_url = reverse(
+            "video_hosting_app:upload_finalize", kwargs={"pk": self.session.pk}
+        )
+        self.assertEqual(self.client.post(finalize_url).status_code, 409)
+
+        self.assertEqual(self.patch(middle, self.content[middle:]).status_code, 204)
+        self.assertEqual(self.client.post(finalize_url).status_code, 201)
+        video_file = VideoFile.objects.get(video=self.video, quality="UHD")
+        self.session.refresh_from_db()
+        self.assertEqual(video_file.file.name, self.session.path)
+        with video_file.file.open("rb") as file:
+            self.assertEqual(file.read(), self.content)
+
+    def test_concurrent_writes_at_same_offset(self):
+        first, second = self.content[:100], bytes(100)
+
+        class Stream(io.BytesIO):
+            """
+            Пока пишется первая часть, приходит вторая с тем же смещением
+            """
+
+            def read(stream, size=-1):
+                with self.assertRaises(OffsetConflict):
+                    write_chunk(self.session, 0, len(second), io.BytesIO(second))
+                return super().read(size)
+
+        self.assertEqual(write_chunk(self.session, 0, len(first), Stream(first)), len(first))
+        # Опоздавшая часть со старым смещением тоже ничего не пишет
+        with self.assertRaises(OffsetConflict):
+            write_chunk(self.session, 0, len(second), io.BytesIO(second))
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.offset, len(first))
+        with open(video_storage().path(self.session.path), "rb") as file:
+            self.assertEqual(file.read(len(first)), first)
+
+    def test_finalize_retried_after_failure(self):
+        self.assertEqual(self.patch(0, self.content).status_code, 204)
+        upload_path = video_storage().path(self.session.path)
+        with mock.patch(
+            "video_hosting_app.uploads.enqueue_renditions", side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            finalize_upload(self.session.pk)
+        self.session.refresh_from_db()
+        self.assertIsNone(self.session.completed_at)
+        self.assertTrue(os.path.exists(upload_path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            video_file = finalize_upload(self.session.pk)
+        self.assertFalse(os.path.exists(upload_path))
+        with video_file.file.open("rb") as file:
+            self.assertEqual(file.read(), self.content)
+
+    def test_abandoned_upload_expires(self):
+        path = video_storage().path(self.session.path)
+        UploadSession.objects.filter(pk=self.session.pk).update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+        # Часть записана недавно: загрузка еще идет
+        self.assertEqual(expire_uploads(), [])
+        old = time.time() - 2 * 24 * 3600
+        os.utime(path, (old, old))
+        self.assertEqual(expire_uploads(), [self.session.path])
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(UploadSession.objects.filter(pk=self.session.pk).exists())
+
+    def test_only_owner_can_upload(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.post(
+            reverse("video_hosting_app:upload_create", kwargs={"video_id": self.video.pk}),
+            {"quality": "HD", "size": 10},
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.patch(0, self.content[:10]).status_code, 404)
+
+
+class ContentAddressedStorageTests(VideoTestDataMixin, APITestCase):
+    """
+    Одинаковое содержимое хранится одним файлом и удаляется вместе с последней ссылкой
+    """
+    content = b"video" * 1000
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root, VIDEO_BLOB_GC_GRACE=-1))
+        self.client.force_authenticate(self.user)
+
+    def test_repeat_upload_is_deduplicated(self):
+        sha256 = hashlib.sha256(self.content).hexdigest()
+        first = VideoFile.objects.get(video=self.video, quality="HD")
+        first.file = ContentFile(self.content, name="first.mp4")
+        first.save()
+        self.assertEqual(first.file.name, blob_name(sha256, ".mp4"))
+
+        # Знание хэша не дает файл без загрузки: сессия ждет данных
+        response = self.client.post(
+            reverse("video_hosting_app:upload_create", kwargs={"video_id": self.video.pk}),
+            {
+                "quality": "UHD",
+                "size": len(self.content),
+                "filename": "copy.mp4",
+                "sha256": sha256,
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.data["completed_at"])
+        self.assertEqual(response.data["offset"], 0)
+        response = self.client.patch(
+            response["Location"],
+            self.content,
+            content_type="application/offset+octet-stream",
+            HTTP_UPLOAD_OFFSET="0",
+        )
+        self.assertEqual(response.status_code, 204)
+        session = UploadSession.objects.get(video=self.video, quality="UHD")
+        finalize_url = reverse("video_hosting_app:upload_finalize", kwargs={"pk": session.pk})
+        self.assertEqual(self.client.post(finalize_url).status_code, 201)
+        second = VideoFile.objects.get(video=self.video, quality="UHD")
+        self.assertEqual(second.file.name, first.file.name)
+
+        path = first.file.path
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+
+
+class TranscodeTests(VideoTestDataMixin, APITestCase):
+    """
+    Очередь перекодирования: недостающие качества создаются воркером, ошибки повторяются
+    """
+    copy_encoder = "{python} -c 'import shutil, sys; shutil.copyfile(*sys.argv[1:])' {source} {target}"
+    failing_encoder = "{python} -c 'raise SystemExit(\"encoder failed\")'"
+    segmenter = """{python} -c 'import os, sys; source, output = sys.argv[1:]
+open(os.path.join(output, "00000.ts"), "wb").write(open(source, "rb").read())
+open(os.path.join(output, "index.m3u8"), "w").write("#EXTM3U\\n#EXTINF:2.0,\\n00000.ts\\n")
+' {source} {output}"""
+    probe = (
+        "{python} -c 'import json; print(json.dumps(dict(streams=["
+        'dict(codec_type="video", codec_name="h264", profile="High", level=40), '
+        "dict(codec_type=\"audio\", codec_name=\"aac\", profile=\"LC\")])))' {source}"
+    )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(
+            override_settings(
+                MEDIA_ROOT=media_root,
+                TRANSCODE_RETRY_DELAY=0,
+                TRANSCODE_SEGMENTER_COMMAND=self.segmenter,
+                TRANSCODE_PROBE_COMMAND=self.probe,
+            )
+        )
+        self.source = Video.objects.create(owner=self.user, name="Исходник")
+        VideoFile.objects.create(
+            video=self.source, quality="FHD", file=ContentFile(b"source", name="source.mp4")
+        )
+
+    def test_missing_qualities_are_transcoded(self):
+        self.assertEqual(len(enqueue_renditions(self.source.pk, "FHD")), 1)
+        enqueue_renditions(self.source.pk, "FHD")
+        with override_settings(TRANSCODE_ENCODER_COMMAND=self.copy_encoder):
+            run_worker(workers=1, drain=True)
+
+        job = TranscodeJob.objects.get(video=self.source, kind="transcode")
+        self.assertEqual((job.quality, job.status, job.attempts), ("HD", "done", 1))
+        hd = VideoFile.objects.get(video=self.source, quality="HD")
+        with hd.file.open("rb") as file:
+            self.assertEqual(file.read(), b"source")
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(
+            reverse("video_hosting_app:transcode_jobs", kwargs={"video_id": self.source.pk})
+        )
+        self.assertEqual(
+            {(job["kind"], job["status"]) for job in response.data},
+            {("transcode", "done"), ("package", "done")},
+        )
+
+    def test_failed_job_is_retried(self):
+        enqueue_renditions(self.source.pk, "FHD")
+        with override_settings(
+            TRANSCODE_ENCODER_COMMAND=self.failing_encoder, TRANSCODE_MAX_ATTEMPTS=2
+        ):
+            run_worker(workers=1, drain=True)
+
+        job = TranscodeJob.objects.get(video=self.source, kind="transcode")
+        self.assertEqual((job.status, job.attempts), ("failed", 2))
+        self.assertIn("encoder failed", job.error)
+        self.assertFalse(VideoFile.objects.filter(video=self.source, quality="HD").exists())
+
+    def test_hls_playlists_and_segments(self):
+        Video.objects.filter(pk=self.source.pk).update(is_published=True)
+        master_url = reverse("video_hosting_app:hls_master", kwargs={"pk": self.source.pk})
+        self.assertEqual(self.client.get(master_url).status_code, 404)
+
+        enqueue_packaging(self.source.pk, "FHD")
+        enqueue_renditions(self.source.pk, "FHD")
+        with override_settings(TRANSCODE_ENCODER_COMMAND=self.copy_encoder):
+            run_worker(workers=1, drain=True)
+
+        response = self.client.get(master_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"HD/index.m3u8", response.content)
+        self.assertIn(b"FHD/index.m3u8", response.content)
+        self.assertIn(b'CODECS="avc1.640028,mp4a.40.2"', response.content)
+        self.assertIn("max-age=60", response["Cache-Control"])
+        self.assertEqual(
+            self.client.get(master_url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304
+        )
+
+        hd = VideoFile.objects.get(video=self.source, quality="HD")
+        playlist = self.client.get(
+            reverse(
+                "video_hosting_app:hls_playlist",
+                kwargs={"pk": self.source.pk, "quality": "HD"},
+            )
+        )
+        self.assertIn(f"{hd.hls_key}/00000.ts".encode(), playlist.content)
+
+        kwargs = {"pk": self.source.pk, "quality": "HD", "segment": "00000.ts"}
+        segment_url = reverse("video_hosting_app:hls_segment", kwargs={**kwargs, "key": hd.hls_key})
+        response = self.client.get(segment_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(b"".join(response.streaming_content), b"source")
+        wrong_key_url = reverse("video_hosting_app:hls_segment", kwargs={**kwargs, "key": "0" * 32})
+        self.assertEqual(self.client.get(wrong_key_url).status_code, 404)
+
+
+    def test_missing_packaging_enqueued(self):
+        VideoFile.objects.exclude(video=self.source).delete()
+        self.assertEqual(enqueue_missing_packaging(), 1)
+        run_worker(workers=1, drain=True)
+        fhd = VideoFile.objects.get(video=self.source)
+        self.assertTrue(is_packaged(fhd))
+        self.assertEqual(enqueue_missing_packaging(), 0)
+
+        VideoFile.objects.filter(pk=fhd.pk).update(hls_codecs="")
+        self.assertEqual(enqueue_missing_packaging(), 0)
+        self.assertEqual(enqueue_missing_packaging(with_codecs=True), 1)
+
+
+class LikeToggleTests(VideoTestDataMixin, APITestCase):
+    """
+    Переключение лайка: не больше двух SQL-запросов и без дублей
+    """
+    TOGGLE_BUDGET = 2
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        self.url = reverse("video_hosting_app:like", kwargs={"video_id": self.video.pk})
+
+    def post_within_budget(self):
+        """
+        Запросы SAVEPOINT от transaction.atomic не считаются, в бою это BEGIN/COMMIT
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url)
+        statements = [
+            query for query in context.captured_queries if "SAVEPOINT" not in query["sql"]
+        ]
+        self.assertEqual(len(statements), self.TOGGLE_BUDGET)
+        return response
+
+    def test_toggle(self):
+        response = self.post_within_budget()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Like.objects.filter(video=self.video, user=self.user).count(), 1)
+
+        response = self.post_within_budget()
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Like.objects.filter(video=self.video, user=self.user).exists())
+
+    def test_shards_aggregated_into_total_likes(self):
+        video_cache().clear()
+        other = User.objects.create_user(username="other", password="testpas")
+        for user in (self.user, other, self.staff, self.staff):
+            self.client.force_authenticate(user)
+            self.client.post(self.url)
+        self.client.force_authenticate(None)
+        shards = VideoLikeShard.objects.filter(video=self.video)
+        self.assertEqual(sum(shard.count for shard in shards), 2)
+
+        detail_url = reverse("video_hosting_app:retrieve", kwargs={"pk": self.video.pk})
+        list_url = reverse("video_hosting_app:list")
+        for url in (detail_url, list_url):
+            self.client.get(url)
+            self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(aggregate_like_shards(), 1)
+            # До фиксации транзакции кэш не сбрасывается
+            self.assertEqual(self.client.get(detail_url)["X-Cache"], "HIT")
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.total_likes, 2)
+        response = self.client.get(detail_url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["total_likes"], 2)
+        self.assertEqual(self.client.get(list_url)["X-Cache"], "MISS")
+        self.assertFalse(VideoLikeShard.objects.filter(dirty=True).exists())
+        self.assertEqual(aggregate_like_shards(), 0)
+
+        # Шарды без отметки dirty пересчитываются только полным пересчетом
+        shards.filter(pk=shards[0].pk).update(count=F("count") + 1)
+        self.assertEqual(aggregate_like_shards(), 0)
+        self.assertEqual(aggregate_like_shards(all_videos=True), 1)
+
+    def test_unpublished_video(self):
+        video = Video.objects.filter(is_published=False).first()
+        url = reverse("video_hosting_app:like", kwargs={"video_id": video.pk})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Like.objects.filter(video=video).exists())
+
+    def test_missing_video(self):
+        url = reverse("video_hosting_app:like", kwargs={"video_id": 0})
+        self.assertEqual(self.client.post(url).status_code, 404)
+
+
+class LikeBufferTests(VideoTestDataMixin, APITestCase):
+    """
+    Отложенная запись лайков: схлопывание переключений, оборванная строка журнала
+    и повторная обработка журнала после падения
+    """
+
+    def setUp(self):
+        buffer_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, buffer_dir)
+        self.enterContext(override_settings(LIKE_BUFFER_DIR=buffer_dir))
+        self.other = User.objects.create_user(username="other", password="testpas")
+
+    def append_events(self):
+        # Четное число переключений пары ничего не меняет, нечетное - ставит лайк
+        for _ in range(2):
+            append_like_event(self.video.pk, self.user.pk)
+        for _ in range(3):
+            append_like_event(self.video.pk, self.other.pk)
+        with open(journal_path(), "ab") as file:
+            file.write(f"{self.video.pk} {self.user.pk}".encode("ascii"))
+
+    def assert_applied(self):
+        self.assertEqual(
+            list(Like.objects.filter(video=self.video).values_list("user_id", flat=True)),
+            [self.other.pk],
+        )
+        shards = VideoLikeShard.objects.filter(video=self.video)
+        self.assertEqual(sum(shard.count for shard in shards), 1)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.total_likes, 1)
+
+    def test_flush(self):
+        self.append_events()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(flush_like_buffer(batch_size=2), 1)
+        self.assert_applied()
+        self.assertEqual(pending_journals(), [])
+        self.assertFalse(LikeBufferBatch.objects.exists())
+
+    def test_replay_after_crash(self):
+        self.append_events()
+        rotate_journal()
+        [path] = pending_journals()
+        # Падение после записи всех пачек, но до удаления файла журнала
+        with mock.patch("video_hosting_app.like_buffer.os.remove", side_effect=OSError):
+            with self.assertRaises(OSError):
+                flush_journal(path, batch_size=2)
+        self.assertEqual(LikeBufferBatch.objects.count(), 3)
+        self.assert_applied()
+
+        self.assertEqual(flush_like_buffer(batch_size=2), 0)
+        self.assert_applied()
+        self.assertEqual(pending_journals(), [])
+        self.assertFalse(LikeBufferBatch.objects.exists())
+
+    def test_unpublished_video_like_kept(self):
+        # Снять лайк с неопубликованного видео нельзя, как и поставить
+        video = Video.objects.filter(is_published=False).first()
+        Like.objects.create(video=video, user=self.other)
+        append_like_event(video.pk, self.other.pk)
+        flush_like_buffer(batch_size=10)
+        self.assertTrue(Like.objects.filter(video=video, user=self.other).exists())
+
+
+class LikesStatisticsTests(VideoTestDataMixin, APITestCase):
+    """
+    Материализованная статистика совпадает с подсчетом по таблице видео
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(self.staff)
+
+    def expected(self, published_only):
+        videos = Video.objects.filter(is_published=True) if published_only else Video.objects
+        return {
+            row["owner__username"]: row["likes_sum"]
+            for row in videos.values("owner__username").annotate(likes_sum=Sum("total_likes"))
+        }
+
+    def test_stats_follow_video_changes(self):
+        Video.objects.filter(pk=self.video.pk).update(total_likes=5)
+        Video.objects.filter(is_published=False).update(is_published=True, total_likes=2)
+        Video.objects.create(owner=self.staff, name="Видео staff", is_published=False)
+        other = User.objects.create_user(username="other", password="testpas")
+
+        response = self.client.get(
+            reverse("video_hosting_app:statistics_subquery"), {"top": 10}
+        )
+        self.assertEqual(response.status_code, 200)
+        rows = {row["username"]: row["likes_sum"] for row in response.data}
+        self.assertEqual(rows[self.user.username], self.expected(True)[self.user.username])
+        self.assertEqual(rows[self.staff.username], 0)
+        self.assertEqual(rows[other.username], 0)
+        self.assertEqual(response.data[0]["username"], self.user.username)
+
+        response = self.client.get(reverse("video_hosting_app:statistics-group-by"))
+        self.assertEqual(response.status_code, 200)
+        rows = {row["username"]: row["likes_sum"] for row in response.data["results"]}
+        self.assertEqual(rows, self.expected(False))
+
+
+class SeedDataTests(APITestCase):
+    """
+    seed_data создает согласованные данные: total_likes, шарды, лайки и статистика совпадают
+    """
+
+    def test_seed_data(self):
+        call_command(
+            "seed_data", users=300, videos=100, likes=1000, seed=1, stdout=io.StringIO()
+        )
+        self.assertEqual(User.objects.count(), 300)
+        self.assertEqual(VideoFile.objects.count(), 300)
+        self.assertTrue(User.objects.first().check_password("testpas"))
+        self.assertFalse(Like.objects.filter(video__is_published=False).exists())
+
+        likes = dict(Like.objects.values_list("video_id").annotate(Count("id")))
+        shards = dict(VideoLikeShard.objects.values_list("video_id").annotate(Sum("count")))
+        totals = dict(Video.objects.filter(total_likes__gt=0).values_list("id", "total_likes"))
+        self.assertEqual(likes, totals)
+        self.assertEqual(shards, totals)
+        # Степенное распределение: самое популярное видео намного популярнее среднего
+        self.assertGreater(max(totals.values()), 5 * sum(totals.values()) / len(totals))
+
+        stats = {row.user_id: row.total_likes for row in UserLikesStats.objects.all()}
+        owners = Video.objects.values_list("owner_id").annotate(Sum("total_likes"))
+        self.assertEqual({k: v for k, v in stats.items() if v}, {k: v for k, v in owners if v})
+
+
+class BenchmarkSummaryTests(SimpleTestCase):
+    def test_percentiles_and_totals(self):
+        latencies = [index / 1000 for index in range(1, 101)]
+        results = [
+            (latencies[:50], [2] * 50, [100] * 50, Counter({200: 50})),
+            (latencies[50:], [4] * 50, [300] * 50, Counter({200: 48, 500: 2})),
+        ]
+        summary = summarize(results, duration=2)
+        self.assertEqual(summary["requests"], 100)
+        self.assertEqual(summary["errors"], 2)
+        self.assertEqual(summary["throughput_rps"], 50)
+        self.assertAlmostEqual(summary["latency_ms"]["p50"], 50)
+        self.assertAlmostEqual(summary["latency_ms"]["p95"], 95)
+        self.assertAlmostEqual(summary["latency_ms"]["p99"], 99)
+        self.assertEqual(summary["queries"], {"mean": 3, "max": 4})
+        self.assertEqual(summary["bytes"], {"mean": 200, "max": 300})
+
+    def test_route_without_requests(self):
+        summary = summarize([([], [], [], Counter())], duration=2)
+        self.assertIsNone(summary["latency_ms"]["p50"])
+        line = summary_line("ids", summary)
+        self.assertIn("p50       -", line)
+        self.assertIn("ошибок 0", line)
 
-# Create your tests here.
@@ -0,0 +1,295 @@
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .blobs import release_blobs
+from .encoders import encoder_command, probe_codecs, run_encoder
+from .hls import HLS_TMP_PREFIX, PLAYLIST_NAME, package_bandwidth, package_dir, package_key
+from .models import TranscodeJob, VideoFile
+from .storage import TMP_PREFIX, video_storage
+from .streaming import iter_chunks
+
+QUALITY_HEIGHTS = {"HD": 720, "FHD": 1080, "UHD": 2160}
+OUTPUT_EXTENSION = ".mp4"
+ENQUEUE_BATCH_SIZE = 1000
+
+
+def default_workers():
+    """
+    Количество одновременных задач: TRANSCODE_JOBS_PER_CORE на ядро, не меньше одной
+    """
+    return max(1, int((os.cpu_count() or 1) * settings.TRANSCODE_JOBS_PER_CORE))
+
+
+def enqueue_renditions(video_id, source_quality):
+    """
+    Ставит в очередь перекодирование исходного файла во все недостающие качества ниже исходного.
+    Уже стоящие в очереди качества пропускаются (частичный уникальный индекс)
+    """
+    height = QUALITY_HEIGHTS[source_quality]
+    existing = set(
+        VideoFile.objects.filter(video_id=video_id).values_list("quality", flat=True)
+    )
+    jobs = [
+        TranscodeJob(video_id=video_id, source_quality=source_quality, quality=quality)
+        for quality, quality_height in QUALITY_HEIGHTS.items()
+        if quality_height < height and quality not in existing
+    ]
+    return TranscodeJob.objects.bulk_create(jobs, ignore_conflicts=True)
+
+
+def enqueue_packaging(video_id, quality):
+    """
+    Ставит в очередь нарезку видео-файла качества quality на сегменты HLS
+    """
+    return TranscodeJob.objects.bulk_create(
+        [
+            TranscodeJob(
+                video_id=video_id,
+                kind=TranscodeJob.PACKAGE,
+                source_quality=quality,
+                quality=quality,
+            )
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def enqueue_missing_packaging(with_codecs=False):
+    """
+    Ставит в очередь нарезку видео-файлов без актуальной нарезки HLS (например, загруженных
+    до ее появления), с with_codecs - и нарезанных файлов с неизвестными кодеками.
+    Возвращает количество файлов, для которых поставлены задачи
+    """
+    files = (
+        VideoFile.objects.exclude(file="")
+        .values_list("video_id", "quality", "file", "hls_key", "hls_codecs")
+        .iterator(chunk_size=ENQUEUE_BATCH_SIZE)
+    )
+    missing = (
+        (video_id, quality)
+        for video_id, quality, name, hls_key, hls_codecs in files
+        if hls_key != package_key(name) or (with_codecs and not hls_codecs)
+    )
+    count = 0
+    for chunk in iter_chunks(missing, ENQUEUE_BATCH_SIZE):
+        TranscodeJob.objects.bulk_create(
+            [
+                TranscodeJob(
+                    video_id=video_id,
+                    kind=TranscodeJob.PACKAGE,
+                    source_quality=quality,
+                    quality=quality,
+                )
+                for video_id, quality in chunk
+            ],
+            ignore_conflicts=True,
+        )
+        count += len(chunk)
+    return count
+
+
+def claim_jobs(limit):
+    """
+    Забирает до limit готовых к выполнению задач; параллельные воркеры
+    пропускают заблокированные строки (SKIP LOCKED) и не получают одну задачу дважды
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            TranscodeJob.objects.select_for_update(skip_locked=True)
+            .filter(status=TranscodeJob.PENDING, run_after__lte=now)
+            .order_by("run_after", "id")[:limit]
+        )
+        TranscodeJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=TranscodeJob.RUNNING, attempts=F("attempts") + 1, started_at=now
+        )
+    for job in jobs:
+        job.status, job.attempts, job.started_at = TranscodeJob.RUNNING, job.attempts + 1, now
+    return jobs
+
+
+def requeue_stale():
+    """
+    Возвращает в очередь задачи, зависшие в статусе "выполняется" (воркер упал)
+    """
+    stale = TranscodeJob.objects.filter(
+        status=TranscodeJob.RUNNING,
+        started_at__lt=timezone.now() - timedelta(seconds=settings.TRANSCODE_JOB_TIMEOUT * 2),
+    )
+    stale.filter(attempts__gte=settings.TRANSCODE_MAX_ATTEMPTS).update(
+        status=TranscodeJob.FAILED, error="Воркер не завершил задачу", finished_at=timezone.now()
+    )
+    return stale.update(status=TranscodeJob.PENDING)
+
+
+def fail_job(job, error):
+    """
+    Повторяет задачу с экспоненциальной задержкой или, если попытки закончились, помечает ошибкой
+    """
+    job.error = error
+    if job.attempts >= settings.TRANSCODE_MAX_ATTEMPTS:
+        job.status = TranscodeJob.FAILED
+        job.finished_at = timezone.now()
+    else:
+        job.status = TranscodeJob.PENDING
+        delay = settings.TRANSCODE_RETRY_DELAY * 2 ** (job.attempts - 1)
+        job.run_after = timezone.now() + timedelta(seconds=delay)
+    job.save(update_fields=["status", "error", "run_after", "finished_at"])
+
+
+def complete_job(job, target):
+    """
+    Сохраняет результат в хранилище по SHA-256 и создает видео-файл,
+    если владелец не загрузил это качество сам, пока задача выполнялась
+    """
+    storage = video_storage()
+    sha256 = storage.file_sha256(target)
+    with transaction.atomic():
+        name = storage.commit_blob(target, sha256, OUTPUT_EXTENSION)
+        _, created = VideoFile.objects.get_or_create(
+            video_id=job.video_id, quality=job.quality, defaults={"file": name}
+        )
+        if created:
+            enqueue_packaging(job.video_id, job.quality)
+        else:
+            transaction.on_commit(lambda: release_blobs([name]))
+        mark_done(job)
+
+
+def complete_package(job, source_name, target):
+    """
+    Переносит нарезку на место по ключу файла и отмечает ее у видео-файла вместе с кодеками
+    (TRANSCODE_PROBE_COMMAND читает только заголовки файла, поэтому выполняется здесь же).
+    Если файл заменили, пока шла нарезка, ставит в очередь нарезку нового файла
+    """
+    storage = video_storage()
+    key = package_key(source_name)
+    path = storage.path(package_dir(key))
+    if target is not None:
+        if os.path.exists(path):
+            shutil.rmtree(storage.path(target))
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(storage.path(target), path)
+    bandwidth, average_bandwidth = package_bandwidth(path)
+    codecs = probe_codecs(
+        encoder_command(settings.TRANSCODE_PROBE_COMMAND, source=storage.path(source_name))
+    )
+    with transaction.atomic():
+        updated = VideoFile.objects.filter(
+            video_id=job.video_id, quality=job.quality, file=source_name
+        ).update(
+            hls_key=key,
+            hls_bandwidth=bandwidth,
+            hls_average_bandwidth=average_bandwidth,
+            hls_codecs=codecs,
+        )
+        mark_done(job)
+        if not updated:
+            enqueue_packaging(job.video_id, job.quality)
+
+
+def mark_done(job):
+    job.status = TranscodeJob.DONE
+    job.error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "finished_at"])
+
+
+def start_job(executor, job, threads):
+    """
+    Отправляет кодирование или нарезку в пул процессов,
+    возвращает (future, имя исходного файла, имя результата в хранилище)
+    """
+    source = VideoFile.objects.filter(video_id=job.video_id, quality=job.source_quality).first()
+    if source is None:
+        job.attempts = settings.TRANSCODE_MAX_ATTEMPTS
+        fail_job(job, "Исходный видео-файл удален")
+        return None, None, None
+    storage = video_storage()
+
+    if job.kind == TranscodeJob.PACKAGE:
+        if storage.exists(f"{package_dir(package_key(source.file.name))}/{PLAYLIST_NAME}"):
+            # Файл с тем же содержимым уже нарезан
+            complete_package(job, source.file.name, None)
+            return None, None, None
+        target = f"{HLS_TMP_PREFIX}/{uuid.uuid4().hex}"
+        os.makedirs(storage.path(target))
+        command = encoder_command(
+            settings.TRANSCODE_SEGMENTER_COMMAND,
+            source=source.file.path,
+            output=storage.path(target),
+            duration=settings.HLS_SEGMENT_DURATION,
+        )
+    else:
+        target = f"{TMP_PREFIX}/{uuid.uuid4().hex}{OUTPUT_EXTENSION}"
+        os.makedirs(os.path.dirname(storage.path(target)), exist_ok=True)
+        command = encoder_command(
+            settings.TRANSCODE_ENCODER_COMMAND,
+            source=source.file.path,
+            target=storage.path(target),
+            height=QUALITY_HEIGHTS[job.quality],
+            threads=threads,
+        )
+    future = executor.submit(run_encoder, command, settings.TRANSCODE_JOB_TIMEOUT)
+    return future, source.file.name, target
+
+
+def finish_job(job, source_name, target, future):
+    storage = video_storage()
+    try:
+        returncode, error = future.result()
+    except Exception as e:
+        returncode, error = -1, repr(e)
+    if job.kind == TranscodeJob.PACKAGE:
+        if returncode == 0 and storage.exists(f"{target}/{PLAYLIST_NAME}"):
+            complete_package(job, source_name, target)
+            return
+        shutil.rmtree(storage.path(target), ignore_errors=True)
+    else:
+        if returncode == 0 and storage.exists(target):
+            complete_job(job, target)
+            return
+        storage.delete(target)
+    fail_job(job, error or f"Кодировщик завершился с кодом {returncode}")
+
+
+def run_worker(workers=None, interval=1.0, drain=False, stdout=None):
+    """
+    Выполняет задачи очереди в пуле из workers процессов; база данных используется
+    только в основном процессе. drain - завершиться, когда готовых задач не останется
+    """
+    workers = workers or default_workers()
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            requeue_stale()
+            free = workers - len(running)
+            for job in claim_jobs(free) if free else ():
+                future, source_name, target = start_job(executor, job, threads)
+                if future is not None:
+                    running[future] = (job, source_name, target)
+
+            if not running:
+                if drain:
+                    return
+                close_old_connections()
+                time.sleep(interval)
+                continue
+
+            done, _ = wait(running, timeout=interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, source_name, target = running.pop(future)
+                finish_job(job, source_name, target, future)
+                if stdout is not None:
+                    stdout.write(f"Задача {job.pk} ({job.video_id} {job.quality}): {job.status}")
@@ -0,0 +1,196 @@
+import base64
+import binascii
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UploadSession, VideoFile
+from .storage import video_storage
+from .transcoding import enqueue_packaging, enqueue_renditions
+
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class OffsetConflict(Exception):
+    pass
+
+
+def parse_checksum(header):
+    """
+    Заголовок Upload-Checksum в формате tus: "sha256 <base64 от дайджеста>"
+    """
+    if not header:
+        return None
+    algorithm, _, value = header.partition(" ")
+    if algorithm.lower() != "sha256":
+        raise ValueError("Поддерживается только sha256")
+    try:
+        return base64.b64decode(value.strip(), validate=True)
+    except binascii.Error:
+        raise ValueError("Некорректная контрольная сумма")
+
+
+def create_upload(owner, video, quality, size, extension, sha256=""):
+    """
+    Создает сессию загрузки и заранее выделяет место под итоговый файл нужного размера.
+    Переданный клиентом SHA-256 только проверяется при завершении: дубли хранилища
+    определяются по хэшу, который сервер посчитал сам по загруженным данным (finalize_upload),
+    иначе знание хэша чужого файла давало бы доступ к нему без загрузки
+    """
+    session = UploadSession(
+        owner_id=owner.pk, video=video, quality=quality, size=size, sha256=sha256
+    )
+    storage = video_storage()
+    session.path = f"videos/{session.id}{extension}"
+    path = storage.path(session.path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, size)
+        else:
+            os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+    session.save()
+    return session
+
+
+@contextmanager
+def locked_upload(session, blocking=True):
+    """
+    Открывает файл сессии под эксклюзивной блокировкой flock: запись части (от проверки смещения
+    до его сдвига) и завершение загрузки (от хэша до переноса в хранилище) не пересекаются.
+    Без blocking занятый файл - OffsetConflict. Возвращает дескриптор для записи
+    """
+    try:
+        fd = os.open(video_storage().path(session.path), os.O_WRONLY)
+    except FileNotFoundError:
+        raise OffsetConflict
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise OffsetConflict
+        yield fd
+    finally:
+        os.close(fd)
+
+
+def write_chunk(session, offset, length, stream, checksum=None):
+    """
+    Пишет часть длиной length из потока запроса прямо в итоговый файл со смещения offset (pwrite),
+    без промежуточных временных файлов. Диапазон сначала захватывается (locked_upload и повторная
+    проверка смещения в базе), поэтому параллельная или опоздавшая часть с тем же смещением
+    не затирает уже проверенные данные. Смещение сессии сдвигается только после проверки
+    контрольной суммы. Возвращает новое смещение
+    """
+    digest = hashlib.sha256()
+    with locked_upload(session, blocking=False) as fd:
+        if not UploadSession.objects.filter(
+            pk=session.pk, offset=offset, completed_at__isnull=True
+        ).exists():
+            raise OffsetConflict
+        written = 0
+        while written < length:
+            block = stream.read(min(READ_BLOCK_SIZE, length - written))
+            if not block:
+                break
+            os.pwrite(fd, block, offset + written)
+            digest.update(block)
+            written += len(block)
+
+        # Байты после текущего смещения еще не подтверждены, их перезапишет следующая часть
+        if checksum is not None and digest.digest() != checksum:
+            raise ChecksumMismatch
+        new_offset = offset + written
+        updated = UploadSession.objects.filter(
+            pk=session.pk, offset=offset, completed_at__isnull=True
+        ).update(offset=new_offset)
+        if not updated:
+            raise OffsetConflict
+    return new_offset
+
+
+def finalize_upload(session_id):
+    """
+    Переносит загруженный файл в хранилище по его SHA-256 (повторное содержимое не занимает
+    места), атомарно создает или заменяет VideoFile, ставит в очередь перекодирование
+    в недостающие качества и нарезку на сегменты HLS и закрывает сессию.
+    Хэш считается до блокировки строки сессии, чтобы не держать транзакцию на время чтения файла;
+    файл при этом заблокирован (locked_upload), и опоздавшая часть не изменит его до переноса.
+    Файл загрузки удаляется только после фиксации транзакции: если она откатится, сессия
+    по-прежнему указывает на существующий файл и завершение можно повторить
+    """
+    session = UploadSession.objects.get(pk=session_id)
+    if session.completed_at is not None:
+        raise OffsetConflict
+    storage = video_storage()
+    with locked_upload(session):
+        session.refresh_from_db()
+        if session.completed_at is not None or session.offset != session.size:
+            raise OffsetConflict
+        sha256 = storage.file_sha256(session.path)
+        if session.sha256 and session.sha256 != sha256:
+            raise ChecksumMismatch
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session_id)
+            if session.completed_at is not None:
+                raise OffsetConflict
+            upload_path = session.path
+            extension = os.path.splitext(upload_path)[1]
+            session.path = storage.commit_blob(upload_path, sha256, extension, keep_source=True)
+            video_file, _ = VideoFile.objects.update_or_create(
+                video_id=session.video_id,
+                quality=session.quality,
+                defaults={"file": session.path},
+            )
+            enqueue_packaging(session.video_id, session.quality)
+            enqueue_renditions(session.video_id, session.quality)
+            session.sha256 = sha256
+            session.completed_at = timezone.now()
+            session.save(update_fields=["path", "sha256", "completed_at"])
+            transaction.on_commit(lambda: storage.delete(upload_path))
+    return video_file
+
+
+def expire_uploads(dry_run=False):
+    """
+    Удаляет незавершенные сессии загрузки без записи частей дольше VIDEO_UPLOAD_EXPIRY секунд
+    вместе с их файлами, место под которые выделено на полный размер при создании сессии.
+    Время последней записи - время изменения файла. Возвращает пути удаленных файлов
+    """
+    storage = video_storage()
+    expired_before = timezone.now() - timedelta(seconds=settings.VIDEO_UPLOAD_EXPIRY)
+    removed = []
+    sessions = UploadSession.objects.filter(
+        completed_at__isnull=True, created_at__lt=expired_before
+    )
+    for session in sessions.iterator():
+        try:
+            with locked_upload(session, blocking=False):
+                modified = storage.get_modified_time(session.path)
+                if modified >= expired_before:
+                    continue
+                if not dry_run:
+                    storage.delete(session.path)
+                    session.delete()
+        except OffsetConflict:
+            # Файла нет - удаляется только сессия; файл занят записью части - сессия жива
+            if storage.exists(session.path):
+                continue
+            if not dry_run:
+                session.delete()
+        removed.append(session.path)
+    return removed
@@ -1,10 +1,23 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework.permissions import AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from . import async_views
 from .apps import VideoHostingAppConfig
 from .views import (
+    CacheStatsAPIView,
+    DatabaseStatsAPIView,
+    HlsMasterPlaylistAPIView,
+    HlsMediaPlaylistAPIView,
+    HlsSegmentAPIView,
+    TranscodeJobListAPIView,
+    UploadAPIView,
+    UploadCreateAPIView,
+    UploadFinalizeAPIView,
     UserCreateAPIView,
+    VideoFileStreamAPIView,
+    VideoSearchAPIView,
     VideoViewSet,
     LikeViewSet,
     IDViewSet,
@@ -14,6 +27,26 @@ from .views import (
 
 app_name = VideoHostingAppConfig.name
 
+# Эндпоинты чтения: асинхронные при VIDEO_ASYNC_VIEWS (под ASGI), иначе синхронные
+if settings.VIDEO_ASYNC_VIEWS:
+    video_list = async_views.VideoListView.as_view()
+    video_retrieve = async_views.VideoRetrieveView.as_view()
+    video_search = async_views.VideoSearchView.as_view()
+    ids_list = async_views.IDListView.as_view()
+    statistics_subquery = async_views.LikesStatisticsView.as_view(viewset=SubQueryViewSet)
+    statistics_group_by = async_views.LikesStatisticsView.as_view(viewset=CroupByViewSet)
+    cache_stats = async_views.CacheStatsView.as_view()
+    db_stats = async_views.DatabaseStatsView.as_view()
+else:
+    video_list = VideoViewSet.as_view({"get": "list"})
+    video_retrieve = VideoViewSet.as_view({"get": "retrieve"})
+    video_search = VideoSearchAPIView.as_view()
+    ids_list = IDViewSet.as_view({"get": "list"})
+    statistics_subquery = SubQueryViewSet.as_view({"get": "list"})
+    statistics_group_by = CroupByViewSet.as_view({"get": "list"})
+    cache_stats = CacheStatsAPIView.as_view()
+    db_stats = DatabaseStatsAPIView.as_view()
+
 urlpatterns = [
     path(
         "login/",
@@ -22,18 +55,49 @@ urlpatterns = [
     ),
     path("logout/", TokenRefreshView.as_view(), name="logout"),
     path("register/", UserCreateAPIView.as_view(), name="register"),
-    path("", VideoViewSet.as_view({"get": "list"}), name="list"),
-    path("<int:pk>/", VideoViewSet.as_view({"get": "retrieve"}), name="retrieve"),
-    path("<int:video_id>/like/", LikeViewSet.as_view({"post": "create"}), name="like"),
-    path("ids/", IDViewSet.as_view({"get": "list"}), name="ids_list"),
+    path("", video_list, name="list"),
+    path("<int:pk>/", video_retrieve, name="retrieve"),
+    path("search/", video_search, name="search"),
+    path(
+        "files/<int:pk>/stream/",
+        VideoFileStreamAPIView.as_view(),
+        name="file_stream",
+    ),
     path(
-        "statistics-subquery/",
-        SubQueryViewSet.as_view({"get": "list"}),
-        name="statistics_subquery",
+        "<int:pk>/hls/master.m3u8",
+        HlsMasterPlaylistAPIView.as_view(),
+        name="hls_master",
     ),
     path(
-        "statistics-group-by/",
-        CroupByViewSet.as_view({"get": "list"}),
-        name="statistics-group-by",
+        "<int:pk>/hls/<str:quality>/index.m3u8",
+        HlsMediaPlaylistAPIView.as_view(),
+        name="hls_playlist",
     ),
+    path(
+        "<int:pk>/hls/<str:quality>/<str:key>/<str:segment>",
+        HlsSegmentAPIView.as_view(),
+        name="hls_segment",
+    ),
+    path(
+        "<int:video_id>/uploads/",
+        UploadCreateAPIView.as_view(),
+        name="upload_create",
+    ),
+    path(
+        "<int:video_id>/transcodes/",
+        TranscodeJobListAPIView.as_view(),
+        name="transcode_jobs",
+    ),
+    path("uploads/<uuid:pk>/", UploadAPIView.as_view(), name="upload"),
+    path(
+        "uploads/<uuid:pk>/finalize/",
+        UploadFinalizeAPIView.as_view(),
+        name="upload_finalize",
+    ),
+    path("<int:video_id>/like/", LikeViewSet.as_view({"post": "create"}), name="like"),
+    path("ids/", ids_list, name="ids_list"),
+    path("statistics-subquery/", statistics_subquery, name="statistics_subquery"),
+    path("statistics-group-by/", statistics_group_by, name="statistics-group-by"),
+    path("cache-stats/", cache_stats, name="cache_stats"),
+    path("db-stats/", db_stats, name="db_stats"),
 ]
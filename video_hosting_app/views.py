@@ -1,23 +1,80 @@
+import os
+
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
-from django.db.models import Q, F, OuterRef, Sum, Subquery, Count
-from django.db.models.functions import Coalesce
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.db.models import Q, F, Prefetch
 from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
-from .models import Like, Video, VideoFile
-from .pagination import MyPagination
+from .caching import (
+    LIST_VERSION_KEY,
+    cache_lookup,
+    cache_stats,
+    cache_store,
+    video_detail_key,
+    video_list_key,
+    video_version_key,
+)
+from .conditional import (
+    get_validators,
+    is_conditional,
+    not_modified,
+    set_validators,
+    validator_rows,
+)
+from .db import connection_stats
+from .hls import (
+    PLAYLIST_CONTENT_TYPE,
+    SEGMENT_NAME_RE,
+    is_packaged,
+    master_playlist,
+    media_playlist,
+    playlist_etag,
+    segment_file,
+)
+from .instrumentation import METRICS_CONTENT_TYPE, render_metrics
+from .like_buffer import append_like_event
+from .likes import add_like_delta, toggle_like
+from .models import Like, TranscodeJob, UploadSession, UserLikesStats, Video, VideoFile
+from .pagination import MyPagination, SearchCursorPagination, VideoCursorPagination
 from .permissions import IsOwner, IsStaff
+from .ranges import FileContentNegotiation, range_file_response
+from .search import search_videos, validate_search_text
 from .serializers import (
     LikeSerializer,
+    TranscodeJobSerializer,
     UserSerializer,
     VideoSerializer,
     VideoFileSerializer,
     IDSerializer,
+    UploadSessionSerializer,
+    video_data,
+    video_file_rows,
+    video_rows,
+)
+from .storage import video_storage
+from .streaming import STREAM_GENERATORS, stream_ids
+from .uploads import (
+    ChecksumMismatch,
+    OffsetConflict,
+    create_upload,
+    finalize_upload,
+    parse_checksum,
+    write_chunk,
 )
 
 
@@ -46,48 +103,129 @@ class UserCreateAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def filter_visible(queryset, user):
+    """
+    Оставляет видео, доступные пользователю
+    """
+    if not user.is_authenticated:
+        return queryset.filter(is_published=True)
+    if not user.is_staff:
+        return queryset.filter(Q(owner_id=user.id) | Q(is_published=True))
+    return queryset
+
+
 class VideoViewSet(ModelViewSet):
     """
-    Эндпоинт для работы с объектами класса Video
+    Эндпоинт для работы с объектами класса Video.
+    list и retrieve собирают ответ из строк values_list (video_data) без VideoSerializer
     """
     queryset = Video.objects.all()
     serializer_class = VideoSerializer
-    pagination_class = MyPagination
+    pagination_class = VideoCursorPagination
 
     def perform_create(self, serializer):
         """
         При создании видео, назначает текущего пользователя владельцем видео
         """
         video = serializer.save()
-        video.owner = self.request.user
+        video.owner_id = self.request.user.id
         video.save()
 
+    def get_queryset(self):
+        """
+        Базовый queryset: владелец подтягивается через JOIN,
+        видео-файлы одним дополнительным запросом на всю страницу
+        """
+        return Video.objects.select_related("owner").prefetch_related(
+            Prefetch(
+                "videofile_set",
+                queryset=VideoFile.objects.only(
+                    "id", "video_id", "file", "quality"
+                ).order_by("id"),
+            )
+        )
+
     def retrieve(self, request, *args, **kwargs):
         """
-        Метод для получения данных о конкретном видео
+        Метод для получения данных о конкретном видео, ответ кэшируется до изменения видео;
+        на запрос с If-None-Match/If-Modified-Since актуальной версии возвращает 304 без сериализации
         """
-        video = Video.objects.get(pk=kwargs["pk"])
-        serializer = VideoSerializer(video)
-        return Response(serializer.data)
+        video_id = kwargs["pk"]
+        cache_key, payload = cache_lookup(
+            video_detail_key(video_id), video_version_key(video_id)
+        )
+        hit = payload is not None
+        if not hit:
+            if is_conditional(request):
+                video = validator_rows(Video.objects.filter(pk=video_id)).first()
+                if video is not None:
+                    response = not_modified(request, get_validators([video]))
+                    if response is not None:
+                        return response
+            video = get_object_or_404(video_rows(Video.objects.all()), pk=video_id)
+            payload = {
+                "data": video_data([video], video_file_rows([video]))[0],
+                "validators": get_validators([video]),
+            }
+            cache_store(cache_key, payload)
+        return self.conditional_response(request, payload, cache_key, hit)
 
     def list(self, request, *args, **kwargs):
         """
-        Метод для получения списка видео, возвращает данные в зависимости от прав пользователя
+        Метод для получения списка видео, возвращает данные в зависимости от прав пользователя,
+        постранично через keyset-пагинацию по (created_at, id);
+        страницы для анонимных пользователей кэшируются до изменения любого видео;
+        на запрос с If-None-Match/If-Modified-Since актуальной страницы возвращает 304 без сериализации.
+        Ответы с оценкой количества (?count=estimate) не условные: оценка меняется без изменения видео
         """
+        cache_key, payload = None, None
         if not self.request.user.is_authenticated:
-            queryset = Video.objects.filter(is_published=True).select_related("owner")
-            paginated_queryset = self.paginate_queryset(queryset)
-            serializer = VideoSerializer(paginated_queryset, many=True)
-            return self.get_paginated_response(serializer.data)
-        if self.request.user.is_staff:
-            queryset = Video.objects.all().select_related("owner")
-            serializer = VideoSerializer(queryset, many=True)
-            return Response(serializer.data)
-        queryset = Video.objects.filter(
-            Q(owner=self.request.user) | Q(is_published=True)
-        ).select_related("owner")
-        serializer = VideoSerializer(queryset, many=True)
-        return Response(serializer.data)
+            cache_key, payload = cache_lookup(
+                video_list_key(request.build_absolute_uri()), LIST_VERSION_KEY
+            )
+        hit = payload is not None
+        if not hit:
+            if is_conditional(request) and not VideoCursorPagination.estimate_requested(request):
+                page = self.paginate_queryset(self.filter_visible(validator_rows(Video.objects)))
+                response = not_modified(request, self.get_page_validators(page))
+                if response is not None:
+                    return response
+            page = self.paginate_queryset(self.filter_visible(video_rows(Video.objects.all())))
+            payload = {
+                "data": self.paginator.get_paginated_data(
+                    video_data(page, video_file_rows(page))
+                ),
+                "validators": self.get_page_validators(page),
+            }
+            cache_store(cache_key, payload)
+        response = self.conditional_response(request, payload, cache_key, hit)
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def filter_visible(self, queryset):
+        return filter_visible(queryset, self.request.user)
+
+    def get_page_validators(self, page):
+        if self.paginator.count_estimate is not None:
+            return None
+        return get_validators(
+            page, self.paginator.has_next, self.paginator.has_previous
+        )
+
+    def conditional_response(self, request, payload, cache_key, hit):
+        """
+        304 по сохраненным ETag/Last-Modified либо ответ с данными и этими заголовками
+        (без заголовков, если validators - None)
+        """
+        validators = payload["validators"]
+        response = not_modified(request, validators) if validators else None
+        if response is None:
+            response = Response(payload["data"])
+            if validators:
+                set_validators(response, validators)
+        if cache_key is not None:
+            response["X-Cache"] = "HIT" if hit else "MISS"
+        return response
 
     def get_permissions(self):
         """
@@ -107,6 +245,26 @@ class VideoViewSet(ModelViewSet):
         return super().get_permissions()
 
 
+class VideoSearchAPIView(APIView):
+    """
+    Поиск видео по названию (?q=...): результаты по убыванию релевантности с keyset-пагинацией
+    по (rank, id); видны те же видео, что и в списке
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        text = request.query_params.get("q", "").strip()
+        error = validate_search_text(text)
+        if error is not None:
+            return Response({"Ошибка": error}, status=status.HTTP_400_BAD_REQUEST)
+        paginator = SearchCursorPagination()
+        queryset = search_videos(filter_visible(Video.objects.all(), request.user), text)
+        page = paginator.paginate_queryset(video_rows(queryset, "rank"), request)
+        response = paginator.get_paginated_response(video_data(page, video_file_rows(page)))
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+
 class VideoFileViewSet(viewsets.ModelViewSet):
     """
     Эндпоинт для создания видео-файлов к видео
@@ -118,9 +276,7 @@ class VideoFileViewSet(viewsets.ModelViewSet):
         """
         Метод для проверки валидности данных и последующего сохранения видео-файла
         """
-        video_file = serializer.save()
-        video_file.video = serializer.id
-        video_file.save()
+        serializer.save(video_id=self.kwargs["video_id"])
 
     def list(self, request, *args, **kwargs):
         """
@@ -131,49 +287,331 @@ class VideoFileViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+def is_visible(video, user):
+    """
+    Видео доступно для просмотра, если оно опубликовано, а также владельцу и служебным пользователям
+    """
+    return video.is_published or (
+        user.is_authenticated and (user.is_staff or video.owner_id == user.id)
+    )
+
+
+class VideoFileStreamAPIView(APIView):
+    """
+    Эндпоинт для просмотра видео-файла с перемоткой: поддерживает Range/If-Range (206),
+    ETag/Last-Modified (304), файл отдается через sendfile или веб-сервером (X-Accel-Redirect/X-Sendfile)
+    доступен для опубликованных видео, а также владельцу и служебным пользователям
+    """
+    permission_classes = (AllowAny,)
+    content_negotiation_class = FileContentNegotiation
+
+    def get(self, request, *args, **kwargs):
+        video_file = get_object_or_404(
+            VideoFile.objects.select_related("video"), pk=kwargs["pk"]
+        )
+        if not is_visible(video_file.video, request.user):
+            return Response(
+                {"Ошибка": "Видео-файл не найден"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return range_file_response(request, video_file.file)
+
+
+class HlsViewMixin:
+    """
+    Общее для эндпоинтов HLS: доступ как у просмотра видео-файла,
+    публичное кэширование только для опубликованных видео
+    """
+    permission_classes = (AllowAny,)
+    content_negotiation_class = FileContentNegotiation
+    not_found_message = "Видео не найдено или еще не нарезано"
+
+    def not_found(self):
+        return Response(
+            {"Ошибка": self.not_found_message}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    def get_video_file(self, request, pk, quality):
+        video_file = (
+            VideoFile.objects.select_related("video")
+            .filter(video_id=pk, quality=quality)
+            .first()
+        )
+        if video_file is None or not is_visible(video_file.video, request.user):
+            return None
+        return video_file if is_packaged(video_file) else None
+
+    def cache_control(self, response, video, **kwargs):
+        if video.is_published:
+            patch_cache_control(response, public=True, **kwargs)
+        else:
+            patch_cache_control(response, private=True, **kwargs)
+        return response
+
+    def playlist_response(self, request, video, body):
+        etag = playlist_etag(body)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type=PLAYLIST_CONTENT_TYPE)
+        response["ETag"] = etag
+        return self.cache_control(response, video, max_age=settings.HLS_PLAYLIST_MAX_AGE)
+
+
+class HlsMasterPlaylistAPIView(HlsViewMixin, APIView):
+    """
+    Эндпоинт мастер-плейлиста HLS: все нарезанные качества видео для адаптивного плеера
+    """
+
+    def get(self, request, *args, **kwargs):
+        video = get_object_or_404(Video, pk=kwargs["pk"])
+        if not is_visible(video, request.user):
+            return self.not_found()
+        video_files = [
+            video_file
+            for video_file in VideoFile.objects.filter(video=video)
+            if is_packaged(video_file)
+        ]
+        if not video_files:
+            return self.not_found()
+        return self.playlist_response(request, video, master_playlist(video_files))
+
+
+class HlsMediaPlaylistAPIView(HlsViewMixin, APIView):
+    """
+    Эндпоинт медиа-плейлиста HLS одного качества
+    """
+
+    def get(self, request, *args, **kwargs):
+        video_file = self.get_video_file(request, kwargs["pk"], kwargs["quality"])
+        if video_file is None:
+            return self.not_found()
+        return self.playlist_response(
+            request, video_file.video, media_playlist(video_file)
+        )
+
+
+class HlsSegmentAPIView(HlsViewMixin, APIView):
+    """
+    Эндпоинт сегмента HLS. URL содержит ключ нарезки, который меняется вместе с файлом,
+    поэтому сегмент кэшируется навсегда (immutable)
+    """
+    segment_max_age = 365 * 24 * 60 * 60
+
+    def get(self, request, *args, **kwargs):
+        key, segment = kwargs["key"], kwargs["segment"]
+        video_file = self.get_video_file(request, kwargs["pk"], kwargs["quality"])
+        if (
+            video_file is None
+            or video_file.hls_key != key
+            or not SEGMENT_NAME_RE.fullmatch(segment)
+        ):
+            return self.not_found()
+        content_type = "video/mp2t" if segment.endswith(".ts") else None
+        response = range_file_response(
+            request, segment_file(key, segment), content_type
+        )
+        if response.status_code in (200, 206, 304):
+            self.cache_control(
+                response, video_file.video, max_age=self.segment_max_age, immutable=True
+            )
+        return response
+
+
+class UploadCreateAPIView(APIView):
+    """
+    Эндпоинт для начала возобновляемой загрузки видео-файла по частям,
+    место под файл выделяется сразу; доступен только владельцу видео
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        video = get_object_or_404(Video, pk=kwargs["video_id"])
+        if video.owner_id != request.user.id:
+            return Response(
+                {"Ошибка": "Загружать файлы может только владелец видео"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        serializer = UploadSessionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        session = create_upload(
+            request.user,
+            video,
+            data["quality"],
+            data["size"],
+            os.path.splitext(data["filename"])[1].lower(),
+            data.get("sha256", ""),
+        )
+        location = reverse("video_hosting_app:upload", kwargs={"pk": session.pk})
+        return Response(
+            UploadSessionSerializer(session).data,
+            status=status.HTTP_201_CREATED,
+            headers={"Location": location, "Upload-Offset": session.offset},
+        )
+
+
+class UploadAPIView(APIView):
+    """
+    Эндпоинт сессии загрузки: HEAD/GET - текущее смещение, PATCH - запись очередной части
+    (заголовки Upload-Offset и, по желанию, Upload-Checksum: sha256 <base64>), DELETE - отмена загрузки
+    """
+    permission_classes = (IsAuthenticated,)
+    chunk_content_type = "application/offset+octet-stream"
+
+    def get_session(self, request, pk):
+        return get_object_or_404(UploadSession, pk=pk, owner_id=request.user.id)
+
+    def get(self, request, *args, **kwargs):
+        session = self.get_session(request, kwargs["pk"])
+        return Response(
+            UploadSessionSerializer(session).data,
+            headers={"Upload-Offset": session.offset, "Upload-Length": session.size},
+        )
+
+    def head(self, request, *args, **kwargs):
+        return self.get(request, *args, **kwargs)
+
+    def patch(self, request, *args, **kwargs):
+        session = self.get_session(request, kwargs["pk"])
+        if request.content_type != self.chunk_content_type:
+            return Response(
+                {"Ошибка": f"Ожидается Content-Type {self.chunk_content_type}"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = int(request.headers["Content-Length"])
+            checksum = parse_checksum(request.headers.get("Upload-Checksum"))
+        except (KeyError, ValueError) as e:
+            return Response(
+                {"Ошибка": f"Некорректные заголовки части: {e}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if session.completed_at is not None or offset != session.offset:
+            return Response(
+                {"Ошибка": "Смещение не совпадает с текущим"},
+                status=status.HTTP_409_CONFLICT,
+                headers={"Upload-Offset": session.offset},
+            )
+        if offset + length > session.size:
+            return Response(
+                {"Ошибка": "Часть выходит за пределы файла"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            new_offset = write_chunk(session, offset, length, request.stream, checksum)
+        except ChecksumMismatch:
+            return Response(
+                {"Ошибка": "Контрольная сумма части не совпадает"},
+                status=460,
+                headers={"Upload-Offset": offset},
+            )
+        except OffsetConflict:
+            return Response(
+                {"Ошибка": "Часть уже записана параллельным запросом"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(
+            status=status.HTTP_204_NO_CONTENT, headers={"Upload-Offset": new_offset}
+        )
+
+    def delete(self, request, *args, **kwargs):
+        session = self.get_session(request, kwargs["pk"])
+        if session.completed_at is not None:
+            return Response(
+                {"Ошибка": "Загрузка уже завершена"}, status=status.HTTP_409_CONFLICT
+            )
+        video_storage().delete(session.path)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadFinalizeAPIView(APIView):
+    """
+    Эндпоинт завершения загрузки: когда записаны все части,
+    атомарно создает (или заменяет) видео-файл нужного качества
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        session = get_object_or_404(
+            UploadSession, pk=kwargs["pk"], owner_id=request.user.id
+        )
+        try:
+            video_file = finalize_upload(session.pk)
+        except ChecksumMismatch:
+            return Response(
+                {"Ошибка": "SHA-256 загруженного файла не совпадает с заявленным"},
+                status=460,
+            )
+        except OffsetConflict:
+            return Response(
+                {"Ошибка": "Загрузка не завершена или уже закрыта"},
+                status=status.HTTP_409_CONFLICT,
+                headers={"Upload-Offset": session.offset},
+            )
+        return Response(
+            VideoFileSerializer(video_file).data, status=status.HTTP_201_CREATED
+        )
+
+
+class TranscodeJobListAPIView(APIView):
+    """
+    Эндпоинт для просмотра очереди перекодирования видео, доступен только владельцу видео
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, *args, **kwargs):
+        video = get_object_or_404(Video, pk=kwargs["video_id"], owner_id=request.user.id)
+        jobs = TranscodeJob.objects.filter(video=video).order_by("-id")
+        return Response(TranscodeJobSerializer(jobs, many=True).data)
+
+
 class LikeViewSet(viewsets.ModelViewSet):
     """
     Эндпоинт для создания/удаления лайков
+    счетчик лайков пишется в шарды VideoLikeShard, Video.total_likes обновляется
+    командой aggregate_likes
     """
     permission_classes = [IsAuthenticated]
 
     def create(self, request, *args, **kwargs):
         """
         Метод который, если на данном Видео от данного пользователя уже есть лайк - удаляет его,
-         если нет - создает
+         если нет - создает; переключение лайка и обновление счетчика - два SQL-запроса
         """
+        if settings.LIKE_WRITE_BEHIND:
+            return self.create_write_behind(request, *args, **kwargs)
         try:
             with transaction.atomic():
                 video_id = kwargs["video_id"]
                 user = request.user
 
-                video = Video.objects.select_for_update().get(pk=video_id)
-                video_published = video.is_published
+                published, like_id, created = toggle_like(video_id, user.id)
 
-                if not video_published:
+                if not published:
                     return Response(
                         {"Ошибка": "Опубликованного видео по запросу не найдено"},
                         status=status.HTTP_400_BAD_REQUEST,
                     )
 
-                like_exists = Like.objects.filter(video_id=video_id, user=user).exists()
-                if like_exists:
-                    Like.objects.filter(video_id=video_id, user=user).delete()
-                    Video.objects.filter(pk=video_id).update(
-                        total_likes=F("total_likes") - 1
-                    )
+                if like_id is None:
                     return Response(
-                        {"message": "Лайк удален"}, status=status.HTTP_204_NO_CONTENT
-                    )
-                else:
-                    like = Like.objects.create(video_id=video_id, user=user)
-                    Video.objects.filter(pk=video_id).update(
-                        total_likes=F("total_likes") + 1
+                        {"Ошибка": "Лайк уже изменяется параллельным запросом"},
+                        status=status.HTTP_409_CONFLICT,
                     )
 
+                if created:
+                    add_like_delta(video_id, 1)
+                    like = Like(id=like_id, video_id=video_id, user_id=user.id)
                     serializer = LikeSerializer(like)
                     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+                add_like_delta(video_id, -1)
+                return Response(
+                    {"message": "Лайк удален"}, status=status.HTTP_204_NO_CONTENT
+                )
+
         except ObjectDoesNotExist:
             return Response(
                 {"Ошибка": "Видео не найдено"}, status=status.HTTP_404_NOT_FOUND
@@ -183,12 +621,38 @@ class LikeViewSet(viewsets.ModelViewSet):
                 {"Ошибка": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def create_write_behind(self, request, *args, **kwargs):
+        """
+        Режим LIKE_WRITE_BEHIND: проверяет видео одним чтением и записывает событие
+        переключения лайка в журнал, лайк и счетчики обновит команда flush_likes
+        """
+        video_id = kwargs["video_id"]
+        video_published = (
+            Video.objects.filter(pk=video_id)
+            .values_list("is_published", flat=True)
+            .first()
+        )
+        if video_published is None:
+            return Response(
+                {"Ошибка": "Видео не найдено"}, status=status.HTTP_404_NOT_FOUND
+            )
+        if not video_published:
+            return Response(
+                {"Ошибка": "Опубликованного видео по запросу не найдено"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        append_like_event(video_id, request.user.id)
+        return Response(
+            {"message": "Лайк принят в обработку"}, status=status.HTTP_202_ACCEPTED
+        )
+
 
 class IDViewSet(viewsets.ModelViewSet):
     """
     Эндпоинт для получения списка id видео
     возвращает список c идентификаторами всех опубликованных видео, все видео за один раз, без пагинации
     доступен только служебным пользователям
+    с параметром ?stream=json|ndjson|packed ответ отдается потоком с постоянным расходом памяти
     """
     permission_classes = [IsStaff]
     pagination_class = None
@@ -197,47 +661,109 @@ class IDViewSet(viewsets.ModelViewSet):
         """
         Метод, который возвращает список ID
         """
-        queryset = Video.objects.filter(is_published=True)
+        queryset = Video.objects.filter(is_published=True).order_by("id")
+        stream_format = request.query_params.get("stream")
+        if stream_format is not None:
+            if stream_format not in STREAM_GENERATORS:
+                return Response(
+                    {"Ошибка": f"Допустимые форматы: {', '.join(STREAM_GENERATORS)}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            return stream_ids(queryset, stream_format)
         serializer = IDSerializer(queryset, many=True)
         return Response(serializer.data)
 
 
-class SubQueryViewSet(viewsets.ModelViewSet):
+class LikesStatisticsViewSet(viewsets.ModelViewSet):
     """
-    Эндпоинт который, возвращают список пользователей с количеством их лайков через подзапрос
-    доступен только служебным пользователям
+    Базовый эндпоинт статистики лайков по пользователям, читает материализованную таблицу
+    UserLikesStats, отсортированную по убыванию likes_field.
+    С параметром ?top=N возвращает первые N строк без пагинации, иначе - постранично
     """
     permission_classes = [IsStaff]
+    pagination_class = MyPagination
+    queryset = UserLikesStats.objects.all()
+    likes_field = None
+    max_top = 1000
+
+    def get_statistics_queryset(self):
+        return (
+            self.get_queryset()
+            .order_by(f"-{self.likes_field}", "user_id")
+            .values(username=F("user__username"), likes_sum=F(self.likes_field))
+        )
 
     def list(self, request, *args, **kwargs):
-        likes_subquery = Subquery(
-            Video.objects.filter(owner_id=OuterRef("id"), is_published=True)
-            .values("owner_id")
-            .annotate(likes_sum=Sum("total_likes"))
-            .values("likes_sum")[:1]
-        )
+        queryset = self.get_statistics_queryset()
+        top = request.query_params.get("top")
+        if top is not None:
+            try:
+                top = int(top)
+            except ValueError:
+                return Response(
+                    {"Ошибка": "Параметр top должен быть целым числом"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            return Response(queryset[: max(0, min(top, self.max_top))])
+        return self.get_paginated_response(self.paginate_queryset(queryset))
+
+
+class SubQueryViewSet(LikesStatisticsViewSet):
+    """
+    Эндпоинт который, возвращают список пользователей с количеством их лайков
+    на опубликованных видео, включая пользователей без видео
+    доступен только служебным пользователям
+    """
+    likes_field = "published_likes"
+
+
+class CroupByViewSet(LikesStatisticsViewSet):
+    """
+    Эндпоинт который, возвращают список владельцев видео с количеством лайков на всех их видео
+    доступен только служебным пользователям
+    """
+    queryset = UserLikesStats.objects.filter(videos_count__gt=0)
+    likes_field = "total_likes"
 
-        users = User.objects.annotate(
-            likes_sum=Coalesce(Subquery(likes_subquery), 0)
-        ).order_by("-likes_sum")
 
-        result = users.values("username", "likes_sum").order_by("-likes_sum")
-        return Response(result)
+def cache_report():
+    stats = cache_stats()
+    requests_count = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / requests_count if requests_count else None
+    stats["backend"] = settings.CACHES[settings.VIDEO_CACHE_ALIAS]["BACKEND"]
+    return stats
 
 
-class CroupByViewSet(viewsets.ModelViewSet):
+class CacheStatsAPIView(APIView):
     """
-    Эндпоинт который, возвращают список пользователей с количеством их лайков через группировку
+    Эндпоинт со счетчиками попаданий и промахов кэша видео текущего процесса
     доступен только служебным пользователям
     """
     permission_classes = [IsStaff]
 
-    def list(self, request, *args, **kwargs):
-        users = (
-            Video.objects.select_related("user")
-            .values("owner__username")
-            .annotate(likes_sum=Sum("total_likes"), username=F("owner__username"))
-            .values("username", "likes_sum")
-            .order_by("-likes_sum")
-        )
-        return Response(users)
+    def get(self, request, *args, **kwargs):
+        return Response(cache_report())
+
+
+class DatabaseStatsAPIView(APIView):
+    """
+    Эндпоинт с состоянием соединений с базой: пул текущего процесса и соединения на стороне Postgres
+    доступен только служебным пользователям
+    """
+    permission_classes = [IsStaff]
+
+    def get(self, request, *args, **kwargs):
+        return Response(connection_stats())
+
+
+def metrics(request):
+    """
+    Метрики процесса в текстовом формате Prometheus: гистограммы времени, SQL-запросов
+    и размера ответов по маршрутам (PerformanceMiddleware), счетчики кэша и пула соединений.
+    При заданном METRICS_TOKEN требуется заголовок Authorization: Bearer <METRICS_TOKEN>
+    """
+    if settings.METRICS_TOKEN and not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)